@@ -0,0 +1,37 @@
+# ai_assistant/cache_versions.py
+import time
+
+from django.core.cache import cache
+
+# Kept apart from services.py/visualization_service.py so signals.py, loaded in
+# every process at startup, doesn't import their heavy dependencies.
+
+
+def get_profile_context_version(user_id):
+    """Current version of a user's cached profile context"""
+    # Seeded from the clock so an evicted counter never reuses an old version
+    key = f'ai_assistant:profile_context_version:{user_id}'
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def bump_profile_context_version(user_id):
+    """Invalidate a user's cached profile context"""
+    key = f'ai_assistant:profile_context_version:{user_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_chart_data_version(user_id):
+    """Current version of the data behind a user's charts"""
+    # Seeded from the clock so an evicted counter never reuses an old version
+    key = f'ai_assistant:chart_data_version:{user_id}'
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def invalidate_chart_data(user_ids):
+    """Invalidate the cached charts of ``user_ids``; the next read seeds a fresh version"""
+    cache.delete_many([f'ai_assistant:chart_data_version:{user_id}' for user_id in user_ids])
@@ -0,0 +1,125 @@
+# ai_assistant/compression.py
+import re
+from typing import Dict, List, Optional
+
+from .models import Conversation, Message, UserPreference
+
+# Summary sections in display order: key -> label
+SUMMARY_SECTIONS = {
+    "topics": "Topics discussed",
+    "metrics": "Health metrics reviewed",
+    "recipes": "Recipes explored",
+    "goals": "Progress tracked for",
+}
+# Most recent recipes kept in the rolling summary
+MAX_SUMMARY_RECIPES = 3
+
+_COUNT_PATTERN = re.compile(r"^\((\d+) messages summarized\)$")
+
+
+def summarize_messages(messages: List[Message]) -> Dict[str, List[str]]:
+    """Extract the key information from a batch of messages, per summary section"""
+    sections = {key: [] for key in SUMMARY_SECTIONS}
+
+    def add(key, value):
+        if value not in sections[key]:
+            sections[key].append(value)
+
+    for msg in messages:
+        if msg.role == "user":
+            content_lower = msg.content.lower()
+            # Extract topics
+            if "weight" in content_lower or "bmi" in content_lower:
+                add("topics", "weight management")
+            if "meal" in content_lower or "recipe" in content_lower:
+                add("topics", "nutrition planning")
+            if "protein" in content_lower or "calories" in content_lower:
+                add("topics", "nutritional tracking")
+
+        elif msg.role == "function":
+            # Track what data was accessed
+            function_args = msg.function_args or {}
+            if msg.function_name == "get_health_metrics":
+                add("metrics", function_args.get("metric_type", "health metrics"))
+            elif msg.function_name == "get_recipe_info":
+                if msg.function_response and "recipe" in msg.function_response:
+                    recipe_title = msg.function_response["recipe"].get("title")
+                    if recipe_title:
+                        add("recipes", recipe_title)
+            elif msg.function_name == "get_progress_report":
+                add("goals", function_args.get("report_type", "progress"))
+
+    return sections
+
+
+def parse_summary(summary: Optional[str]):
+    """Split a rendered summary back into (sections, summarized message count)"""
+    sections = {key: [] for key in SUMMARY_SECTIONS}
+    labels = {label: key for key, label in SUMMARY_SECTIONS.items()}
+    count = 0
+
+    # Older summaries were appended to each other with blank lines
+    for part in re.split(r" \| |\n\n", summary or ""):
+        part = part.strip()
+        count_match = _COUNT_PATTERN.match(part)
+        if count_match:
+            count += int(count_match.group(1))
+            continue
+        label, _, values = part.partition(": ")
+        if label in labels:
+            for value in values.split(", "):
+                if value and value not in sections[labels[label]]:
+                    sections[labels[label]].append(value)
+    return sections, count
+
+
+def merge_summary(summary: Optional[str], new_sections: Dict[str, List[str]], new_count: int) -> str:
+    """Fold a new batch's sections into a rolling summary"""
+    sections, count = parse_summary(summary)
+    for key, values in new_sections.items():
+        for value in values:
+            if value in sections[key]:
+                sections[key].remove(value)  # Re-appended as the most recent
+            sections[key].append(value)
+    sections["recipes"] = sections["recipes"][-MAX_SUMMARY_RECIPES:]
+
+    summary_parts = [
+        f"{label}: {', '.join(sections[key])}"
+        for key, label in SUMMARY_SECTIONS.items() if sections[key]
+    ]
+    summary_parts.append(f"({count + new_count} messages summarized)")
+    return " | ".join(summary_parts)
+
+
+def compression_due(conversation: Conversation, message_count: int, preferences: UserPreference) -> bool:
+    """Whether messages outside the context window are waiting to be summarized"""
+    if message_count < preferences.auto_compress_after:
+        return False
+    return message_count - preferences.max_context_messages > conversation.compressed_at_turn
+
+
+def compress_conversation(conversation_id) -> Dict[str, int]:
+    """
+    Summarize the messages that left the context window since the last run.
+
+    ``compressed_at_turn`` is the number of leading messages already folded
+    into ``context_summary``, so each run reads only the newer ones. Callers
+    hold the conversation's compression lock (see tasks.compress_conversation_task).
+    """
+    conversation = Conversation.objects.get(id=conversation_id)
+    preferences, _ = UserPreference.objects.get_or_create(user_id=conversation.user_id)
+    message_count = conversation.messages.count()
+    if not compression_due(conversation, message_count, preferences):
+        return {"compressed": 0, "compressed_at_turn": conversation.compressed_at_turn}
+
+    start = conversation.compressed_at_turn
+    end = message_count - preferences.max_context_messages
+    batch = list(
+        Message.objects.filter(conversation=conversation).order_by('created_at', 'id')[start:end]
+    )
+
+    conversation.context_summary = merge_summary(conversation.context_summary, summarize_messages(batch), len(batch))
+    conversation.compressed_at_turn = start + len(batch)
+    # Only these fields, so a turn saving the conversation concurrently isn't overwritten
+    conversation.save(update_fields=['context_summary', 'compressed_at_turn'])
+    return {"compressed": len(batch), "compressed_at_turn": conversation.compressed_at_turn}
@@ -1,14 +1,21 @@
 # ai_assistant/conversation_manager.py
 import json
+import logging
 import os
-from typing import List, Dict, Any, Optional, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from django.conf import settings
+from django.db import close_old_connections, transaction
 from django.utils import timezone
-import openai
-from openai import OpenAI
-import tiktoken
+from utils.llm_gateway import get_llm_gateway
+from .compression import compression_due
 from .models import Conversation, Message
 from .services import AIAssistantService
+from .tasks import compress_conversation_task
+from .token_counting import MESSAGE_TOKEN_OVERHEAD, count_static_tokens, count_tokens
+
+logger = logging.getLogger(__name__)
 
 
 class ConversationManager:
@@ -20,10 +27,10 @@ class ConversationManager:
         self.conversation = self._get_or_create_conversation(conversation_id)
         
         # Check if OpenAI API key is set
-        if not settings.OPENAI_API_KEY:
+        self.llm = get_llm_gateway()
+        if not self.llm.available:
             raise ValueError("OpenAI API key is not configured. Please set OPENAI_API_KEY in your environment variables.")
         
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = "gpt-3.5-turbo"  # Using GPT-3.5-turbo for wider availability
         self.max_tokens = 4096
         self.temperature = 0.7
@@ -42,22 +49,37 @@ class ConversationManager:
     
     def _count_tokens(self, text: str) -> int:
         """Count tokens in a text string"""
-        try:
-            encoding = tiktoken.encoding_for_model(self.model)
-            return len(encoding.encode(text))
-        except:
-            # Fallback: rough estimate
-            return len(text) // 4
+        return count_tokens(text, self.model)
     
-    def _get_conversation_context(self) -> Tuple[List[Dict[str, str]], int]:
-        """Get conversation context with token management"""
+    def _recent_messages(self, limit: int) -> List[Message]:
+        """The conversation's latest messages, newest first"""
+        return list(
+            Message.objects.filter(conversation=self.conversation).order_by('-created_at')[:limit]
+        )
+    
+    def _get_conversation_context(self, history: Optional[List[Message]] = None) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Get conversation context with token management
+        
+        ``history`` holds the latest messages newest first (queried when not
+        given). Their stored token counts are used, missing ones are filled
+        in once, and the prompt sections repeated every turn are counted
+        from a memo, so only new text is tokenized. Messages are packed
+        newest first while they fit in 70% of max_tokens.
+        """
+        max_context_messages = self.service.preferences.max_context_messages
+        if history is None:
+            history = self._recent_messages(max_context_messages)
+        history = history[:max_context_messages]
+        self._fill_token_counts(history)
+        
         messages = []
-        total_tokens = 0
         
-        # Always include system prompt
-        system_prompt = self.service.get_system_prompt()
-        messages.append({"role": "system", "content": system_prompt})
-        total_tokens += self._count_tokens(system_prompt)
+        # Always include system prompt (shared static prefix first, for provider-side prompt caching)
+        prompt_prefix, user_block = self.service.get_system_prompt_parts()
+        messages.append({"role": "system", "content": f"{prompt_prefix}\n\n{user_block}"})
+        total_tokens = (count_static_tokens(prompt_prefix, self.model) + count_static_tokens(user_block, self.model)
+                        + MESSAGE_TOKEN_OVERHEAD)
         
         # Add context summary if exists
         if self.conversation.context_summary:
@@ -66,199 +88,94 @@ class ConversationManager:
                 "content": f"Previous conversation summary: {self.conversation.context_summary}"
             }
             messages.append(summary_msg)
-            total_tokens += self._count_tokens(self.conversation.context_summary)
-        
-        # Get recent messages
-        recent_messages = Message.objects.filter(
-            conversation=self.conversation
-        ).order_by('-created_at')[:self.service.preferences.max_context_messages]
+            total_tokens += count_static_tokens(summary_msg["content"], self.model) + MESSAGE_TOKEN_OVERHEAD
         
-        # Add messages in chronological order
-        for msg in reversed(recent_messages):
-            if msg.role == "function":
-                # Format function responses
-                msg_content = {
-                    "role": "function",
-                    "name": msg.function_name,
-                    "content": json.dumps(msg.function_response)
-                }
-            else:
-                msg_content = {"role": msg.role, "content": msg.content}
-            
-            msg_tokens = self._count_tokens(str(msg_content))
-            if total_tokens + msg_tokens > self.max_tokens * 0.7:  # Leave room for response
+        # Newest first, leaving room for the response
+        packed = []
+        for msg in history:
+            msg_tokens = msg.token_count + MESSAGE_TOKEN_OVERHEAD
+            if total_tokens + msg_tokens > self.max_tokens * 0.7:
                 break
-            
-            messages.append(msg_content)
+            packed.append(self._as_context_message(msg))
             total_tokens += msg_tokens
         
+        # Add messages in chronological order
+        messages.extend(reversed(packed))
         return messages, total_tokens
     
-    def _compress_conversation_if_needed(self):
-        """Compress conversation history if it's getting too long"""
-        message_count = self.conversation.messages.count()
-        
-        if message_count >= self.service.preferences.auto_compress_after:
-            # Get messages to compress
-            compress_after = message_count - self.service.preferences.max_context_messages
-            messages_to_compress = Message.objects.filter(
-                conversation=self.conversation
-            ).order_by('created_at')[:compress_after]
-            
-            # Create intelligent summary using AI
-            summary = self._create_conversation_summary(messages_to_compress)
-            
-            # Update conversation summary
-            if self.conversation.context_summary:
-                # Append to existing summary
-                self.conversation.context_summary += f"\n\n{summary}"
-            else:
-                self.conversation.context_summary = summary
-            
-            self.conversation.compressed_at_turn = message_count
-            self.conversation.save()
-            
-            # Don't delete messages, just mark as compressed
+    @staticmethod
+    def _as_context_message(msg: Message) -> Dict[str, str]:
+        if msg.role == "function":
+            # Format function responses
+            return {
+                "role": "function",
+                "name": msg.function_name,
+                "content": json.dumps(msg.function_response)
+            }
+        return {"role": msg.role, "content": msg.content}
     
-    def _create_conversation_summary(self, messages: List[Message]) -> str:
-        """Create an intelligent summary of messages using AI"""
-        # Extract key information
-        topics_discussed = set()
-        metrics_checked = set()
-        recipes_viewed = []
-        user_goals = set()
-        
-        for msg in messages:
-            if msg.role == "user":
-                content_lower = msg.content.lower()
-                # Extract topics
-                if "weight" in content_lower or "bmi" in content_lower:
-                    topics_discussed.add("weight management")
-                if "meal" in content_lower or "recipe" in content_lower:
-                    topics_discussed.add("nutrition planning")
-                if "protein" in content_lower or "calories" in content_lower:
-                    topics_discussed.add("nutritional tracking")
-                    
-            elif msg.role == "function":
-                # Track what data was accessed
-                if msg.function_name == "get_health_metrics":
-                    metrics_checked.add(msg.function_args.get("metric_type", "health metrics"))
-                elif msg.function_name == "get_recipe_info":
-                    if msg.function_response and "recipe" in msg.function_response:
-                        recipe_title = msg.function_response["recipe"].get("title")
-                        if recipe_title:
-                            recipes_viewed.append(recipe_title)
-                elif msg.function_name == "get_progress_report":
-                    user_goals.add(msg.function_args.get("report_type", "progress"))
-        
-        # Build summary
-        summary_parts = []
-        
-        if topics_discussed:
-            summary_parts.append(f"Topics discussed: {', '.join(topics_discussed)}")
-        
-        if metrics_checked:
-            summary_parts.append(f"Health metrics reviewed: {', '.join(metrics_checked)}")
-        
-        if recipes_viewed:
-            summary_parts.append(f"Recipes explored: {', '.join(recipes_viewed[:3])}")
-        
-        if user_goals:
-            summary_parts.append(f"Progress tracked for: {', '.join(user_goals)}")
-        
-        # Add message count info
-        summary_parts.append(f"({len(messages)} messages summarized)")
-        
-        return " | ".join(summary_parts)
+    def _fill_token_counts(self, history: List[Message]):
+        """Count and save tokens for messages stored without a count"""
+        missing = []
+        for msg in history:
+            if not msg.token_count:
+                msg.token_count = self._count_tokens(self._as_context_message(msg)["content"])
+                if msg.token_count:
+                    missing.append(msg)
+        if missing:
+            Message.objects.bulk_update(missing, ['token_count'])
+    
+    def _schedule_compression(self):
+        """Queue a summary of the messages that have left the context window"""
+        message_count = self.conversation.messages.count()
+        if not compression_due(self.conversation, message_count, self.service.preferences):
+            return
+
+        conversation_id = str(self.conversation.id)
+        if not getattr(settings, 'CELERY_BROKER_URL', None):
+            # No broker (local development): run inline, it only reads the new messages
+            compress_conversation_task(conversation_id)
+            return
+
+        def enqueue():
+            try:
+                compress_conversation_task.delay(conversation_id)
+            except Exception as e:
+                logger.warning(f"Could not queue compression for conversation {conversation_id}: {e}")
+
+        transaction.on_commit(enqueue)
     
     def send_message(self, user_message: str) -> Dict[str, Any]:
         """Send a message to the AI assistant and get response"""
         try:
-            # Get recent messages for context extraction
-            recent_messages = Message.objects.filter(
-                conversation=self.conversation
-            ).order_by('-created_at')[:20]
-            
-            # Extract key information from conversation
-            context_info = self._extract_key_information(list(reversed(recent_messages)))
-            
-            # Resolve references in the user message
-            resolved_message = self._resolve_references(user_message, context_info)
-            
-            # Save user message
-            user_msg = Message.objects.create(
-                conversation=self.conversation,
-                role="user",
-                content=user_message,  # Save original message
-                token_count=self._count_tokens(user_message)
-            )
-            
-            # Update conversation
-            self.conversation.updated_at = timezone.now()
-            if not self.conversation.title:
-                # Generate title from first message
-                self.conversation.title = user_message[:50] + "..." if len(user_message) > 50 else user_message
-            self.conversation.save()
-            
-            # Get conversation context
-            messages, context_tokens = self._get_conversation_context()
-            
-            # Add the resolved message for better understanding
-            messages.append({"role": "user", "content": resolved_message})
-            
-            # Get available functions
-            functions = self.service.get_available_functions()
+            messages, context_tokens = self._start_turn(user_message)
             
             # Call OpenAI
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    functions=functions,
-                    function_call="auto",
-                    temperature=self.temperature,
-                    top_p=self.top_p,
-                    max_tokens=min(2000, self.max_tokens - context_tokens)
-                )
-            except openai.AuthenticationError as e:
-                raise Exception("OpenAI API authentication failed. Please check your API key.")
-            except openai.RateLimitError as e:
-                raise Exception("OpenAI API rate limit exceeded. Please try again later.")
-            except openai.APIError as e:
-                raise Exception(f"OpenAI API error: {str(e)}")
-            except Exception as e:
-                raise Exception(f"Unexpected error calling OpenAI API: {str(e)}")
+            response = self._call_llm(
+                self.llm.chat,
+                model=self.model,
+                messages=messages,
+                tools=self._get_tools(),
+                tool_choice="auto",
+                temperature=self.temperature,
+                top_p=self.top_p,
+                max_tokens=min(2000, self.max_tokens - context_tokens)
+            )
             
             # Process response
             assistant_message = response.choices[0].message
             
-            # Handle function calls
-            if assistant_message.function_call:
-                function_name = assistant_message.function_call.name
-                function_args = json.loads(assistant_message.function_call.arguments)
-                
-                # Execute function
-                function_result = self.service.execute_function(function_name, function_args)
-                
-                # Save function call message
-                func_msg = Message.objects.create(
-                    conversation=self.conversation,
-                    role="function",
-                    content=f"Called {function_name}",
-                    function_name=function_name,
-                    function_args=function_args,
-                    function_response=function_result
-                )
-                
-                # Add function result to context and get final response
-                messages.append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps(function_result)
-                })
+            # Handle tool calls (the model may request several at once)
+            function_names = []
+            if assistant_message.tool_calls:
+                tool_calls = [
+                    {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                    for call in assistant_message.tool_calls
+                ]
+                function_names = self._run_tool_calls(tool_calls, messages)
                 
-                # Get final response with function result
-                final_response = self.client.chat.completions.create(
+                # Get final response with the function results
+                final_response = self.llm.chat(
                     model=self.model,
                     messages=messages,
                     temperature=self.temperature,
@@ -269,33 +186,289 @@ class ConversationManager:
             else:
                 final_content = assistant_message.content
             
-            # Save assistant message
-            assistant_msg = Message.objects.create(
-                conversation=self.conversation,
-                role="assistant",
-                content=final_content,
-                token_count=self._count_tokens(final_content)
+            return self._finish_turn(final_content, function_names)
+            
+        except Exception as e:
+            self._record_error(e)
+            raise
+    
+    def stream_message(self, user_message: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of send_message.
+        
+        Yields events as the reply is generated: ``start`` (with the
+        conversation id), one ``function_call`` per function the model asked
+        for before they run, one ``token`` per content delta, and finally
+        ``done`` with the same fields send_message returns. The assistant
+        Message is saved once the reply is complete. If the consumer closes
+        the generator early (the client disconnected), the partial reply is
+        saved instead, or an error Message when nothing was generated yet.
+        """
+        content_parts = []
+        function_names = []
+        stream = None
+        finished = False
+        try:
+            messages, context_tokens = self._start_turn(user_message)
+            yield {"event": "start", "conversation_id": str(self.conversation.id)}
+            
+            stream = self._call_llm(
+                self.llm.chat_stream,
+                model=self.model,
+                messages=messages,
+                tools=self._get_tools(),
+                tool_choice="auto",
+                temperature=self.temperature,
+                top_p=self.top_p,
+                max_tokens=min(2000, self.max_tokens - context_tokens)
             )
             
-            # Check if we need to compress conversation
-            self._compress_conversation_if_needed()
+            tool_calls = {}
+            for delta in self._stream_deltas(stream):
+                if delta.tool_calls:
+                    # Each call's id, name and arguments arrive in fragments across chunks
+                    for fragment in delta.tool_calls:
+                        call = tool_calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": ""})
+                        call["id"] += fragment.id or ""
+                        if fragment.function:
+                            call["name"] += fragment.function.name or ""
+                            call["arguments"] += fragment.function.arguments or ""
+                elif delta.content:
+                    content_parts.append(delta.content)
+                    yield {"event": "token", "content": delta.content}
             
-            return {
-                "message": final_content,
-                "conversation_id": str(self.conversation.id),
-                "message_id": str(assistant_msg.id),
-                "function_called": assistant_message.function_call.name if assistant_message.function_call else None
-            }
+            if tool_calls:
+                tool_calls = [tool_calls[index] for index in sorted(tool_calls)]
+                for call in tool_calls:
+                    yield {"event": "function_call", "name": call["name"]}
+                function_names = self._run_tool_calls(tool_calls, messages)
+                
+                # Stream the final response with the function results
+                self._close_stream(stream)
+                content_parts = []
+                stream = self.llm.chat_stream(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    top_p=self.top_p
+                )
+                for delta in self._stream_deltas(stream):
+                    if delta.content:
+                        content_parts.append(delta.content)
+                        yield {"event": "token", "content": delta.content}
+            
+            result = self._finish_turn("".join(content_parts), function_names)
+            finished = True
+            yield {"event": "done", **result}
             
+        except GeneratorExit:
+            if not finished:
+                self._record_disconnect("".join(content_parts), function_names)
+            raise
         except Exception as e:
-            # Log error
-            error_msg = f"Error in conversation: {str(e)}"
-            Message.objects.create(
-                conversation=self.conversation,
-                role="system",
-                content=error_msg
-            )
+            self._record_error(e)
             raise
+        finally:
+            self._close_stream(stream)
+    
+    def _record_disconnect(self, partial_content: str, function_names: List[str]):
+        """Close out a turn whose client went away, so the next turn doesn't start after a bare user message"""
+        logger.info(f"Client disconnected from conversation {self.conversation.id} mid-reply")
+        try:
+            if partial_content:
+                self._finish_turn(partial_content, function_names)
+            else:
+                self._record_error(Exception("Client disconnected before the reply was generated"))
+        except Exception as e:
+            logger.error(f"Error saving interrupted turn: {str(e)}")
+    
+    @staticmethod
+    def _close_stream(stream):
+        """Release a completion stream's connection (and gateway slot) if it wasn't read to the end"""
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Error closing completion stream: {str(e)}")
+    
+    def _start_turn(self, user_message: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Save the user message and build the request context for it"""
+        # Get recent messages for context extraction and the context window
+        history = self._recent_messages(max(20, self.service.preferences.max_context_messages))
+        
+        # Extract key information from conversation
+        context_info = self._extract_key_information(list(reversed(history[:20])))
+        
+        # Resolve references in the user message
+        resolved_message = self._resolve_references(user_message, context_info)
+        
+        # Save user message
+        Message.objects.create(
+            conversation=self.conversation,
+            role="user",
+            content=user_message,  # Save original message
+            token_count=self._count_tokens(user_message)
+        )
+        
+        # Update conversation
+        self.conversation.updated_at = timezone.now()
+        if not self.conversation.title:
+            # Generate title from first message
+            self.conversation.title = user_message[:50] + "..." if len(user_message) > 50 else user_message
+        # Leave context_summary alone; the compression task writes it
+        self.conversation.save(update_fields=['updated_at', 'title'])
+        
+        # Get conversation context (history predates the new message, which is added resolved)
+        messages, context_tokens = self._get_conversation_context(history)
+        
+        # Add the resolved message for better understanding
+        messages.append({"role": "user", "content": resolved_message})
+        context_tokens += self._count_tokens(resolved_message) + MESSAGE_TOKEN_OVERHEAD
+        return messages, context_tokens
+    
+    def _call_llm(self, call, **request):
+        """Make the turn's first LLM call, turning API failures into readable errors"""
+        import openai
+        try:
+            return call(**request)
+        except openai.AuthenticationError:
+            raise Exception("OpenAI API authentication failed. Please check your API key.")
+        except openai.RateLimitError:
+            raise Exception("OpenAI API rate limit exceeded. Please try again later.")
+        except openai.APIError as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Unexpected error calling OpenAI API: {str(e)}")
+    
+    @staticmethod
+    def _stream_deltas(stream):
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta
+    
+    def _get_tools(self) -> List[Dict[str, Any]]:
+        return [{"type": "function", "function": function} for function in self.service.get_available_functions()]
+    
+    def _run_tool_calls(self, tool_calls: List[Dict[str, str]], messages: List[Dict[str, Any]]) -> List[str]:
+        """
+        Execute the functions the model asked for, save them and add their results to the context.
+        
+        Independent calls run concurrently; all of their Message rows are
+        written with one bulk_create. Returns the called function names.
+        """
+        messages.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in tool_calls
+            ]
+        })
+        
+        results = self._execute_tool_calls(tool_calls)
+        
+        function_messages = []
+        for call, (function_args, function_result) in zip(tool_calls, results):
+            function_content = json.dumps(function_result)
+            function_messages.append(Message(
+                conversation=self.conversation,
+                role="function",
+                content=f"Called {call['name']}",
+                function_name=call["name"],
+                function_args=function_args,
+                function_response=function_result,
+                token_count=self._count_tokens(function_content)
+            ))
+            
+            # Add function result to context
+            messages.append({"role": "tool", "tool_call_id": call["id"], "content": function_content})
+        
+        Message.objects.bulk_create(function_messages)
+        return [call["name"] for call in tool_calls]
+    
+    def _execute_tool_calls(self, tool_calls: List[Dict[str, str]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(arguments, result) per call; calls that fail or time out get an error result"""
+        parsed = []
+        for call in tool_calls:
+            try:
+                parsed.append(json.loads(call["arguments"] or "{}"))
+            except ValueError:
+                parsed.append(None)
+        
+        def run(call, function_args):
+            if function_args is None:
+                return {"error": f"Invalid arguments for {call['name']}"}
+            return self.service.execute_function(call["name"], function_args)
+        
+        if len(tool_calls) == 1:
+            return [(parsed[0] or {}, run(tool_calls[0], parsed[0]))]
+        
+        tools_config = getattr(settings, 'AI_ASSISTANT_TOOLS', {})
+        timeout = tools_config.get('timeout', 15)
+        max_workers = tools_config.get('max_parallel_calls', 4)
+        
+        # Load the profiles once here rather than in every worker thread
+        self.service.health_profile, self.service.nutrition_profile
+        
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(tool_calls)), thread_name_prefix='assistant-tool')
+        try:
+            futures = [executor.submit(self._run_in_thread, run, call, function_args)
+                       for call, function_args in zip(tool_calls, parsed)]
+            # The calls run concurrently, so one shared deadline is each call's timeout
+            deadline = time.monotonic() + timeout
+            results = []
+            for call, function_args, future in zip(tool_calls, parsed, futures):
+                try:
+                    result = future.result(timeout=max(0, deadline - time.monotonic()))
+                except FuturesTimeoutError:
+                    logger.warning(f"Assistant function {call['name']} timed out after {timeout}s")
+                    result = {"error": f"{call['name']} timed out"}
+                except Exception as e:
+                    result = {"error": str(e)}
+                results.append((function_args or {}, result))
+            return results
+        finally:
+            # Don't wait for timed-out calls; their results are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _run_in_thread(run, *args):
+        try:
+            return run(*args)
+        finally:
+            close_old_connections()
+    
+    def _finish_turn(self, final_content: str, function_names: List[str]) -> Dict[str, Any]:
+        """Save the assistant's reply and return the turn's result"""
+        # Save assistant message
+        assistant_msg = Message.objects.create(
+            conversation=self.conversation,
+            role="assistant",
+            content=final_content,
+            token_count=self._count_tokens(final_content)
+        )
+        
+        # Summarize older messages off the request path
+        self._schedule_compression()
+        
+        return {
+            "message": final_content,
+            "conversation_id": str(self.conversation.id),
+            "message_id": str(assistant_msg.id),
+            "function_called": function_names[0] if function_names else None,
+            "functions_called": function_names
+        }
+    
+    def _record_error(self, error: Exception):
+        # Log error
+        error_msg = f"Error in conversation: {str(error)}"
+        Message.objects.create(
+            conversation=self.conversation,
+            role="system",
+            content=error_msg,
+            token_count=self._count_tokens(error_msg)
+        )
     
     def _extract_key_information(self, messages: List[Message]) -> Dict[str, Any]:
         """Extract key information from conversation for context tracking"""
@@ -2,38 +2,23 @@
 import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.db.models import Avg, Count, Q
-import openai
+from .cache_versions import get_profile_context_version
 from .models import Conversation, Message, UserPreference
 from health_profiles.models import HealthProfile, WeightHistory, Activity
 from meal_planning.models import NutritionProfile, MealPlan, Recipe, NutritionLog
+from meal_planning.services.rag_recipe_service import RAGRecipeService
 from analytics.models import WellnessScore
 from .visualization_service import VisualizationService
 
 
-class AIAssistantService:
-    """Main service for handling AI assistant interactions"""
-    
-    def __init__(self, user):
-        self.user = user
-        self.health_profile = getattr(user, 'health_profile', None)
-        self.nutrition_profile = getattr(user, 'nutrition_profile', None)
-        self.preferences = self._get_or_create_preferences()
-        
-    def _get_or_create_preferences(self):
-        """Get or create user preferences for AI assistant"""
-        preferences, _ = UserPreference.objects.get_or_create(user=self.user)
-        return preferences
-    
-    def get_system_prompt(self):
-        """Generate the system prompt for the AI assistant"""
-        user_name = self.user.first_name or self.user.username
-        
-        # Get user's current data for personalization
-        current_data = self._get_user_context()
-        
-        system_prompt = f"""You are a wellness assistant helping {user_name} with health analytics and nutrition planning.
+# Seconds a user's cached profile context is kept; profile saves bump the version sooner
+PROFILE_CONTEXT_CACHE_TTL = 60 * 60 * 24
+
+SYSTEM_PROMPT_PREFIX = """You are a wellness assistant helping the user named in the user context below with health analytics and nutrition planning.
 
 ## Your capabilities include:
 - Answering questions about health metrics (BMI, weight, wellness score, activity level)
@@ -66,13 +51,6 @@ class AIAssistantService:
 - Do not access or discuss other users' data
 - Only provide information based on the user's own data
 
-## Current user context:
-- Name: {user_name}
-- Response preference: {self.preferences.response_mode}
-- Has health profile: {'Yes' if self.health_profile else 'No'}
-- Has nutrition profile: {'Yes' if self.nutrition_profile else 'No'}
-{current_data}
-
 ## Example interactions:
 
 ### Health Metrics Query:
@@ -81,7 +59,7 @@ Assistant: "Your current BMI is **24.2**, which falls in the normal range. This
 
 ### Progress Question:
 User: "How close am I to my weight goal?"
-Assistant: "You're making great progress, {user_name}! Your current weight is **75 kg** and your target is **72 kg**. You're just **3 kg** away from your goal. Based on your recent trend of losing 0.5 kg per week, you could reach your target in about 6 weeks if you maintain this pace."
+Assistant: "You're making great progress! Your current weight is **75 kg** and your target is **72 kg**. You're just **3 kg** away from your goal. Based on your recent trend of losing 0.5 kg per week, you could reach your target in about 6 weeks if you maintain this pace."
 
 ### Meal Plan Inquiry:
 User: "What's for lunch tomorrow?"
@@ -108,7 +86,7 @@ Would you like the detailed preparation instructions?"
 
 ### Nutritional Analysis:
 User: "Am I meeting my protein target?"
-Assistant: "You're doing well with protein today, {user_name}! 
+Assistant: "You're doing well with protein today! 
 
 **Current intake**: 78g (78% of target)
 **Daily target**: 100g
@@ -118,7 +96,7 @@ You'll easily meet your target with tonight's salmon dinner (+34g protein). Grea
 
 ### Multi-turn Context:
 User: "What's my weight?"
-Assistant: "Your current weight is **75 kg**, {user_name}."
+Assistant: "Your current weight is **75 kg**."
 
 User: "How has it changed?"
 Assistant: "Your weight has decreased by **2 kg** over the past month. You started at 77 kg and have been losing steadily at about 0.5 kg per week. This is a healthy and sustainable rate of weight loss!"
@@ -145,8 +123,65 @@ This chart shows the breakdown of your macronutrients (protein, carbs, fat) for
 Your macronutrient distribution is well-balanced and aligns with your fitness goals!"
 
 Remember to be helpful, accurate, and encouraging while maintaining appropriate boundaries."""
+
+
+class AIAssistantService:
+    """Main service for handling AI assistant interactions"""
+    
+    def __init__(self, user):
+        self.user = user
+        self.preferences = self._get_or_create_preferences()
+    
+    @cached_property
+    def health_profile(self):
+        return getattr(self.user, 'health_profile', None)
+    
+    @cached_property
+    def nutrition_profile(self):
+        return getattr(self.user, 'nutrition_profile', None)
+        
+    def _get_or_create_preferences(self):
+        """Get or create user preferences for AI assistant"""
+        preferences, _ = UserPreference.objects.get_or_create(user=self.user)
+        return preferences
+    
+    def get_system_prompt(self):
+        """Generate the system prompt for the AI assistant"""
+        return "\n\n".join(self.get_system_prompt_parts())
+    
+    def get_system_prompt_parts(self):
+        """
+        The system prompt as (static prefix, user block).
+        
+        The prefix is identical for every user and request, so it can be
+        counted once and cached by the provider; only the short user block
+        varies, and its profile part is cached until the profiles change.
+        """
+        user_name = self.user.first_name or self.user.username
+        user_block = f"""## Current user context:
+- Name: {user_name}
+- Response preference: {self.preferences.response_mode}
+{self._get_cached_profile_context()}"""
+        return SYSTEM_PROMPT_PREFIX, user_block
+    
+    def _get_cached_profile_context(self):
+        """Profile lines of the user block, cached per profile-context version"""
+        try:
+            key = f'ai_assistant:profile_context:{self.user.pk}:v{get_profile_context_version(self.user.pk)}'
+            profile_context = cache.get(key)
+        except Exception:
+            key, profile_context = None, None
         
-        return system_prompt
+        if profile_context is None:
+            profile_context = f"""- Has health profile: {'Yes' if self.health_profile else 'No'}
+- Has nutrition profile: {'Yes' if self.nutrition_profile else 'No'}
+{self._get_user_context()}"""
+            if key:
+                try:
+                    cache.set(key, profile_context, PROFILE_CONTEXT_CACHE_TTL)
+                except Exception:
+                    pass
+        return profile_context
     
     def _get_user_context(self):
         """Get current user context for system prompt"""
@@ -849,62 +884,77 @@ Remember to be helpful, accurate, and encouraging while maintaining appropriate
     def _search_recipes(self, query: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Search for recipes based on query and filters"""
         try:
-            # Base query
-            recipes = Recipe.objects.filter(
-                Q(title__icontains=query) | Q(ingredients__icontains=query)
-            )
-            
+            recipes = Recipe.objects.all()
+            filtered = False
+
             # Apply filters if provided
             if filters:
                 if "max_calories" in filters:
-                    recipes = recipes.filter(calories__lte=filters["max_calories"])
+                    recipes = recipes.filter(calories_per_serving__lte=filters["max_calories"])
+                    filtered = True
                 if "min_protein" in filters:
-                    recipes = recipes.filter(protein__gte=filters["min_protein"])
+                    recipes = recipes.filter(protein_per_serving__gte=filters["min_protein"])
+                    filtered = True
                 if "diet" in filters and filters["diet"] != "any":
-                    # Map diet to tags or dietary preferences
+                    # Map diet to dietary tags
                     diet_mapping = {
                         "vegetarian": "vegetarian",
-                        "vegan": "vegan", 
-                        "keto": "lowCarb",
+                        "vegan": "vegan",
+                        "keto": "ketogenic",
                         "paleo": "paleo"
                     }
                     if filters["diet"] in diet_mapping:
-                        recipes = recipes.filter(diets__contains=[diet_mapping[filters["diet"]]])
-            
-            # Limit results
-            recipes = recipes[:10]
-            
-            result = {"recipes": []}
-            for recipe in recipes:
+                        recipes = recipes.filter(dietary_tags__contains=[diet_mapping[filters["diet"]]])
+                        filtered = True
+
+            # Nearest neighbours over recipe embeddings; keyword match if nothing is embedded yet.
+            # Only restrict the index to candidates when a filter applied, so unfiltered
+            # searches can use the approximate index instead of an exact scan over every id.
+            rag_service = RAGRecipeService()
+            if filtered:
+                matches = rag_service.semantic_search_recipes(query, limit=10, queryset=recipes)
+            else:
+                matches = rag_service.semantic_search_recipes(query, limit=10)
+            search_method = "semantic"
+            if not matches:
+                matches = list(recipes.filter(
+                    Q(title__icontains=query) | Q(ingredients_data__icontains=query)
+                )[:10])
+                search_method = "keyword"
+
+            result = {"recipes": [], "search_method": search_method}
+            for recipe in matches:
                 recipe_data = {
-                    "id": recipe.id,
+                    "id": str(recipe.id),
                     "title": recipe.title,
-                    "ready_in_minutes": recipe.ready_in_minutes,
+                    "ready_in_minutes": recipe.total_time_minutes,
                     "servings": recipe.servings,
                     "nutrition": {
-                        "calories": recipe.calories,
-                        "protein": recipe.protein,
-                        "carbs": recipe.carbs,
-                        "fat": recipe.fat
+                        "calories": recipe.calories_per_serving,
+                        "protein": recipe.protein_per_serving,
+                        "carbs": recipe.carbs_per_serving,
+                        "fat": recipe.fat_per_serving
                     }
                 }
-                
+                if hasattr(recipe, "similarity_score"):
+                    recipe_data["similarity"] = round(recipe.similarity_score, 3)
+
                 # Check if recipe matches user's dietary preferences
                 if self.nutrition_profile and self.nutrition_profile.dietary_preferences:
                     matches_preferences = any(
-                        pref in (recipe.diets or []) 
+                        pref in (recipe.dietary_tags or [])
                         for pref in self.nutrition_profile.dietary_preferences
                     )
                     recipe_data["matches_preferences"] = matches_preferences
-                
+
                 result["recipes"].append(recipe_data)
-            
+
             result["total_found"] = len(result["recipes"])
             return result
-            
+
         except Exception as e:
             return {"error": f"Search failed: {str(e)}"}
-    
+
     def _get_user_preferences(self, preference_type: str) -> Dict[str, Any]:
         """Get user's dietary preferences, allergies, and targets"""
         result = {}
@@ -951,27 +1001,7 @@ Remember to be helpful, accurate, and encouraging while maintaining appropriate
     def _generate_visualization(self, chart_type: str, time_period: str = "month") -> Dict[str, Any]:
         """Generate data visualizations for health metrics and nutrition data"""
         try:
-            viz_service = VisualizationService(self.user)
-            
-            # Map chart types to visualization service methods
-            chart_mapping = {
-                "weight_trend": viz_service._generate_weight_trend_chart,
-                "protein_comparison": viz_service._generate_protein_comparison_chart,
-                "macronutrient_breakdown": viz_service._generate_macronutrient_breakdown_chart,
-                "calorie_trend": viz_service._generate_calorie_trend_chart,
-                "activity_summary": viz_service._generate_activity_chart,
-                "wellness_score": viz_service._generate_wellness_score_chart
-            }
-            
-            if chart_type not in chart_mapping:
-                return {"error": f"Unknown chart type: {chart_type}"}
-            
-            # Call the appropriate method
-            if chart_type == "macronutrient_breakdown":
-                # This method doesn't take time_period
-                result = chart_mapping[chart_type]()
-            else:
-                result = chart_mapping[chart_type](time_period)
+            result = VisualizationService(self.user).get_chart(chart_type, time_period)
             
             # Add metadata for the AI to describe the chart
             if "error" not in result:
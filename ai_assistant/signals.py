@@ -0,0 +1,64 @@
+# ai_assistant/signals.py
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from analytics.models import WellnessScore
+from analytics.signals import wellness_scores_saved
+from health_profiles.models import Activity, HealthProfile, WeightHistory
+from meal_planning.models import NutritionLog, NutritionProfile
+
+from .cache_versions import bump_profile_context_version, invalidate_chart_data
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=HealthProfile)
+@receiver(post_delete, sender=HealthProfile)
+@receiver(post_save, sender=NutritionProfile)
+@receiver(post_delete, sender=NutritionProfile)
+def invalidate_profile_context(sender, instance, **kwargs):
+    """The assistant's cached system prompt block describes these profiles"""
+    try:
+        bump_profile_context_version(instance.user_id)
+    except Exception as e:
+        logger.warning(f"Could not invalidate assistant profile context for user {instance.user_id}: {e}")
+
+
+@receiver(post_save, sender=HealthProfile)
+@receiver(post_delete, sender=HealthProfile)
+@receiver(post_save, sender=NutritionProfile)
+@receiver(post_delete, sender=NutritionProfile)
+@receiver(post_save, sender=NutritionLog)
+@receiver(post_delete, sender=NutritionLog)
+def invalidate_user_charts(sender, instance, **kwargs):
+    """Cached charts plot these rows (and the profiles' targets)"""
+    try:
+        invalidate_chart_data([instance.user_id])
+    except Exception as e:
+        logger.warning(f"Could not invalidate charts for user {instance.user_id}: {e}")
+
+
+@receiver(post_save, sender=WeightHistory)
+@receiver(post_delete, sender=WeightHistory)
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+@receiver(post_save, sender=WellnessScore)
+@receiver(post_delete, sender=WellnessScore)
+def invalidate_health_profile_charts(sender, instance, **kwargs):
+    """As invalidate_user_charts, for rows keyed by health profile"""
+    try:
+        invalidate_chart_data([instance.health_profile.user_id])
+    except Exception as e:
+        logger.warning(f"Could not invalidate charts for health profile {instance.health_profile_id}: {e}")
+
+
+@receiver(wellness_scores_saved)
+def invalidate_scored_charts(sender, health_profile_ids, **kwargs):
+    """Batch scoring bulk creates WellnessScore rows without post_save"""
+    try:
+        user_ids = HealthProfile.objects.filter(pk__in=health_profile_ids).values_list('user_id', flat=True)
+        invalidate_chart_data(list(user_ids))
+    except Exception as e:
+        logger.warning(f"Could not invalidate charts after batch scoring: {e}")
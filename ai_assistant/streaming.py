@@ -0,0 +1,60 @@
+# ai_assistant/streaming.py
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable
+
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+def format_sse(event: Dict[str, Any]) -> bytes:
+    """Encode one event dict (``{'event': name, ...}``) as a Server-Sent Events frame"""
+    payload = {key: value for key, value in event.items() if key != 'event'}
+    return f"event: {event['event']}\ndata: {json.dumps(payload, default=str)}\n\n".encode('utf-8')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets SSE clients (``Accept: text/event-stream``) through content negotiation; errors render as an ``error`` event"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_sse({'event': 'error', **(data if isinstance(data, dict) else {'error': data})})
+
+
+async def sse_stream(events: Iterable[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Serve a blocking event iterator as an SSE response body.
+
+    StreamingHttpResponse buffers synchronous iterators under ASGI, so each
+    event is pulled in the request's sync thread (ORM and LLM calls stay
+    there) and written out as soon as it is ready. An exception ends the
+    stream with an ``error`` event, since the status line has already been sent.
+    If the response is cancelled (the client disconnected), the event
+    iterator is closed in that same thread so it can clean up.
+    """
+    iterator = iter(events)
+    pull = sync_to_async(next)
+    exhausted = False
+    try:
+        while True:
+            try:
+                event = await pull(iterator, _END)
+            except Exception as e:
+                exhausted = True
+                logger.error(f"Error while streaming assistant response: {str(e)}", exc_info=True)
+                yield format_sse({'event': 'error', 'error': f"An error occurred: {str(e)}"})
+                return
+            if event is _END:
+                exhausted = True
+                return
+            yield format_sse(event)
+    finally:
+        close = getattr(iterator, 'close', None)
+        if not exhausted and close is not None:
+            await sync_to_async(close)()
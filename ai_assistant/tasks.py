@@ -0,0 +1,36 @@
+from celery import shared_task
+from django.core.cache import cache
+import logging
+import uuid
+
+from .compression import compress_conversation
+from .models import Conversation
+
+logger = logging.getLogger(__name__)
+
+# Seconds a compression run may hold its conversation's lock
+COMPRESSION_LOCK_TIMEOUT = 300
+
+
+@shared_task(bind=True, max_retries=3)
+def compress_conversation_task(self, conversation_id):
+    """
+    Background task to fold a conversation's older messages into its rolling summary
+    """
+    lock_key = f'ai_assistant:compress_lock:{conversation_id}'
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, COMPRESSION_LOCK_TIMEOUT):
+        # Another run is compressing this conversation; the next turn queues any remainder
+        return {'success': False, 'skipped': 'already running', 'conversation_id': conversation_id}
+
+    try:
+        result = compress_conversation(conversation_id)
+        return {'success': True, 'conversation_id': conversation_id, **result}
+    except Conversation.DoesNotExist:
+        return {'success': False, 'error': 'Conversation not found', 'conversation_id': conversation_id}
+    except Exception as e:
+        logger.error(f"Error compressing conversation {conversation_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=30)
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
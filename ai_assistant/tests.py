@@ -1,4 +1,300 @@
 # ai_assistant/tests.py
-from django.test import TestCase
+import json
+import threading
+import time
+from unittest.mock import patch
 
-# Create your tests here.
\ No newline at end of file
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from health_profiles.models import HealthProfile, WeightHistory
+from meal_planning.services.rag_recipe_service import RAGRecipeService
+from utils.llm_gateway import FakeLLMBackend, override_llm_backend
+
+from . import compression
+from .conversation_manager import ConversationManager
+from .models import Message, UserPreference
+from .services import SYSTEM_PROMPT_PREFIX, AIAssistantService
+from .streaming import sse_stream
+from .tasks import compress_conversation_task
+from .visualization_service import VisualizationService
+
+User = get_user_model()
+
+
+def tool_call(call_id, name, **arguments):
+    return {'id': call_id, 'type': 'function', 'function': {'name': name, 'arguments': json.dumps(arguments)}}
+
+
+def parse_sse(body: bytes):
+    events = []
+    for frame in body.decode('utf-8').strip().split('\n\n'):
+        name, data = frame.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class StreamMessageTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamer', email='streamer@example.com', password='testpass123')
+
+    def reply(self, request):
+        if request['messages'][-1]['role'] == 'tool':
+            return 'You have logged three workouts this week.'
+        return {'tool_calls': [tool_call('call_1', 'get_health_metrics', metric_type='all')]}
+
+    async def stream(self, message):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('conversation-stream-message'), {'message': message},
+            content_type='application/json', headers={'accept': 'text/event-stream'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_sse(b''.join([chunk async for chunk in response.streaming_content]))
+
+    async def test_streams_tokens_after_inline_function_call(self):
+        backend = FakeLLMBackend(responder=self.reply)
+        with override_llm_backend(backend):
+            events = await self.stream('How active was I this week?')
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[:2], ['start', 'function_call'])
+        self.assertEqual(names[-1], 'done')
+        self.assertGreater(names.count('token'), 1)
+        self.assertTrue(all(request['stream'] for request in backend.requests))
+
+        streamed = ''.join(data['content'] for name, data in events if name == 'token')
+        done = events[-1][1]
+        self.assertEqual(streamed, 'You have logged three workouts this week.')
+        self.assertEqual(done['function_called'], 'get_health_metrics')
+
+        saved = await Message.objects.aget(id=done['message_id'])
+        self.assertEqual((saved.role, saved.content), ('assistant', streamed))
+        self.assertTrue(await Message.objects.filter(role='function', function_name='get_health_metrics').aexists())
+
+    def test_disconnect_mid_reply_saves_partial_reply(self):
+        with override_llm_backend(FakeLLMBackend(responder=lambda request: 'Drink more water every day.')):
+            events = ConversationManager(self.user).stream_message('Any tips?')
+            names = [next(events)['event'], next(events)['event'], next(events)['event']]
+            events.close()
+
+        self.assertEqual(names, ['start', 'token', 'token'])
+        latest = Message.objects.order_by('-created_at').first()
+        self.assertEqual((latest.role, latest.content), ('assistant', 'Drink more'))
+
+    def test_disconnect_before_reply_records_error(self):
+        with override_llm_backend(FakeLLMBackend()):
+            events = ConversationManager(self.user).stream_message('Any tips?')
+            next(events)
+            events.close()
+
+        self.assertEqual(
+            list(Message.objects.values_list('role', flat=True).order_by('created_at')),
+            ['user', 'system'],
+        )
+
+    async def test_cancelled_sse_stream_closes_event_iterator(self):
+        closed = []
+
+        def events():
+            try:
+                yield {'event': 'start'}
+                yield {'event': 'token', 'content': 'never sent'}
+            finally:
+                closed.append(True)
+
+        body = sse_stream(events())
+        self.assertTrue((await body.__anext__()).startswith(b'event: start'))
+        await body.aclose()
+        self.assertEqual(closed, [True])
+
+
+class ConversationContextTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='context', email='context@example.com', password='testpass123')
+        with override_llm_backend(FakeLLMBackend()):
+            self.manager = ConversationManager(self.user)
+        self.manager.service.get_system_prompt_parts = lambda: ('You are a wellness assistant.', '## Current user context:')
+
+    def add_message(self, role, content, **fields):
+        return Message.objects.create(conversation=self.manager.conversation, role=role, content=content, **fields)
+
+    def test_context_uses_stored_token_counts_and_fills_missing_ones(self):
+        self.add_message('user', 'How much protein did I eat?', token_count=7)
+        function_msg = self.add_message('function', 'Called get_nutrition_summary', function_name='get_nutrition_summary',
+                                        function_response={'protein_g': 92})
+        self.add_message('assistant', 'You ate **92 g** of protein today.', token_count=11)
+
+        # One ordered query, plus one update for the missing count
+        with self.assertNumQueries(2):
+            messages, tokens = self.manager._get_conversation_context()
+        function_msg.refresh_from_db()
+        self.assertGreater(function_msg.token_count, 0)
+        self.assertEqual([message['role'] for message in messages], ['system', 'user', 'function', 'assistant'])
+
+        with self.assertNumQueries(1):
+            again, again_tokens = self.manager._get_conversation_context()
+        self.assertEqual((again, again_tokens), (messages, tokens))
+
+    def test_packs_newest_messages_first_when_over_budget(self):
+        for index in range(5):
+            self.add_message('user', f'message {index}', token_count=1000)
+
+        messages, tokens = self.manager._get_conversation_context()
+
+        self.assertEqual([message['content'] for message in messages[1:]], ['message 3', 'message 4'])
+        self.assertLessEqual(tokens, self.manager.max_tokens * 0.7)
+
+
+class SystemPromptTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='prompted', email='prompted@example.com', password='testpass123')
+        self.health_profile = HealthProfile.objects.create(
+            user=self.user, age=30, height_cm=175, weight_kg=80, activity_level='moderate', fitness_goal='general_fitness',
+        )
+
+    def test_profile_block_is_cached_until_a_profile_changes(self):
+        service = AIAssistantService(self.user)
+        prefix, user_block = service.get_system_prompt_parts()
+        self.assertIs(prefix, SYSTEM_PROMPT_PREFIX)
+        self.assertIn('- Current weight: 80', user_block)
+
+        # Only the preferences lookup; the profiles aren't queried while the block is cached
+        with self.assertNumQueries(1):
+            self.assertEqual(AIAssistantService(self.user).get_system_prompt_parts(), (prefix, user_block))
+
+        self.health_profile.weight_kg = 78
+        self.health_profile.save()
+        self.assertIn('- Current weight: 78', AIAssistantService(self.user).get_system_prompt_parts()[1])
+
+
+class ToolCallTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tools', email='tools@example.com', password='testpass123')
+
+    def reply(self, request):
+        if request['messages'][-1]['role'] == 'tool':
+            return 'Protein is on target and activity is up this month.'
+        return {'tool_calls': [
+            tool_call('call_1', 'get_nutrition_analysis', period='month'),
+            tool_call('call_2', 'get_activity_summary', period='month'),
+        ]}
+
+    def slow_function(self, function_name, arguments):
+        time.sleep(0.3 if function_name == 'get_nutrition_analysis' else 0.2)
+        return {'function': function_name, 'thread': threading.current_thread().name}
+
+    def test_parallel_tool_calls_resolve_in_one_round_trip(self):
+        backend = FakeLLMBackend(responder=self.reply)
+        with override_llm_backend(backend), patch.object(AIAssistantService, 'execute_function', side_effect=self.slow_function):
+            started = time.monotonic()
+            result = ConversationManager(self.user).send_message('Compare my protein and activity this month')
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual(len(backend.requests), 2)
+        self.assertEqual(result['functions_called'], ['get_nutrition_analysis', 'get_activity_summary'])
+
+        tool_results = [message for message in backend.requests[1]['messages'] if message['role'] == 'tool']
+        self.assertEqual([message['tool_call_id'] for message in tool_results], ['call_1', 'call_2'])
+        saved = Message.objects.filter(role='function').order_by('function_name')
+        self.assertEqual([message.function_name for message in saved], ['get_activity_summary', 'get_nutrition_analysis'])
+        self.assertEqual(len({message.function_response['thread'] for message in saved}), 2)
+
+    @override_settings(AI_ASSISTANT_TOOLS={'max_parallel_calls': 4, 'timeout': 0.1})
+    def test_slow_tool_call_times_out(self):
+        with override_llm_backend(FakeLLMBackend(responder=self.reply)), \
+                patch.object(AIAssistantService, 'execute_function', side_effect=self.slow_function):
+            ConversationManager(self.user).send_message('Compare my protein and activity this month')
+
+        responses = {message.function_name: message.function_response for message in Message.objects.filter(role='function')}
+        self.assertEqual(responses['get_nutrition_analysis'], {'error': 'get_nutrition_analysis timed out'})
+
+
+class RecipeSearchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='recipes', email='recipes@example.com', password='testpass123')
+        self.service = AIAssistantService(self.user)
+
+    def test_unfiltered_search_does_not_restrict_candidates(self):
+        with patch.object(RAGRecipeService, 'semantic_search_recipes', return_value=[]) as search:
+            self.service._search_recipes('thai curry')
+            self.service._search_recipes('thai curry', {'diet': 'any'})
+
+        for call in search.call_args_list:
+            self.assertNotIn('queryset', call.kwargs)
+
+    def test_filtered_search_passes_queryset(self):
+        with patch.object(RAGRecipeService, 'semantic_search_recipes', return_value=[]) as search:
+            self.service._search_recipes('thai curry', {'max_calories': 500})
+
+        self.assertIn('queryset', search.call_args.kwargs)
+
+
+class ConversationCompressionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='compressed', email='compressed@example.com', password='testpass123')
+        UserPreference.objects.create(user=self.user, auto_compress_after=6, max_context_messages=4)
+        with override_llm_backend(FakeLLMBackend()):
+            self.manager = ConversationManager(self.user)
+        self.conversation = self.manager.conversation
+
+    def add_messages(self, *contents):
+        for content in contents:
+            Message.objects.create(conversation=self.conversation, role='user', content=content)
+
+    def test_each_run_summarizes_only_new_messages(self):
+        self.add_messages('What is my BMI?', 'ok', 'ok', 'ok', 'Suggest a high protein meal', 'ok', 'ok', 'ok')
+        result = compress_conversation_task(str(self.conversation.id))
+        self.assertEqual((result['compressed'], result['compressed_at_turn']), (4, 4))
+
+        self.add_messages('ok', 'ok')
+        with patch('ai_assistant.compression.summarize_messages', wraps=compression.summarize_messages) as summarize:
+            result = compress_conversation_task(str(self.conversation.id))
+        self.assertEqual(len(summarize.call_args.args[0]), 2)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.compressed_at_turn, 6)
+        self.assertEqual(
+            self.conversation.context_summary,
+            'Topics discussed: weight management, nutrition planning, nutritional tracking | (6 messages summarized)',
+        )
+
+        # Nothing new outside the context window
+        self.assertEqual(compress_conversation_task(str(self.conversation.id))['compressed'], 0)
+
+    def test_concurrent_run_is_skipped(self):
+        self.add_messages(*['ok'] * 8)
+        cache.add(f'ai_assistant:compress_lock:{self.conversation.id}', 'other-worker')
+
+        result = compress_conversation_task(str(self.conversation.id))
+
+        self.assertEqual(result['skipped'], 'already running')
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.compressed_at_turn, 0)
+
+
+class ChartCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='charted', email='charted@example.com', password='testpass123')
+        self.health_profile = HealthProfile.objects.create(
+            user=self.user, age=30, height_cm=175, weight_kg=80, activity_level='moderate', fitness_goal='general_fitness',
+        )
+        WeightHistory.objects.create(health_profile=self.health_profile, weight_kg=80)
+
+    def test_chart_is_cached_until_the_users_data_changes(self):
+        service = VisualizationService(self.user)
+        chart = service.get_chart('weight_trend', 'month')
+        self.assertEqual(json.loads(json.dumps(chart['chart_config'])), chart['chart_config'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(service.generate_chart('show my weight trend', 'month'), chart)
+
+        WeightHistory.objects.create(health_profile=self.health_profile, weight_kg=79)
+        redrawn = service.get_chart('weight_trend', 'month')
+        self.assertEqual(len(redrawn['chart_config']['data'][0]['y']), len(chart['chart_config']['data'][0]['y']) + 1)
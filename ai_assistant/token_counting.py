@@ -0,0 +1,48 @@
+# ai_assistant/token_counting.py
+import logging
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Tokens the chat format adds around each message (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str):
+    """
+    Return the tiktoken encoding for ``model``, loaded once per process.
+
+    Loading can download the BPE file; if that fails the failure is cached
+    too and counts fall back to a characters/4 estimate for the process.
+    """
+    if model not in _encodings:
+        with _encodings_lock:
+            if model not in _encodings:
+                try:
+                    import tiktoken
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except Exception as e:
+                    logger.warning(f"tiktoken encoding for {model} unavailable, estimating token counts: {e}")
+                    _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count tokens in a text string"""
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        # Fallback: rough estimate
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=256)
+def count_static_tokens(text: str, model: str) -> int:
+    """count_tokens memoized by text, for prompt sections repeated on every turn"""
+    return count_tokens(text, model)
@@ -4,13 +4,17 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.db.models import Q
 
 from .models import Conversation, Message, UserPreference
 from .serializers import ConversationSerializer, MessageSerializer, UserPreferenceSerializer
 from .conversation_manager import ConversationManager
+from .streaming import EventStreamRenderer, sse_stream
 from .visualization_service import VisualizationService
+from utils.downsampling import parse_max_points
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -58,6 +62,43 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['post'], renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def stream_message(self, request):
+        """Send a message to the AI assistant and stream the reply as Server-Sent Events"""
+        message = request.data.get('message', '').strip()
+        conversation_id = request.data.get('conversation_id')
+        
+        if not message:
+            return Response(
+                {"error": "Message cannot be empty"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            manager = ConversationManager(request.user, conversation_id)
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.error(f"Error in stream_message: {str(e)}", exc_info=True)
+            
+            return Response(
+                {"error": f"An error occurred: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        suggestions = VisualizationService(request.user).suggest_visualization(message)
+        
+        def events():
+            for event in manager.stream_message(message):
+                if event["event"] == "done" and suggestions:
+                    event["visualization_suggestions"] = suggestions
+                yield event
+        
+        response = StreamingHttpResponse(sse_stream(events()), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+        return response
+    
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         """Get conversation history"""
@@ -166,9 +207,17 @@ class VisualizationViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        try:
+            max_points = parse_max_points(request.data.get('max_points'))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "max_points must be an integer of at least 3"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         try:
             viz_service = VisualizationService(request.user)
-            chart_data = viz_service.generate_chart(chart_request, time_period)
+            chart_data = viz_service.generate_chart(chart_request, time_period, max_points)
             
             if 'error' in chart_data:
                 return Response(chart_data, status=status.HTTP_400_BAD_REQUEST)
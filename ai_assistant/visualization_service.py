@@ -1,48 +1,110 @@
 # ai_assistant/visualization_service.py
-import json
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from datetime import datetime, timedelta
+from django.core.cache import cache
 from django.utils import timezone
 from django.db.models import Avg, Sum, Count
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.utils import PlotlyJSONEncoder
 
 from health_profiles.models import WeightHistory, Activity
 from meal_planning.models import NutritionLog
 from analytics.models import WellnessScore
+from utils.downsampling import lttb_indices, take
+from .cache_versions import get_chart_data_version
+
+# plotly is heavy and most processes never draw a chart, so the builders import it
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+# Seconds a rendered chart is kept; data changes bump the version sooner
+CHART_CACHE_TTL = 60 * 60 * 24
+
+
+def figure_spec(fig: 'go.Figure') -> Dict[str, Any]:
+    """Plotly figure as a plain dict; the traces here only hold str/int/float values"""
+    return fig.to_dict()
 
 
 class VisualizationService:
     """Service for generating data visualizations based on natural language requests"""
     
+    # Chart type -> builder method
+    CHART_BUILDERS = {
+        "weight_trend": "_generate_weight_trend_chart",
+        "protein_comparison": "_generate_protein_comparison_chart",
+        "macronutrient_breakdown": "_generate_macronutrient_breakdown_chart",
+        "calorie_trend": "_generate_calorie_trend_chart",
+        "activity_summary": "_generate_activity_chart",
+        "wellness_score": "_generate_wellness_score_chart",
+    }
+    
     def __init__(self, user):
         self.user = user
         self.health_profile = getattr(user, 'health_profile', None)
         self.nutrition_profile = getattr(user, 'nutrition_profile', None)
     
-    def generate_chart(self, request_type: str, time_period: str = "month") -> Dict[str, Any]:
+    # Charts that accept max_points (long raw time series)
+    DOWNSAMPLED_CHARTS = ("weight_trend", "calorie_trend")
+    
+    def generate_chart(self, request_type: str, time_period: str = "month", max_points: Optional[int] = None) -> Dict[str, Any]:
         """Generate chart based on request type"""
         request_lower = request_type.lower()
         
         # Determine chart type based on request
         if "weight" in request_lower and ("trend" in request_lower or "change" in request_lower):
-            return self._generate_weight_trend_chart(time_period)
+            return self.get_chart("weight_trend", time_period, max_points)
         elif "protein" in request_lower and ("compare" in request_lower or "target" in request_lower):
-            return self._generate_protein_comparison_chart(time_period)
+            return self.get_chart("protein_comparison", time_period)
         elif "macronutrient" in request_lower or "macro" in request_lower:
-            return self._generate_macronutrient_breakdown_chart()
+            return self.get_chart("macronutrient_breakdown")
         elif "activity" in request_lower or "exercise" in request_lower:
-            return self._generate_activity_chart(time_period)
+            return self.get_chart("activity_summary", time_period)
         elif "wellness" in request_lower and "score" in request_lower:
-            return self._generate_wellness_score_chart(time_period)
+            return self.get_chart("wellness_score", time_period)
         elif "calorie" in request_lower:
-            return self._generate_calorie_trend_chart(time_period)
+            return self.get_chart("calorie_trend", time_period, max_points)
         else:
             return {"error": "Unable to determine chart type from request"}
     
-    def _generate_weight_trend_chart(self, time_period: str) -> Dict[str, Any]:
-        """Generate weight trend line chart"""
+    def get_chart(self, chart_type: str, time_period: str = "month", max_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Chart for ``chart_type``, cached per (user, chart, period, max_points, data version, day).
+
+        Saving or deleting the user's weight, activity, nutrition log, wellness
+        score or profile rows bumps the data version (see signals.py); the day
+        keeps windows relative to now from going stale.
+        """
+        builder = self.CHART_BUILDERS.get(chart_type)
+        if builder is None:
+            return {"error": f"Unknown chart type: {chart_type}"}
+        if chart_type == "macronutrient_breakdown":
+            time_period = "today"  # Always today's breakdown
+        if chart_type not in self.DOWNSAMPLED_CHARTS:
+            max_points = None
+        
+        try:
+            key = (f'ai_assistant:chart:{self.user.pk}:{chart_type}:{time_period}:{max_points}'
+                   f':v{get_chart_data_version(self.user.pk)}:{timezone.localdate().isoformat()}')
+            chart = cache.get(key)
+        except Exception:
+            key, chart = None, None
+        
+        if chart is None:
+            if chart_type == "macronutrient_breakdown":
+                chart = getattr(self, builder)()
+            elif chart_type in self.DOWNSAMPLED_CHARTS:
+                chart = getattr(self, builder)(time_period, max_points)
+            else:
+                chart = getattr(self, builder)(time_period)
+            if key:
+                try:
+                    cache.set(key, chart, CHART_CACHE_TTL)
+                except Exception:
+                    pass
+        return chart
+    
+    def _generate_weight_trend_chart(self, time_period: str, max_points: Optional[int] = None) -> Dict[str, Any]:
+        """Generate weight trend line chart; ``max_points`` downsamples the line (LTTB)"""
         if not self.health_profile:
             return {"error": "No health profile found"}
         
@@ -67,11 +129,17 @@ class VisualizationService:
         # Create line chart
         dates = [w.recorded_at.strftime('%Y-%m-%d') for w in weights]
         values = [float(w.weight_kg) for w in weights]
+        plotted_dates, plotted_values = dates, values
+        if max_points is not None and max_points < len(values):
+            indices = lttb_indices([w.recorded_at.timestamp() for w in weights], values, max_points)
+            plotted_dates, plotted_values = take(dates, indices), take(values, indices)
+        
+        import plotly.graph_objects as go
         
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=dates,
-            y=values,
+            x=plotted_dates,
+            y=plotted_values,
             mode='lines+markers',
             name='Weight',
             line=dict(color='#4F46E5', width=3),
@@ -97,7 +165,7 @@ class VisualizationService:
         
         return {
             "chart_type": "line",
-            "chart_config": json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder)),
+            "chart_config": figure_spec(fig),
             "summary": f"Weight changed from {values[0]:.1f}kg to {values[-1]:.1f}kg ({values[-1] - values[0]:+.1f}kg)"
         }
     
@@ -129,6 +197,8 @@ class VisualizationService:
         protein_values = [float(log['total_protein'] or 0) for log in logs]
         target_values = [float(self.nutrition_profile.protein_target)] * len(dates)
         
+        import plotly.graph_objects as go
+        
         fig = go.Figure()
         
         # Actual protein intake
@@ -160,7 +230,7 @@ class VisualizationService:
         avg_protein = sum(protein_values) / len(protein_values) if protein_values else 0
         return {
             "chart_type": "bar",
-            "chart_config": json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder)),
+            "chart_config": figure_spec(fig),
             "summary": f"Average protein intake: {avg_protein:.1f}g/day (Target: {self.nutrition_profile.protein_target}g)"
         }
     
@@ -192,6 +262,8 @@ class VisualizationService:
         values = [protein, carbs, fat]
         colors = ['#3B82F6', '#10B981', '#F59E0B']
         
+        import plotly.graph_objects as go
+        
         fig = go.Figure(data=[go.Pie(
             labels=labels,
             values=values,
@@ -211,7 +283,7 @@ class VisualizationService:
         total_grams = protein + carbs + fat
         return {
             "chart_type": "pie",
-            "chart_config": json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder)),
+            "chart_config": figure_spec(fig),
             "summary": f"Total macros: {total_grams:.1f}g (Protein: {protein:.1f}g, Carbs: {carbs:.1f}g, Fat: {fat:.1f}g)"
         }
     
@@ -243,6 +315,8 @@ class VisualizationService:
         activity_types = [a['activity_type'] for a in activities]
         durations = [a['total_duration'] for a in activities]
         
+        import plotly.graph_objects as go
+        
         fig = go.Figure(data=[
             go.Bar(
                 x=activity_types,
@@ -266,7 +340,7 @@ class VisualizationService:
         
         return {
             "chart_type": "bar",
-            "chart_config": json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder)),
+            "chart_config": figure_spec(fig),
             "summary": f"Total: {total_duration} minutes across {total_sessions} sessions"
         }
     
@@ -294,6 +368,8 @@ class VisualizationService:
         # Create line chart with multiple traces
         dates = [s.calculated_at.strftime('%Y-%m-%d') for s in scores]
         
+        import plotly.graph_objects as go
+        
         fig = go.Figure()
         
         # Total score
@@ -335,12 +411,12 @@ class VisualizationService:
         latest_score = scores.last()
         return {
             "chart_type": "line",
-            "chart_config": json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder)),
+            "chart_config": figure_spec(fig),
             "summary": f"Current wellness score: {latest_score.total_score}/100"
         }
     
-    def _generate_calorie_trend_chart(self, time_period: str) -> Dict[str, Any]:
-        """Generate calorie intake trend chart"""
+    def _generate_calorie_trend_chart(self, time_period: str, max_points: Optional[int] = None) -> Dict[str, Any]:
+        """Generate calorie intake trend chart; ``max_points`` downsamples the bars (LTTB)"""
         if not self.nutrition_profile:
             return {"error": "No nutrition profile found"}
         
@@ -365,22 +441,28 @@ class VisualizationService:
         # Create combination chart
         dates = [log['date'].strftime('%Y-%m-%d') for log in logs]
         calorie_values = [float(log['total_calories'] or 0) for log in logs]
-        target_values = [float(self.nutrition_profile.calorie_target)] * len(dates)
+        plotted_dates, plotted_values = dates, calorie_values
+        if max_points is not None and max_points < len(calorie_values):
+            indices = lttb_indices([log['date'].toordinal() for log in logs], calorie_values, max_points)
+            plotted_dates, plotted_values = take(dates, indices), take(calorie_values, indices)
+        target_values = [float(self.nutrition_profile.calorie_target)] * len(plotted_dates)
+        
+        import plotly.graph_objects as go
         
         fig = go.Figure()
         
         # Actual calories as bars
         fig.add_trace(go.Bar(
-            x=dates,
-            y=calorie_values,
+            x=plotted_dates,
+            y=plotted_values,
             name='Actual Intake',
             marker_color=['#10B981' if c <= self.nutrition_profile.calorie_target * 1.1 
-                         else '#F59E0B' for c in calorie_values]
+                         else '#F59E0B' for c in plotted_values]
         ))
         
         # Target line
         fig.add_trace(go.Scatter(
-            x=dates,
+            x=plotted_dates,
             y=target_values,
             mode='lines',
             name='Target',
@@ -402,7 +484,7 @@ class VisualizationService:
         
         return {
             "chart_type": "bar",
-            "chart_config": json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder)),
+            "chart_config": figure_spec(fig),
             "summary": f"Average: {avg_calories:.0f} cal/day | On target {adherence_days}/{len(calorie_values)} days"
         }
     
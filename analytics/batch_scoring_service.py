@@ -0,0 +1,341 @@
+# analytics/batch_scoring_service.py
+from datetime import timedelta
+import logging
+import time
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Milestone, WellnessScore
+from .services import NUTRITION_AVAILABLE
+from .signals import wellness_scores_saved
+from health_profiles.models import HealthProfile, WeightHistory, Activity
+
+if NUTRITION_AVAILABLE:
+    from meal_planning.models import NutritionProfile, NutritionLog
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWellnessScoreService:
+    """
+    Wellness scores for many health profiles at once.
+
+    Mirrors WellnessScoreService.calculate_comprehensive_score, but loads each
+    chunk of profiles with a handful of grouped aggregate queries (activities,
+    weight history, milestones, nutrition) instead of ~20 queries per user,
+    scores every component as NumPy arrays and saves the WellnessScore rows
+    with bulk_create.
+    """
+
+    ACTIVITY_LEVEL_SCORES = {'sedentary': 25, 'light': 45, 'moderate': 70, 'active': 85, 'very_active': 95}
+    REQUIRED_FIELDS = ('age', 'gender', 'height_cm', 'weight_kg', 'activity_level', 'fitness_goal')
+    OPTIONAL_FIELDS = (
+        'occupation_type', 'target_weight_kg', 'weekly_activity_days', 'fitness_level',
+        'preferred_environment', 'time_preference', 'dietary_preference',
+    )
+    COMPONENTS = ('bmi_score', 'activity_score', 'progress_score', 'habits_score', 'nutrition_score')
+    WEIGHTS = np.array([0.25, 0.25, 0.15, 0.15, 0.20])
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+
+    # === PUBLIC API ===
+
+    def run(self, profiles=None, chunk_size: int = 2000, save: bool = True) -> int:
+        """Score ``profiles`` (default: every HealthProfile) chunk by chunk; returns profiles scored"""
+        profiles = profiles if profiles is not None else HealthProfile.objects.all()
+        profile_ids = list(profiles.order_by('pk').values_list('pk', flat=True))
+        started = time.monotonic()
+
+        for start in range(0, len(profile_ids), chunk_size):
+            chunk_ids = profile_ids[start:start + chunk_size]
+            ids, scores = self.score_profiles(chunk_ids)
+            if save:
+                self.save_scores(ids, scores)
+            logger.info(f"Scored {start + len(chunk_ids)}/{len(profile_ids)} health profiles")
+
+        logger.info(f"Batch wellness scoring of {len(profile_ids)} profiles took {time.monotonic() - started:.1f}s")
+        return len(profile_ids)
+
+    def score_profiles(self, profile_ids):
+        """
+        Returns (health_profile_ids, scores) where ``scores`` maps each entry of
+        COMPONENTS plus 'total_score' to an array aligned with the ids.
+        """
+        data = self._load(profile_ids)
+        scores = {
+            'bmi_score': self.bmi_scores(data),
+            'activity_score': self.activity_scores(data),
+            'progress_score': self.progress_scores(data),
+            'habits_score': self.habits_scores(data),
+            'nutrition_score': self.nutrition_scores(data),
+        }
+        components = np.column_stack([scores[name] for name in self.COMPONENTS])
+        scores = {name: np.round(values, 2) for name, values in scores.items()}
+        scores['total_score'] = np.round(components @ self.WEIGHTS, 2)
+        return data['id'], scores
+
+    @classmethod
+    def save_scores(cls, profile_ids, scores) -> None:
+        rows = [
+            WellnessScore(
+                health_profile_id=profile_id,
+                bmi_score=float(scores['bmi_score'][i]),
+                activity_score=float(scores['activity_score'][i]),
+                progress_score=float(scores['progress_score'][i]),
+                habits_score=float(scores['habits_score'][i]),
+                total_score=float(scores['total_score'][i]),
+            )
+            for i, profile_id in enumerate(profile_ids)
+        ]
+        with transaction.atomic():
+            WellnessScore.objects.bulk_create(rows, batch_size=1000)
+        wellness_scores_saved.send(sender=cls, health_profile_ids=list(profile_ids))
+
+    # === LOADING ===
+
+    def _load(self, profile_ids):
+        """Per-profile arrays for one chunk, aligned on health profile id"""
+        now = self.now
+        two_weeks_ago = now - timedelta(days=14)
+        thirty_days_ago = now - timedelta(days=30)
+        sixty_days_ago = now - timedelta(days=60)
+
+        first_weight = WeightHistory.objects.filter(health_profile=OuterRef('pk')).order_by('recorded_at')
+        profiles = list(
+            HealthProfile.objects.filter(pk__in=profile_ids).order_by('pk')
+            .annotate(starting_weight=Subquery(first_weight.values('weight_kg')[:1]))
+            .values('id', 'user_id', 'target_weight_kg', 'starting_weight', *self.REQUIRED_FIELDS, *self.OPTIONAL_FIELDS)
+        )
+        n = len(profiles)
+        ids = np.array([p['id'] for p in profiles], dtype=np.int64)
+        user_ids = [p['user_id'] for p in profiles]
+        row_by_profile = {profile_id: row for row, profile_id in enumerate(ids.tolist())}
+        row_by_user = {user_id: row for row, user_id in enumerate(user_ids)}
+
+        def column(key, default=np.nan):
+            return np.array([float(p[key]) if p[key] else default for p in profiles], dtype=np.float64)
+
+        def filled(keys):
+            return np.array([[p[key] is not None and p[key] != '' for key in keys] for p in profiles], dtype=bool).reshape(n, len(keys))
+
+        data = {
+            'id': ids,
+            'height_cm': column('height_cm'),
+            'weight_kg': column('weight_kg'),
+            'target_weight_kg': column('target_weight_kg'),
+            'starting_weight': np.array([
+                float(p['starting_weight']) if p['starting_weight'] is not None else np.nan for p in profiles
+            ]),
+            'activity_base': np.array([self.ACTIVITY_LEVEL_SCORES.get(p['activity_level'], 50) for p in profiles], dtype=np.float64),
+            'required_filled': filled(self.REQUIRED_FIELDS),
+            'optional_filled': filled(self.OPTIONAL_FIELDS),
+        }
+
+        # Activities: every window the per-user helpers look at, in one grouped query
+        recent = Q(performed_at__gte=two_weeks_ago)
+        last_30 = Q(performed_at__gte=thirty_days_ago)
+        week_windows = {
+            f'week_{week}': Count('id', filter=Q(
+                performed_at__gte=thirty_days_ago + timedelta(weeks=week),
+                performed_at__lt=thirty_days_ago + timedelta(weeks=week, days=7),
+            ))
+            for week in range(4)
+        }
+        activity_columns = ('count_14', 'duration_14', 'days_14', 'count_30', 'count_prev_30') + tuple(week_windows)
+        activity = self._grouped(
+            Activity.objects.filter(health_profile_id__in=ids.tolist(), performed_at__gte=sixty_days_ago),
+            'health_profile_id', row_by_profile, n, activity_columns,
+            count_14=Count('id', filter=recent),
+            duration_14=Sum('duration_minutes', filter=recent),
+            days_14=Count(TruncDate('performed_at'), filter=recent, distinct=True),
+            count_30=Count('id', filter=last_30),
+            count_prev_30=Count('id', filter=Q(performed_at__lt=thirty_days_ago)),
+            **week_windows,
+        )
+        data.update(activity)
+
+        data.update(self._grouped(
+            WeightHistory.objects.filter(health_profile_id__in=ids.tolist(), recorded_at__gte=thirty_days_ago),
+            'health_profile_id', row_by_profile, n, ('weight_entries_30',),
+            weight_entries_30=Count('id'),
+        ))
+        data.update(self._grouped(
+            Milestone.objects.filter(user_id__in=user_ids, achieved_at__gte=thirty_days_ago),
+            'user_id', row_by_user, n, ('milestones_30',),
+            milestones_30=Count('id'),
+        ))
+
+        if NUTRITION_AVAILABLE:
+            data.update(self._load_nutrition(user_ids, row_by_user, n))
+        return data
+
+    @staticmethod
+    def _grouped(queryset, key, rows, n, columns, **aggregates):
+        """Run one GROUP BY ``key`` query and scatter the aggregates into zero-filled arrays"""
+        arrays = {name: np.zeros(n) for name in columns}
+        for group in queryset.values(key).order_by().annotate(**aggregates):
+            row = rows[group[key]]
+            for name in columns:
+                arrays[name][row] = group[name] or 0
+        return arrays
+
+    def _load_nutrition(self, user_ids, row_by_user, n):
+        today = self.now.date()
+        nutrition = {
+            'has_nutrition_profile': np.zeros(n, dtype=bool),
+            'nutrition_completeness': np.zeros(n),
+        }
+        for profile in NutritionProfile.objects.filter(user_id__in=user_ids).values(
+            'user_id', 'calorie_target', 'protein_target', 'carb_target', 'fat_target',
+            'dietary_preferences', 'meals_per_day'
+        ):
+            row = row_by_user[profile['user_id']]
+            nutrition['has_nutrition_profile'][row] = True
+            nutrition['nutrition_completeness'][row] = sum([
+                profile['calorie_target'] > 0,
+                profile['protein_target'] > 0,
+                profile['carb_target'] > 0,
+                profile['fat_target'] > 0,
+                len(profile['dietary_preferences'] or []) > 0,
+                profile['meals_per_day'] > 0,
+            ])
+
+        # Same tolerance as calculate_nutrition_score: calories within 15%, protein within 20%
+        calorie_target = F('user__nutrition_profile__calorie_target')
+        protein_target = F('user__nutrition_profile__protein_target')
+        recent_week = Q(date__gte=today - timedelta(days=7))
+        nutrition.update(self._grouped(
+            NutritionLog.objects.filter(user_id__in=user_ids, date__gte=today - timedelta(days=30)),
+            'user_id', row_by_user, n, ('logs_30', 'logs_7', 'on_target_7'),
+            logs_30=Count('id', filter=Q(date__lte=today)),
+            logs_7=Count('id', filter=recent_week),
+            on_target_7=Count('id', filter=recent_week & Q(
+                user__nutrition_profile__calorie_target__gt=0,
+                user__nutrition_profile__protein_target__gt=0,
+                total_calories__gte=calorie_target * 0.85,
+                total_calories__lte=calorie_target * 1.15,
+                total_protein__gte=protein_target * 0.8,
+                total_protein__lte=protein_target * 1.2,
+            )),
+        ))
+        return nutrition
+
+    # === COMPONENT SCORES ===
+
+    @staticmethod
+    def _steps(values, thresholds, scores, default=0.0):
+        """First score whose threshold ``values`` reaches (thresholds in descending order)"""
+        return np.select([values >= threshold for threshold in thresholds], scores, default)
+
+    def bmi_scores(self, data):
+        height_m = data['height_cm'] / 100
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bmi = data['weight_kg'] / (height_m * height_m)
+        bmi = np.nan_to_num(bmi, nan=0.0)
+
+        return np.select(
+            [
+                bmi <= 0,
+                (bmi >= 18.5) & (bmi <= 24.9),
+                bmi < 15.0,
+                bmi < 16.5,
+                bmi < 18.5,
+                bmi <= 29.9,
+                bmi <= 34.9,
+                bmi <= 39.9,
+            ],
+            [
+                50.0,
+                np.maximum(95.0, 100.0 - np.abs(bmi - 21.7) * 2),
+                20.0,
+                35.0,
+                np.maximum(0.0, 85.0 - (18.5 - bmi) * 42.5),
+                np.maximum(60.0, 85.0 - (bmi - 24.9) * 5),
+                np.maximum(40.0, 60.0 - (bmi - 29.9) * 4),
+                np.maximum(25.0, 40.0 - (bmi - 34.9) * 3),
+            ],
+            np.maximum(15.0, 25.0 - (bmi - 39.9) * 2),
+        )
+
+    def activity_scores(self, data):
+        count = data['count_14']
+        volume = np.select(
+            [count == 0, count <= 3, count <= 7, count <= 14],
+            [0.0, count * 7, 21 + (count - 3) * 4, 37 + (count - 7) * 2],
+            np.minimum(60, 51 + (count - 14)),
+        )
+        duration_bonus = self._steps(data['duration_14'], [300, 180, 120, 60], [15, 12, 8, 5])
+        activity_volume = np.minimum(volume + duration_bonus, 75)
+
+        days = data['days_14']
+        consistency = np.select(
+            [days == 0, days <= 2, days <= 5, days <= 10],
+            [0.0, days * 8, 16 + (days - 2) * 6, 34 + (days - 5) * 4],
+            np.minimum(65, 54 + (days - 10)),
+        )
+
+        final = data['activity_base'] * 0.4 + activity_volume * 0.35 + consistency * 0.25
+        return np.clip(final, 0.0, 100.0)
+
+    def progress_scores(self, data):
+        milestone_bonus = self._steps(data['milestones_30'], [5, 3, 2, 1], [30, 25, 18, 12])
+
+        current, target, start = data['weight_kg'], data['target_weight_kg'], data['starting_weight']
+        has_goal = ~np.isnan(current) & ~np.isnan(target) & ~np.isnan(start)
+        needed = np.abs(start - target)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            progress_pct = np.abs(start - current) / needed * 100
+        weight_bonus = np.where(
+            needed == 0, 15.0,
+            self._steps(np.nan_to_num(progress_pct, nan=0.0), [100, 75, 50, 25, 10], [15, 12, 8, 5, 2])
+        )
+        weight_bonus = np.where(has_goal, weight_bonus, 0.0)
+
+        recent, previous = data['count_30'], data['count_prev_30']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            improvement = (recent - previous) / previous * 100
+        trend_bonus = np.where(
+            previous == 0,
+            np.where(recent > 0, 3.0, 0.0),
+            self._steps(np.nan_to_num(improvement, nan=0.0), [50, 25, 10, 0], [5, 3, 2, 1]),
+        )
+
+        return np.clip(50.0 + milestone_bonus + weight_bonus + trend_bonus, 0.0, 100.0)
+
+    def habits_scores(self, data):
+        completeness = (
+            data['required_filled'].sum(axis=1) / len(self.REQUIRED_FIELDS) * 15
+            + data['optional_filled'].sum(axis=1) / len(self.OPTIONAL_FIELDS) * 5
+        )
+
+        weight_logging = self._steps(data['weight_entries_30'], [8, 4, 2, 1], [15, 12, 8, 4])
+        activity_logging = self._steps(data['count_30'], [12, 8, 4, 2, 1], [15, 12, 8, 4, 2])
+
+        weekly = np.column_stack([data[f'week_{week}'] for week in range(4)])
+        avg_weekly = weekly.mean(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cv = np.nan_to_num(weekly.std(axis=1) / avg_weekly, nan=1.0)
+        multiplier = np.select([cv <= 0.3, cv <= 0.5, cv <= 0.8], [1.0, 0.8, 0.6], 0.4)
+        base_regularity = self._steps(avg_weekly, [3, 2, 1], [20, 15, 10], 5)
+        regularity = np.where((data['count_30'] > 0) & (avg_weekly > 0), base_regularity * multiplier, 0.0)
+
+        return np.clip(30.0 + completeness + weight_logging + activity_logging + regularity, 0.0, 100.0)
+
+    def nutrition_scores(self, data):
+        n = len(data['id'])
+        if not NUTRITION_AVAILABLE:
+            return np.full(n, 50.0)
+
+        logging_score = self._steps(data['logs_30'], [20, 15, 10, 5], [30, 25, 20, 15], 5)
+        logs_7 = data['logs_7']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            adherence = np.where(logs_7 > 0, data['on_target_7'] / logs_7 * 30.0, 10.0)
+        completeness = data['nutrition_completeness'] / 6 * 20.0
+
+        score = np.clip(20.0 + logging_score + adherence + completeness, 0.0, 100.0)
+        return np.where(data['has_nutrition_profile'], score, 25.0)
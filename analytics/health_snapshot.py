@@ -0,0 +1,168 @@
+# analytics/health_snapshot.py
+from datetime import timedelta
+from functools import cached_property
+from typing import List, Optional
+
+from django.utils import timezone
+
+from .models import Milestone
+from health_profiles.models import HealthProfile, WeightHistory, Activity
+from utils.lazy_imports import lazy_import
+
+try:
+    from meal_planning.models import NutritionProfile, NutritionLog
+    NUTRITION_AVAILABLE = True
+except ImportError:
+    NUTRITION_AVAILABLE = False
+
+np = lazy_import('numpy')
+
+
+class UserHealthSnapshot:
+    """
+    Activity, weight, milestone and nutrition data for one user, loaded once.
+
+    Every WellnessScoreService component, the MilestoneService checks and the
+    score descriptions read from the same snapshot, so a full score
+    calculation issues one query per dataset instead of one per helper.
+    Each dataset is loaded lazily on first use, covering the widest window
+    any consumer needs (ACTIVITY_WINDOW_DAYS of activities,
+    NUTRITION_WINDOW_DAYS of nutrition logs, full weight and milestone
+    history), and all time windows are measured from the same ``now``.
+    """
+
+    ACTIVITY_WINDOW_DAYS = 60
+    NUTRITION_WINDOW_DAYS = 30
+
+    def __init__(self, user, health_profile: Optional[HealthProfile] = None, now=None):
+        self.user = user
+        self.now = now or timezone.now()
+        if health_profile is not None:
+            self.health_profile = health_profile
+
+    @cached_property
+    def health_profile(self) -> HealthProfile:
+        """Raises HealthProfile.DoesNotExist like a direct lookup would"""
+        return HealthProfile.objects.get(user=self.user)
+
+    def _since(self, days) -> float:
+        return (self.now - timedelta(days=days)).timestamp()
+
+    # === ACTIVITIES ===
+
+    @cached_property
+    def _activities(self):
+        rows = list(
+            Activity.objects.filter(
+                health_profile=self.health_profile,
+                performed_at__gte=self.now - timedelta(days=self.ACTIVITY_WINDOW_DAYS)
+            ).order_by().values_list('performed_at', 'duration_minutes')
+        )
+        timestamps = np.array([performed_at.timestamp() for performed_at, _ in rows], dtype=np.float64)
+        durations = np.array([duration for _, duration in rows], dtype=np.float64)
+        # Calendar days in the active timezone, as QuerySet.dates() would group them
+        days = np.array([timezone.localtime(performed_at).date().toordinal() for performed_at, _ in rows], dtype=np.int64)
+        return timestamps, durations, days
+
+    def _activity_mask(self, since_days, until_days=None) -> 'np.ndarray':
+        timestamps = self._activities[0]
+        mask = timestamps >= self._since(since_days)
+        if until_days is not None:
+            mask &= timestamps < self._since(until_days)
+        return mask
+
+    def activity_count(self, since_days, until_days=None) -> int:
+        """Activities performed from ``since_days`` ago up to ``until_days`` ago (or now)"""
+        return int(np.count_nonzero(self._activity_mask(since_days, until_days)))
+
+    def activity_minutes(self, since_days) -> float:
+        return float(self._activities[1][self._activity_mask(since_days)].sum())
+
+    def activity_days(self, since_days) -> int:
+        """Distinct calendar days with at least one activity"""
+        return len(np.unique(self._activities[2][self._activity_mask(since_days)]))
+
+    def weekly_activity_counts(self, since_days, weeks) -> List[int]:
+        """Activity counts in consecutive 7-day windows starting ``since_days`` ago"""
+        timestamps = self._activities[0]
+        start = self.now - timedelta(days=since_days)
+        counts = []
+        for week in range(weeks):
+            week_start = (start + timedelta(weeks=week)).timestamp()
+            week_end = (start + timedelta(weeks=week, days=7)).timestamp()
+            counts.append(int(np.count_nonzero((timestamps >= week_start) & (timestamps < week_end))))
+        return counts
+
+    @cached_property
+    def total_activity_count(self) -> int:
+        return Activity.objects.filter(health_profile=self.health_profile).count()
+
+    # === WEIGHT HISTORY ===
+
+    @cached_property
+    def weight_history(self):
+        """(recorded_at, weight_kg) pairs, oldest first"""
+        return list(
+            WeightHistory.objects.filter(health_profile=self.health_profile)
+            .order_by('recorded_at').values_list('recorded_at', 'weight_kg')
+        )
+
+    @property
+    def starting_weight(self):
+        return self.weight_history[0][1] if self.weight_history else None
+
+    def weight_entries(self, since_days) -> int:
+        since = self.now - timedelta(days=since_days)
+        return sum(1 for recorded_at, _ in self.weight_history if recorded_at >= since)
+
+    # === MILESTONES ===
+
+    @cached_property
+    def milestones(self) -> List[Milestone]:
+        return list(Milestone.objects.filter(user=self.user))
+
+    def milestone_count(self, since_days) -> int:
+        since = self.now - timedelta(days=since_days)
+        return sum(1 for milestone in self.milestones if milestone.achieved_at >= since)
+
+    def has_milestone(self, milestone_type, description_contains=None, progress_percentage=None) -> bool:
+        return any(
+            milestone.milestone_type == milestone_type
+            and (description_contains is None or description_contains in milestone.description)
+            and (progress_percentage is None or milestone.progress_percentage == progress_percentage)
+            for milestone in self.milestones
+        )
+
+    def add_milestone(self, milestone: Milestone):
+        """Record a milestone created during this calculation"""
+        self.milestones.append(milestone)
+
+    # === NUTRITION ===
+
+    @cached_property
+    def nutrition_profile(self):
+        if not NUTRITION_AVAILABLE:
+            return None
+        return NutritionProfile.objects.filter(user=self.user).first()
+
+    @cached_property
+    def _nutrition_logs(self):
+        today = self.now.date()
+        rows = list(
+            NutritionLog.objects.filter(
+                user=self.user, date__gte=today - timedelta(days=self.NUTRITION_WINDOW_DAYS)
+            ).order_by().values_list('date', 'total_calories', 'total_protein')
+        )
+        days = np.array([(log_date - today).days for log_date, _, _ in rows], dtype=np.int64)
+        macros = np.array([[calories or 0, protein or 0] for _, calories, protein in rows], dtype=np.float64).reshape(len(rows), 2)
+        return days, macros
+
+    def nutrition_logged_days(self, since_days) -> int:
+        """Logs dated from ``since_days`` ago through today"""
+        days = self._nutrition_logs[0]
+        return int(np.count_nonzero((days >= -since_days) & (days <= 0)))
+
+    def nutrition_logs_since(self, since_days) -> 'np.ndarray':
+        """(calories, protein) rows for logs dated ``since_days`` ago or later"""
+        days, macros = self._nutrition_logs
+        return macros[days >= -since_days]
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from analytics.batch_scoring_service import BatchWellnessScoreService
+from health_profiles.models import HealthProfile
+import time
+
+
+class Command(BaseCommand):
+    help = 'Calculate and save wellness scores for all users in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only score this user (can be repeated)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Health profiles loaded and scored per chunk (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calculate scores without saving them'
+        )
+
+    def handle(self, *args, **options):
+        profiles = HealthProfile.objects.all()
+        if options['user_ids']:
+            profiles = profiles.filter(user_id__in=options['user_ids'])
+
+        self.stdout.write(f"Scoring {profiles.count()} health profiles")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No scores will be saved'))
+
+        started = time.monotonic()
+        scored = BatchWellnessScoreService().run(
+            profiles, chunk_size=options['chunk_size'], save=not options['dry_run']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} health profiles in {time.monotonic() - started:.1f}s"
+        ))
@@ -2,16 +2,16 @@
 from decimal import Decimal
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Count, Avg, Sum
 import logging
 
 # Import the models that are used in this file
 from .models import Milestone, WellnessScore
-from health_profiles.models import HealthProfile, WeightHistory, Activity
+from .health_snapshot import UserHealthSnapshot
+from health_profiles.models import HealthProfile
 
 # Import nutrition models for enhanced wellness scoring
 try:
-    from meal_planning.models import NutritionProfile, NutritionLog
+    from meal_planning.models import NutritionProfile
     NUTRITION_AVAILABLE = True
 except ImportError:
     NUTRITION_AVAILABLE = False
@@ -20,20 +20,20 @@ logger = logging.getLogger(__name__)
 
 class MilestoneService:
     @staticmethod
-    def check_weight_milestone(user):
+    def check_weight_milestone(user, snapshot=None):
         """
         Check if user has achieved a weight milestone (every 5% towards goal)
         """
         try:
-            profile = HealthProfile.objects.get(user=user)
+            snapshot = snapshot or UserHealthSnapshot(user)
+            profile = snapshot.health_profile
 
             # Only proceed if user has a target weight
             if not profile.target_weight_kg or not profile.weight_kg:
                 return None
 
             # Calculate starting weight (either from history or current weight)
-            weight_history = WeightHistory.objects.filter(health_profile=profile).order_by('recorded_at')
-            starting_weight = weight_history.first().weight_kg if weight_history.exists() else profile.weight_kg
+            starting_weight = snapshot.starting_weight if snapshot.weight_history else profile.weight_kg
 
             # Calculate current progress percentage
             target_weight = Decimal(profile.target_weight_kg)
@@ -47,11 +47,7 @@ class MilestoneService:
             # First check if the goal has been reached (within 0.5 kg tolerance)
             if abs(current_weight - target_weight) <= 0.5:
                 # Check if we already have a weight goal achievement milestone
-                existing_milestone = Milestone.objects.filter(
-                    user=user,
-                    milestone_type='weight',
-                    description__contains='Reached weight goal'
-                ).exists()
+                existing_milestone = snapshot.has_milestone('weight', description_contains='Reached weight goal')
 
                 if not existing_milestone:
                     # Create the milestone
@@ -62,6 +58,7 @@ class MilestoneService:
                         progress_value=float(current_weight),
                         progress_percentage=100  # 100% achievement
                     )
+                    snapshot.add_milestone(milestone)
                     return milestone
 
             # If goal not reached yet, check for progress milestones
@@ -80,11 +77,7 @@ class MilestoneService:
                 # Check if we just crossed this threshold
                 if progress_percentage >= threshold:
                     # See if we already recorded this milestone
-                    existing_milestone = Milestone.objects.filter(
-                        user=user,
-                        milestone_type='weight',
-                        progress_percentage=threshold
-                    ).exists()
+                    existing_milestone = snapshot.has_milestone('weight', progress_percentage=threshold)
 
                     if not existing_milestone:
                         # Create new milestone
@@ -95,6 +88,7 @@ class MilestoneService:
                             progress_value=float(current_weight),
                             progress_percentage=threshold
                         )
+                        snapshot.add_milestone(milestone)
                         return milestone
 
             return None
@@ -103,12 +97,13 @@ class MilestoneService:
             return None
 
     @staticmethod
-    def check_activity_milestone(user, new_activity_days):
+    def check_activity_milestone(user, new_activity_days, snapshot=None):
         """
         Check if user has achieved an activity milestone (additional day per week)
         """
         try:
-            profile = HealthProfile.objects.get(user=user)
+            snapshot = snapshot or UserHealthSnapshot(user)
+            profile = snapshot.health_profile
 
             # If we don't have activity data, we can't track milestones
             if profile.weekly_activity_days is None:
@@ -126,6 +121,7 @@ class MilestoneService:
                     progress_value=new_activity_days,
                     progress_percentage=(new_activity_days / 7) * 100
                 )
+                snapshot.add_milestone(milestone)
 
                 # Update the profile with new activity days
                 profile.weekly_activity_days = new_activity_days
@@ -210,15 +206,15 @@ class MilestoneService:
             return None
 
     @staticmethod
-    def check_weight_logging_streak(user):
+    def check_weight_logging_streak(user, snapshot=None):
         """
         Check if user has achieved a streak for consistently logging weight
         """
         try:
-            profile = HealthProfile.objects.get(user=user)
-            weight_entries = WeightHistory.objects.filter(health_profile=profile).order_by('recorded_at')
+            snapshot = snapshot or UserHealthSnapshot(user)
+            weight_entries = snapshot.weight_history
 
-            if not weight_entries or weight_entries.count() < 3:
+            if len(weight_entries) < 3:
                 return None  # Need at least 3 entries to consider a streak
 
             # Calculate the streak by checking for daily entries
@@ -226,8 +222,8 @@ class MilestoneService:
             max_streak = 1
 
             for i in range(1, len(weight_entries)):
-                current_date = weight_entries[i].recorded_at.date()
-                prev_date = weight_entries[i - 1].recorded_at.date()
+                current_date = weight_entries[i][0].date()
+                prev_date = weight_entries[i - 1][0].date()
 
                 # If entries are on consecutive days
                 if (current_date - prev_date).days == 1:
@@ -245,11 +241,9 @@ class MilestoneService:
 
             if max_streak in streak_milestones:
                 # Check if we already have this milestone
-                existing_milestone = Milestone.objects.filter(
-                    user=user,
-                    milestone_type='habit',
-                    description__contains=f"{max_streak}-day streak for weight logging"
-                ).exists()
+                existing_milestone = snapshot.has_milestone(
+                    'habit', description_contains=f"{max_streak}-day streak for weight logging"
+                )
 
                 if not existing_milestone:
                     milestone = Milestone.objects.create(
@@ -259,6 +253,7 @@ class MilestoneService:
                         progress_value=max_streak,
                         progress_percentage=None
                     )
+                    snapshot.add_milestone(milestone)
                     return milestone
 
             return None
@@ -270,22 +265,18 @@ class MilestoneService:
             return None
 
     @staticmethod
-    def check_activity_milestone_by_count(user):
+    def check_activity_milestone_by_count(user, snapshot=None):
         """
         Check if user has achieved an activity count milestone
         """
         try:
-            profile = HealthProfile.objects.get(user=user)
-            activity_count = Activity.objects.filter(health_profile=profile).count()
+            snapshot = snapshot or UserHealthSnapshot(user)
+            activity_count = snapshot.total_activity_count
             count_milestones = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
 
             for count in count_milestones:
                 if activity_count == count:
-                    existing_milestone = Milestone.objects.filter(
-                        user=user,
-                        milestone_type='activity',
-                        description__contains=f"{count} activities"
-                    ).exists()
+                    existing_milestone = snapshot.has_milestone('activity', description_contains=f"{count} activities")
 
                     if not existing_milestone:
                         milestone = Milestone.objects.create(
@@ -295,6 +286,7 @@ class MilestoneService:
                             progress_value=count,
                             progress_percentage=None  # Not applicable for count milestones
                         )
+                        snapshot.add_milestone(milestone)
                         return milestone
 
             return None
@@ -310,20 +302,24 @@ class WellnessScoreService:
     """
     Enhanced wellness score calculation service
     Maintains backward compatibility with existing API structure
+
+    Components take an optional UserHealthSnapshot so one calculation loads
+    each dataset once; without one they build their own.
     """
 
     @staticmethod
-    def calculate_comprehensive_score(health_profile, user):
+    def calculate_comprehensive_score(health_profile, user, snapshot=None):
         """
         Calculate detailed wellness score with all four components
         Returns: dict with individual scores and total
         """
         try:
+            snapshot = snapshot or UserHealthSnapshot(user, health_profile)
             bmi_score = WellnessScoreService.calculate_bmi_score(health_profile)
-            activity_score = WellnessScoreService.calculate_activity_score(health_profile, user)
-            progress_score = WellnessScoreService.calculate_progress_score(health_profile, user)
-            habits_score = WellnessScoreService.calculate_habits_score(health_profile, user)
-            nutrition_score = WellnessScoreService.calculate_nutrition_score(health_profile, user)
+            activity_score = WellnessScoreService.calculate_activity_score(health_profile, user, snapshot)
+            progress_score = WellnessScoreService.calculate_progress_score(health_profile, user, snapshot)
+            habits_score = WellnessScoreService.calculate_habits_score(health_profile, user, snapshot)
+            nutrition_score = WellnessScoreService.calculate_nutrition_score(health_profile, user, snapshot)
 
             # Adjust weights to include nutrition component
             total_score = (
@@ -397,7 +393,7 @@ class WellnessScoreService:
                 return max(15.0, 25.0 - ((bmi - 39.9) * 2))
 
     @staticmethod
-    def calculate_activity_score(health_profile, user):
+    def calculate_activity_score(health_profile, user, snapshot=None):
         """
         Sophisticated activity scoring based on multiple factors:
         - Base activity level (40% of score)
@@ -416,17 +412,11 @@ class WellnessScoreService:
             base_score = activity_level_scores.get(health_profile.activity_level, 50)
 
             # Recent activity analysis (last 14 days for better pattern recognition)
-            two_weeks_ago = timezone.now() - timedelta(days=14)
-            recent_activities = Activity.objects.filter(
-                health_profile=health_profile,
-                performed_at__gte=two_weeks_ago
-            )
+            snapshot = snapshot or UserHealthSnapshot(user, health_profile)
 
             # Activity volume score (35% weight) - based on frequency and duration
-            activity_count = recent_activities.count()
-            total_duration = recent_activities.aggregate(
-                total=Sum('duration_minutes')
-            )['total'] or 0
+            activity_count = snapshot.activity_count(14)
+            total_duration = snapshot.activity_minutes(14)
 
             # Score based on activity count (0-30 points)
             if activity_count == 0:
@@ -455,7 +445,7 @@ class WellnessScoreService:
             activity_volume_score = min(volume_score + duration_bonus, 75)
 
             # Consistency score (25% weight) - activity spread across days
-            unique_activity_days = recent_activities.dates('performed_at', 'day').distinct().count()
+            unique_activity_days = snapshot.activity_days(14)
 
             if unique_activity_days == 0:
                 consistency_score = 0
@@ -487,22 +477,17 @@ class WellnessScoreService:
             return activity_level_scores.get(health_profile.activity_level, 50)
 
     @staticmethod
-    def calculate_progress_score(health_profile, user):
+    def calculate_progress_score(health_profile, user, snapshot=None):
         """
         Progress scoring based on goal achievements and milestones
         Considers recent achievements and goal proximity
         """
         try:
+            snapshot = snapshot or UserHealthSnapshot(user, health_profile)
             base_score = 50.0  # Starting point
 
             # Recent milestones boost (last 30 days)
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-            recent_milestones = Milestone.objects.filter(
-                user=user,
-                achieved_at__gte=thirty_days_ago
-            )
-
-            milestone_count = recent_milestones.count()
+            milestone_count = snapshot.milestone_count(30)
 
             # Milestone achievement bonus (up to 30 points)
             if milestone_count >= 5:
@@ -520,12 +505,12 @@ class WellnessScoreService:
             weight_progress_bonus = 0
             if health_profile.target_weight_kg and health_profile.weight_kg:
                 weight_progress_bonus = WellnessScoreService._calculate_weight_progress_score(
-                    health_profile
+                    health_profile, snapshot
                 )
 
             # Activity improvement trend (last 30 vs previous 30 days)
             activity_trend_bonus = WellnessScoreService._calculate_activity_trend_score(
-                health_profile, user
+                health_profile, user, snapshot
             )
 
             # Combine progress components
@@ -543,21 +528,18 @@ class WellnessScoreService:
             return 50.0
 
     @staticmethod
-    def _calculate_weight_progress_score(health_profile):
+    def _calculate_weight_progress_score(health_profile, snapshot=None):
         """Calculate weight progress component (max 15 points)"""
         try:
             current_weight = float(health_profile.weight_kg)
             target_weight = float(health_profile.target_weight_kg)
 
             # Get weight history to calculate starting point
-            weight_history = WeightHistory.objects.filter(
-                health_profile=health_profile
-            ).order_by('recorded_at')
-
-            if not weight_history.exists():
+            snapshot = snapshot or UserHealthSnapshot(health_profile.user, health_profile)
+            if not snapshot.weight_history:
                 return 0
 
-            starting_weight = float(weight_history.first().weight_kg)
+            starting_weight = float(snapshot.starting_weight)
             total_change_needed = abs(starting_weight - target_weight)
 
             if total_change_needed == 0:
@@ -586,25 +568,16 @@ class WellnessScoreService:
             return 0
 
     @staticmethod
-    def _calculate_activity_trend_score(health_profile, user):
+    def _calculate_activity_trend_score(health_profile, user, snapshot=None):
         """Calculate activity improvement trend (max 5 points)"""
         try:
-            now = timezone.now()
-            thirty_days_ago = now - timedelta(days=30)
-            sixty_days_ago = now - timedelta(days=60)
+            snapshot = snapshot or UserHealthSnapshot(user, health_profile)
 
             # Recent 30 days activity
-            recent_activities = Activity.objects.filter(
-                health_profile=health_profile,
-                performed_at__gte=thirty_days_ago
-            ).count()
+            recent_activities = snapshot.activity_count(30)
 
             # Previous 30 days activity
-            previous_activities = Activity.objects.filter(
-                health_profile=health_profile,
-                performed_at__gte=sixty_days_ago,
-                performed_at__lt=thirty_days_ago
-            ).count()
+            previous_activities = snapshot.activity_count(60, until_days=30)
 
             if previous_activities == 0:
                 # If no previous activity, any current activity is improvement
@@ -629,12 +602,13 @@ class WellnessScoreService:
             return 0
 
     @staticmethod
-    def calculate_habits_score(health_profile, user):
+    def calculate_habits_score(health_profile, user, snapshot=None):
         """
         Habits scoring based on consistency in health behaviors
         Factors: logging consistency, profile maintenance, activity regularity
         """
         try:
+            snapshot = snapshot or UserHealthSnapshot(user, health_profile)
             base_score = 30.0  # Start with base points for having a profile
 
             # Profile completeness (20 points max)
@@ -642,12 +616,12 @@ class WellnessScoreService:
 
             # Logging consistency (30 points max)
             logging_consistency_score = WellnessScoreService._calculate_logging_consistency(
-                health_profile, user
+                health_profile, user, snapshot
             )
 
             # Activity regularity (20 points max)
             activity_regularity_score = WellnessScoreService._calculate_activity_regularity(
-                health_profile
+                health_profile, snapshot
             )
 
             # Combine all habit components
@@ -696,15 +670,12 @@ class WellnessScoreService:
         return required_score + optional_score
 
     @staticmethod
-    def _calculate_logging_consistency(health_profile, user):
+    def _calculate_logging_consistency(health_profile, user, snapshot=None):
         """Calculate logging consistency score (max 30 points)"""
-        thirty_days_ago = timezone.now() - timedelta(days=30)
+        snapshot = snapshot or UserHealthSnapshot(user, health_profile)
 
         # Weight logging consistency (15 points max)
-        weight_entries = WeightHistory.objects.filter(
-            health_profile=health_profile,
-            recorded_at__gte=thirty_days_ago
-        ).count()
+        weight_entries = snapshot.weight_entries(30)
 
         if weight_entries >= 8:  # 2+ times per week
             weight_score = 15
@@ -718,10 +689,7 @@ class WellnessScoreService:
             weight_score = 0
 
         # Activity logging consistency (15 points max)
-        activity_entries = Activity.objects.filter(
-            health_profile=health_profile,
-            performed_at__gte=thirty_days_ago
-        ).count()
+        activity_entries = snapshot.activity_count(30)
 
         if activity_entries >= 12:  # 3+ times per week
             activity_score = 15
@@ -739,30 +707,16 @@ class WellnessScoreService:
         return weight_score + activity_score
 
     @staticmethod
-    def _calculate_activity_regularity(health_profile):
+    def _calculate_activity_regularity(health_profile, snapshot=None):
         """Calculate activity regularity score (max 20 points)"""
         try:
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-
-            # Get activities grouped by week
-            activities = Activity.objects.filter(
-                health_profile=health_profile,
-                performed_at__gte=thirty_days_ago
-            )
+            snapshot = snapshot or UserHealthSnapshot(health_profile.user, health_profile)
 
-            if not activities.exists():
+            if not snapshot.activity_count(30):
                 return 0
 
             # Group activities by week
-            weekly_counts = []
-            for week in range(4):  # Last 4 weeks
-                week_start = thirty_days_ago + timedelta(weeks=week)
-                week_end = week_start + timedelta(days=7)
-                week_count = activities.filter(
-                    performed_at__gte=week_start,
-                    performed_at__lt=week_end
-                ).count()
-                weekly_counts.append(week_count)
+            weekly_counts = snapshot.weekly_activity_counts(30, weeks=4)  # Last 4 weeks
 
             # Calculate consistency (lower variance = higher score)
             if len(weekly_counts) > 1:
@@ -805,7 +759,7 @@ class WellnessScoreService:
             return 0
 
     @staticmethod
-    def calculate_nutrition_score(health_profile, user):
+    def calculate_nutrition_score(health_profile, user, snapshot=None):
         """
         Calculate nutrition score based on:
         - Having a nutrition profile (20 points)
@@ -821,15 +775,14 @@ class WellnessScoreService:
 
             # Check if user has a nutrition profile (20 points)
             try:
-                nutrition_profile = NutritionProfile.objects.get(user=user)
+                snapshot = snapshot or UserHealthSnapshot(user, health_profile)
+                nutrition_profile = snapshot.nutrition_profile
+                if nutrition_profile is None:
+                    raise NutritionProfile.DoesNotExist
                 base_score += 20.0
                 
                 # Recent nutrition logging (30 points max)
-                thirty_days_ago = timezone.now() - timedelta(days=30)
-                recent_logs = NutritionLog.objects.filter(
-                    user=user,
-                    date__gte=thirty_days_ago.date()
-                ).count()
+                recent_logs = snapshot.nutrition_logged_days(30)
                 
                 if recent_logs >= 20:  # Daily logging
                     logging_score = 30.0
@@ -846,22 +799,19 @@ class WellnessScoreService:
 
                 # Goal achievement analysis (30 points max)
                 # Check recent logs for goal adherence
-                recent_week_logs = NutritionLog.objects.filter(
-                    user=user,
-                    date__gte=(timezone.now() - timedelta(days=7)).date()
-                )
+                recent_week_logs = snapshot.nutrition_logs_since(7)
                 
-                if recent_week_logs.exists():
+                if len(recent_week_logs):
                     goal_adherence_score = 0.0
-                    total_days = recent_week_logs.count()
+                    total_days = len(recent_week_logs)
                     
                     calorie_target = nutrition_profile.calorie_target
                     protein_target = nutrition_profile.protein_target
                     
                     on_target_days = 0
-                    for log in recent_week_logs:
-                        calorie_diff = abs((log.total_calories or 0) - calorie_target) / calorie_target if calorie_target > 0 else 1
-                        protein_diff = abs((log.total_protein or 0) - protein_target) / protein_target if protein_target > 0 else 1
+                    for total_calories, total_protein in recent_week_logs:
+                        calorie_diff = abs(total_calories - calorie_target) / calorie_target if calorie_target > 0 else 1
+                        protein_diff = abs(total_protein - protein_target) / protein_target if protein_target > 0 else 1
                         
                         # Consider "on target" if within 15% of goals
                         if calorie_diff <= 0.15 and protein_diff <= 0.20:
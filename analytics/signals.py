@@ -0,0 +1,6 @@
+# analytics/signals.py
+from django.dispatch import Signal
+
+# Sent after WellnessScore rows are bulk created, which skips post_save.
+# Receivers get ``health_profile_ids``.
+wellness_scores_saved = Signal()
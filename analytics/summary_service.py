@@ -2,30 +2,10 @@
 
 from django.utils import timezone
 from datetime import timedelta
-from django.conf import settings
 from django.db.models import Sum, Count, Avg
 import logging
 
-# Only import OpenAI if we have the API key
-try:
-    import openai
-    # Try new version first
-    try:
-        client = openai.OpenAI(api_key=getattr(settings, 'OPENAI_API_KEY', ''))
-        use_new_client = True
-    except AttributeError:
-        # Fall back to old version
-        openai.api_key = getattr(settings, 'OPENAI_API_KEY', '')
-        client = None
-        use_new_client = False
-    
-    HAS_OPENAI = bool(getattr(settings, 'OPENAI_API_KEY', ''))
-except:
-    HAS_OPENAI = False
-    use_new_client = False
-    client = None
-    client = None
-
+from utils.llm_gateway import get_llm_gateway
 from .models import HealthSummary, SummaryMetric
 from health_profiles.models import HealthProfile, Activity, WeightHistory
 
@@ -94,7 +74,7 @@ class HealthSummaryService:
                                                   "No activities or weight data found for this period.")
 
             # Generate summary text
-            if HAS_OPENAI and settings.OPENAI_API_KEY:
+            if get_llm_gateway().available:
                 summary_text, achievements, recommendations = cls._generate_ai_summary(data, summary_type)
             else:
                 summary_text, achievements, recommendations = cls._generate_basic_summary(data, summary_type)
@@ -201,40 +181,21 @@ class HealthSummaryService:
         try:
             prompt = cls._build_safe_prompt(data, summary_type)
 
-            # Use compatible OpenAI call based on version
-            if use_new_client and client:
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful wellness coach. Provide encouraging and actionable health advice."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=500,
-                    temperature=0.7
-                )
-            else:
-                # Old version
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful wellness coach. Provide encouraging and actionable health advice."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=500,
-                    temperature=0.7
-                )
+            response = get_llm_gateway().chat(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a helpful wellness coach. Provide encouraging and actionable health advice."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_tokens=500,
+                temperature=0.7
+            )
 
             ai_text = response.choices[0].message.content
 
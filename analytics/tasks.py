@@ -360,3 +360,24 @@ def generate_monthly_summary_batch():
     except Exception as e:
         logger.error(f"Error in monthly summary batch: {str(e)}")
         return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def calculate_wellness_scores_batch(user_ids=None, chunk_size=2000):
+    """
+    Nightly wellness scoring for every user with a health profile (or just ``user_ids``)
+    """
+    from .batch_scoring_service import BatchWellnessScoreService
+
+    try:
+        profiles = HealthProfile.objects.all()
+        if user_ids:
+            profiles = profiles.filter(user_id__in=user_ids)
+
+        scored = BatchWellnessScoreService().run(profiles, chunk_size=chunk_size)
+        logger.info(f"Calculated wellness scores for {scored} health profiles")
+        return {'success': True, 'profiles_scored': scored}
+
+    except Exception as e:
+        logger.error(f"Error in batch wellness score calculation: {str(e)}")
+        return {'success': False, 'error': str(e)}
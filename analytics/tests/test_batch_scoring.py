@@ -0,0 +1,71 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
+
+from analytics.batch_scoring_service import BatchWellnessScoreService
+from analytics.models import Milestone, WellnessScore
+from analytics.services import WellnessScoreService
+from health_profiles.models import HealthProfile, Activity, WeightHistory
+from meal_planning.models import NutritionLog, NutritionProfile
+
+User = get_user_model()
+
+
+class BatchWellnessScoreServiceTestCase(TestCase):
+    def setUp(self):
+        """Profiles covering the different branches of each component"""
+        now = timezone.now()
+        self.profiles = []
+        for index, (height, weight, target, level) in enumerate([
+            (175, 70, 65, 'moderate'),
+            (160, 95, 70, 'sedentary'),
+            (180, 55, None, 'very_active'),
+            (None, None, None, 'light'),
+        ]):
+            user = User.objects.create_user(username=f'batch{index}', email=f'batch{index}@example.com', password='x')
+            profile = HealthProfile.objects.create(
+                user=user, age=30 + index, height_cm=height, weight_kg=weight,
+                target_weight_kg=target, activity_level=level
+            )
+            self.profiles.append(profile)
+
+            for day in range(index * 5):
+                activity = Activity.objects.create(
+                    health_profile=profile, name='Run', activity_type='cardio', duration_minutes=20 + day * 5
+                )
+                Activity.objects.filter(pk=activity.pk).update(performed_at=now - timedelta(days=day * 3, hours=1))
+
+            for entry in range(index + 1):
+                history = WeightHistory.objects.create(health_profile=profile, weight_kg=(weight or 80) + 6 - entry)
+                WeightHistory.objects.filter(pk=history.pk).update(recorded_at=now - timedelta(days=40 - entry * 9))
+
+            for _ in range(index):
+                Milestone.objects.create(user=user, milestone_type='activity', description='Milestone')
+
+            if index % 2 == 0:
+                NutritionProfile.objects.create(
+                    user=user, calorie_target=2000, protein_target=100, carb_target=250, fat_target=67,
+                    dietary_preferences=['vegetarian'] if index else []
+                )
+                for day in range(index * 6 + 3):
+                    NutritionLog.objects.create(
+                        user=user, date=now.date() - timedelta(days=day),
+                        total_calories=1900 + day * 40, total_protein=95
+                    )
+
+    def test_matches_per_user_scores(self):
+        service = BatchWellnessScoreService()
+        with self.assertNumQueries(6):
+            ids, scores = service.score_profiles([profile.pk for profile in self.profiles])
+
+        for row, profile in enumerate(self.profiles):
+            self.assertEqual(ids[row], profile.pk)
+            expected = WellnessScoreService.calculate_comprehensive_score(profile, profile.user)
+            for name, value in expected.items():
+                self.assertAlmostEqual(scores[name][row], value, places=2, msg=f'{name} for profile {row}')
+
+    def test_run_bulk_creates_scores(self):
+        scored = BatchWellnessScoreService().run(chunk_size=3)
+        self.assertEqual(scored, 4)
+        self.assertEqual(WellnessScore.objects.count(), 4)
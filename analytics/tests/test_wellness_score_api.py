@@ -0,0 +1,57 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+
+from analytics.services import WellnessScoreService
+from health_profiles.models import HealthProfile, Activity, WeightHistory
+from meal_planning.models import NutritionLog, NutritionProfile
+
+User = get_user_model()
+
+
+class WellnessScoreCalculateAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='scorer', email='scorer@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.health_profile = HealthProfile.objects.create(
+            user=self.user, age=35, height_cm=170, weight_kg=82, target_weight_kg=75, activity_level='light'
+        )
+
+        now = timezone.now()
+        for day in range(12):
+            activity = Activity.objects.create(
+                health_profile=self.health_profile, name='Walk', activity_type='cardio', duration_minutes=30
+            )
+            Activity.objects.filter(pk=activity.pk).update(performed_at=now - timedelta(days=day * 4, hours=2))
+        for entry, weight in enumerate([86, 84, 83]):
+            history = WeightHistory.objects.create(health_profile=self.health_profile, weight_kg=weight)
+            WeightHistory.objects.filter(pk=history.pk).update(recorded_at=now - timedelta(days=20 - entry * 7))
+
+        NutritionProfile.objects.create(
+            user=self.user, calorie_target=2000, protein_target=100, carb_target=250, fat_target=67
+        )
+        for day in range(10):
+            NutritionLog.objects.create(
+                user=self.user, date=now.date() - timedelta(days=day), total_calories=1850 + day * 30, total_protein=90
+            )
+
+    def test_calculate_loads_each_dataset_once(self):
+        url = '/api/analytics/wellness-score/calculate/'
+        expected = WellnessScoreService.calculate_comprehensive_score(self.health_profile, self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        activity_queries = [q for q in queries.captured_queries if 'health_profiles_activity' in q['sql']]
+        self.assertEqual(len(activity_queries), 2)  # 60-day window + all-time count for milestones
+        self.assertLessEqual(len(queries.captured_queries), 15)
+        self.assertEqual(float(response.data['activity_score']), expected['activity_score'])
+        self.assertEqual(float(response.data['total_score']), expected['total_score'])
+
+        # The weight milestone created during the request is visible to the progress description
+        self.assertIn('1 milestone', response.data['score_breakdown']['progress']['description'])
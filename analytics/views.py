@@ -8,20 +8,12 @@ from django.conf import settings
 from django.db.models import Count, Sum, Q
 from collections import Counter
 import re
-import openai
-
-# Handle OpenAI API key setup for older versions
-try:
-    # Try new version first
-    openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-except AttributeError:
-    # Fall back to old version
-    openai.api_key = settings.OPENAI_API_KEY
-    openai_client = None
 
+from utils.llm_gateway import get_llm_gateway
 from .models import AIInsight, WellnessScore, Milestone, HealthSummary, SummaryMetric
 from .serializers import AIInsightSerializer, WellnessScoreSerializer, MilestoneSerializer,HealthSummarySerializer, HealthSummaryCreateSerializer, HealthSummaryListSerializer, SummaryStatsSerializer,SummaryInsightSerializer, SummaryMetricSerializer
 from health_profiles.models import HealthProfile, Activity
+from .health_snapshot import UserHealthSnapshot
 from .services import MilestoneService, WellnessScoreService
 from .summary_service import HealthSummaryService
 
@@ -54,22 +46,26 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
         """
         try:
             health_profile = HealthProfile.objects.get(user=request.user)
+            # Scores, milestone checks and descriptions all read this one snapshot
+            snapshot = UserHealthSnapshot(request.user, health_profile)
 
             score_data = WellnessScoreService.calculate_comprehensive_score(
                 health_profile,
-                request.user
+                request.user,
+                snapshot
             )
 
-            weight_milestone = MilestoneService.check_weight_milestone(request.user)
+            weight_milestone = MilestoneService.check_weight_milestone(request.user, snapshot)
 
             if 'weekly_activity_days' in request.data:
                 activity_milestone = MilestoneService.check_activity_milestone(
                     request.user,
-                    request.data['weekly_activity_days']
+                    request.data['weekly_activity_days'],
+                    snapshot
                 )
 
 
-            activity_count_milestone = MilestoneService.check_activity_milestone_by_count(request.user)
+            activity_count_milestone = MilestoneService.check_activity_milestone_by_count(request.user, snapshot)
 
             wellness_score = WellnessScore(
                 health_profile=health_profile,
@@ -93,17 +89,17 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
                 'activity': {
                     'score': score_data['activity_score'],
                     'weight_percentage': 30,
-                    'description': self._get_activity_description(health_profile, request.user)
+                    'description': self._get_activity_description(health_profile, request.user, snapshot)
                 },
                 'progress': {
                     'score': score_data['progress_score'],
                     'weight_percentage': 20,
-                    'description': self._get_progress_description(request.user)
+                    'description': self._get_progress_description(request.user, snapshot)
                 },
                 'habits': {
                     'score': score_data['habits_score'],
                     'weight_percentage': 20,
-                    'description': self._get_habits_description(health_profile, request.user)
+                    'description': self._get_habits_description(health_profile, request.user, snapshot)
                 }
             }
 
@@ -160,6 +156,7 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
                 )
 
             response_data = self.get_serializer(latest_score).data
+            snapshot = UserHealthSnapshot(request.user, health_profile)
 
             # Add the same breakdown information
             response_data['score_breakdown'] = {
@@ -171,17 +168,17 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
                 'activity': {
                     'score': float(latest_score.activity_score),
                     'weight_percentage': 30,
-                    'description': self._get_activity_description(health_profile, request.user)
+                    'description': self._get_activity_description(health_profile, request.user, snapshot)
                 },
                 'progress': {
                     'score': float(latest_score.progress_score),
                     'weight_percentage': 20,
-                    'description': self._get_progress_description(request.user)
+                    'description': self._get_progress_description(request.user, snapshot)
                 },
                 'habits': {
                     'score': float(latest_score.habits_score),
                     'weight_percentage': 20,
-                    'description': self._get_habits_description(health_profile, request.user)
+                    'description': self._get_habits_description(health_profile, request.user, snapshot)
                 }
             }
 
@@ -258,13 +255,10 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
         else:
             return f"Your BMI ({bmi:.1f}) indicates obesity - consider consulting a healthcare provider"
 
-    def _get_activity_description(self, health_profile, user):
+    def _get_activity_description(self, health_profile, user, snapshot=None):
         """Get description for activity score component"""
-        two_weeks_ago = timezone.now() - timedelta(days=14)
-        recent_activities = Activity.objects.filter(
-            health_profile=health_profile,
-            performed_at__gte=two_weeks_ago
-        ).count()
+        snapshot = snapshot or UserHealthSnapshot(user, health_profile)
+        recent_activities = snapshot.activity_count(14)
 
         activity_level = health_profile.activity_level
 
@@ -277,13 +271,10 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
         else:
             return f"Excellent! {recent_activities} activities show great consistency"
 
-    def _get_progress_description(self, user):
+    def _get_progress_description(self, user, snapshot=None):
         """Get description for progress score component"""
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_milestones = Milestone.objects.filter(
-            user=user,
-            achieved_at__gte=thirty_days_ago
-        ).count()
+        snapshot = snapshot or UserHealthSnapshot(user)
+        recent_milestones = snapshot.milestone_count(30)
 
         if recent_milestones == 0:
             return "No recent milestones - focus on consistent habits to see progress"
@@ -294,20 +285,11 @@ class WellnessScoreViewSet(viewsets.ModelViewSet):
         else:
             return f"Outstanding! {recent_milestones} milestones show exceptional progress"
 
-    def _get_habits_description(self, health_profile, user):
+    def _get_habits_description(self, health_profile, user, snapshot=None):
         """Get description for habits score component"""
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-
-        from health_profiles.models import WeightHistory
-        weight_entries = WeightHistory.objects.filter(
-            health_profile=health_profile,
-            recorded_at__gte=thirty_days_ago
-        ).count()
-
-        activity_entries = Activity.objects.filter(
-            health_profile=health_profile,
-            performed_at__gte=thirty_days_ago
-        ).count()
+        snapshot = snapshot or UserHealthSnapshot(user, health_profile)
+        weight_entries = snapshot.weight_entries(30)
+        activity_entries = snapshot.activity_count(30)
 
         if weight_entries >= 4 and activity_entries >= 8:
             return "Excellent tracking habits! You're consistently logging both weight and activities"
@@ -377,41 +359,21 @@ class AIInsightViewSet(viewsets.ModelViewSet):
             # Build enhanced prompt
             prompt = self._build_enhanced_prompt(context_data)
 
-            # Use compatible OpenAI call based on version
-            if openai_client:
-                # New version
-                resp = openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a certified wellness coach…"
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=200,
-                    temperature=0.7
-                )
-            else:
-                # Old version
-                resp = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a certified wellness coach…"
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=200,
-                    temperature=0.7
-                )
+            resp = get_llm_gateway().chat(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a certified wellness coach…"
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_tokens=200,
+                temperature=0.7
+            )
 
             insights_text = resp.choices[0].message.content
             lines = [
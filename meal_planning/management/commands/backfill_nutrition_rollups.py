@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from meal_planning.models import NutritionLog
+from meal_planning.services.nutrition_rollups import NutritionRollupService
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild weekly and monthly NutritionLogRollup rows from NutritionLog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild rollups for this user (can be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per insert batch (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        logs = NutritionLog.objects.all() if user_ids is None else NutritionLog.objects.filter(user_id__in=user_ids)
+        self.stdout.write(f'Rolling up {logs.count()} nutrition logs')
+
+        started = time.monotonic()
+        written = NutritionRollupService.backfill(user_ids=user_ids, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} rollup rows in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from meal_planning.models import Recipe
+from meal_planning.services.embeddings import get_embedding_backend, recipe_embedding_text
+import logging
+import time
+
+logger = logging.getLogger('nutrition.embeddings')
+
+
+class Command(BaseCommand):
+    help = 'Compute and store Recipe.embedding_vector for semantic recipe search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of recipes embedded per API call (default: 100)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-embed every recipe, not just those without a vector from the selected backend'
+        )
+        parser.add_argument(
+            '--backend',
+            choices=['openai', 'local'],
+            help='Embedding backend (default: RECIPE_EMBEDDINGS["backend"])'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after embedding this many recipes'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many recipes would be embedded without calling the backend'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        backend = get_embedding_backend(options['backend'])
+        if options['all']:
+            queryset = Recipe.objects.all()
+        else:
+            queryset = Recipe.objects.filter(Q(embedding_vector__isnull=True) | ~Q(embedding_model=backend.identifier))
+        total = queryset.count()
+        if options['limit']:
+            total = min(total, options['limit'])
+
+        if total == 0:
+            self.stdout.write(self.style.SUCCESS('No recipes need embeddings'))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'DRY RUN MODE - {total} recipes would be embedded'))
+            return
+
+        self.stdout.write(f'Embedding {total} recipes with the {backend.name} backend ({backend.dimensions} dims)')
+
+        embedded = 0
+        failed = 0
+        last_id = None
+        started = time.monotonic()
+
+        # Keyset pagination, since rows leave the queryset as they are embedded
+        while embedded + failed < total:
+            page = queryset.order_by('id')
+            if last_id is not None:
+                page = page.filter(id__gt=last_id)
+            batch = list(page[:min(batch_size, total - embedded - failed)])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            try:
+                vectors = backend.embed([recipe_embedding_text(recipe) for recipe in batch])
+            except Exception as e:
+                failed += len(batch)
+                logger.error(f'Embedding batch starting at {batch[0].id} failed: {e}')
+                self.stdout.write(self.style.ERROR(f'Failed to embed batch of {len(batch)} recipes: {e}'))
+                continue
+
+            # bulk_update bypasses auto_now, set updated_at so vector indexes pick up the change
+            now = timezone.now()
+            for recipe, vector in zip(batch, vectors):
+                recipe.embedding_vector = vector.tolist()
+                recipe.embedding_model = backend.identifier
+                recipe.updated_at = now
+            Recipe.objects.bulk_update(batch, ['embedding_vector', 'embedding_model', 'updated_at'])
+
+            embedded += len(batch)
+            self.stdout.write(f'Embedded {embedded}/{total} recipes')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Embedded {embedded} recipes in {elapsed:.1f}s ({failed} failed)'))
@@ -1,105 +1,193 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.utils import timezone
 from meal_planning.models import MealPlan
+from meal_planning.services.bulk_writes import bulk_update_rows
+from meal_planning.services.nutrition_calculation_service import NutritionCalculationService
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+
 
 class Command(BaseCommand):
     help = 'Fix calorie calculations for existing meal plans'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of meal plans processed per batch (default: 500)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be updated without making changes'
+        )
+
     def handle(self, *args, **options):
         """Fix calorie calculations for all meal plans"""
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
         meal_plans = MealPlan.objects.all()
         fixed_count = 0
-        
+
         self.stdout.write(f"Found {meal_plans.count()} meal plans to check")
-        
-        with transaction.atomic():
-            for meal_plan in meal_plans:
-                try:
-                    meal_plan_data = meal_plan.meal_plan_data or {}
-                    meals = meal_plan_data.get('meals', {})
-                    
-                    if not meals:
-                        continue
-                    
-                    # Calculate totals from meal data
-                    totals = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0}
-                    meal_count = 0
-                    
-                    for day_meals in meals.values():
-                        for meal in day_meals:
-                            totals['calories'] += float(meal.get('calories_per_serving', 0))
-                            totals['protein'] += float(meal.get('protein_per_serving', 0))
-                            totals['carbs'] += float(meal.get('carbs_per_serving', 0))
-                            totals['fat'] += float(meal.get('fat_per_serving', 0))
-                            meal_count += 1
-                    
-                    # Calculate averages
-                    days = len(meals)
-                    if days > 0:
-                        avg_daily_calories = round(totals['calories'] / days, 1)
-                        avg_daily_protein = round(totals['protein'] / days, 1)
-                        avg_daily_carbs = round(totals['carbs'] / days, 1)
-                        avg_daily_fat = round(totals['fat'] / days, 1)
-                    else:
-                        avg_daily_calories = 0
-                        avg_daily_protein = 0
-                        avg_daily_carbs = 0
-                        avg_daily_fat = 0
-                    
-                    # Update nutrition in meal_plan_data
-                    if 'nutrition' not in meal_plan_data:
-                        meal_plan_data['nutrition'] = {}
-                    
-                    meal_plan_data['nutrition'].update({
-                        'calories': totals['calories'],
-                        'protein': totals['protein'],
-                        'carbs': totals['carbs'],
-                        'fat': totals['fat'],
-                        'avg_daily_calories': avg_daily_calories,
-                        'avg_daily_protein': avg_daily_protein,
-                        'avg_daily_carbs': avg_daily_carbs,
-                        'avg_daily_fat': avg_daily_fat
-                    })
-                    
-                    # Update meal plan fields
-                    updated = False
-                    if meal_plan.total_calories != totals['calories']:
-                        meal_plan.total_calories = totals['calories']
-                        updated = True
-                    if meal_plan.avg_daily_calories != avg_daily_calories:
-                        meal_plan.avg_daily_calories = avg_daily_calories
-                        updated = True
-                    if meal_plan.total_protein != totals['protein']:
-                        meal_plan.total_protein = totals['protein']
-                        updated = True
-                    if meal_plan.total_carbs != totals['carbs']:
-                        meal_plan.total_carbs = totals['carbs']
-                        updated = True
-                    if meal_plan.total_fat != totals['fat']:
-                        meal_plan.total_fat = totals['fat']
-                        updated = True
-                    
-                    if updated:
-                        meal_plan.meal_plan_data = meal_plan_data
-                        meal_plan.save()
-                        fixed_count += 1
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f"Fixed meal plan {meal_plan.id}: "
-                                f"total_calories={totals['calories']}, "
-                                f"avg_daily_calories={avg_daily_calories}"
-                            )
-                        )
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"Error fixing meal plan {meal_plan.id}: {str(e)}")
-                    )
-        
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        self.calculator = NutritionCalculationService()
+        batch = []
+        for meal_plan in meal_plans.iterator(chunk_size=batch_size):
+            batch.append(meal_plan)
+            if len(batch) >= batch_size:
+                fixed_count += self._commit_batch(batch, dry_run)
+                batch = []
+        if batch:
+            fixed_count += self._commit_batch(batch, dry_run)
+
+        verb = 'Would fix' if dry_run else 'Successfully fixed'
         self.stdout.write(
-            self.style.SUCCESS(f"Successfully fixed {fixed_count} meal plans")
-        )
\ No newline at end of file
+            self.style.SUCCESS(f"{verb} {fixed_count} meal plans")
+        )
+
+    def _commit_batch(self, meal_plans, dry_run: bool) -> int:
+        """Fix one batch in its own transaction, so a failed batch keeps earlier fixes"""
+        try:
+            with transaction.atomic():
+                return self._fix_batch(meal_plans, dry_run)
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"Error fixing batch of {len(meal_plans)} meal plans "
+                    f"starting at {meal_plans[0].id}: {str(e)}"
+                )
+            )
+            return 0
+
+    def _fix_batch(self, meal_plans, dry_run: bool) -> int:
+        """Recompute totals for a batch of plans with one vectorized pass over all their meals"""
+        plan_rows = []
+        meal_macros = []
+        needs_calculation = []
+        days = np.zeros(len(meal_plans))
+
+        for row, meal_plan in enumerate(meal_plans):
+            try:
+                meals = self._plan_meals(meal_plan)
+            except Exception as e:
+                # Malformed plans are skipped (days stays 0) without affecting the rest of the batch
+                self.stdout.write(
+                    self.style.ERROR(f"Error fixing meal plan {meal_plan.id}: {str(e)}")
+                )
+                continue
+
+            days[row] = len(meals)
+            for day_meals in meals:
+                for meal in day_meals:
+                    # Meals saved without nutrition but with ingredients are calculated below
+                    if not meal.get('calories_per_serving') and meal.get('ingredients'):
+                        needs_calculation.append((row, len(meal_macros), meal))
+                    plan_rows.append(row)
+                    meal_macros.append([self._as_float(meal.get(f'{macro}_per_serving')) for macro in MACROS])
+
+        if needs_calculation:
+            try:
+                results = self.calculator.calculate_many([
+                    {'ingredients': meal['ingredients'], 'servings': meal.get('servings') or 1}
+                    for _, _, meal in needs_calculation
+                ])
+            except Exception as e:
+                # Totals would be wrong without these meals, so leave their plans untouched
+                self.stdout.write(
+                    self.style.ERROR(f"Error calculating meal nutrition, skipping affected plans: {str(e)}")
+                )
+                results = None
+                for row, _, _ in needs_calculation:
+                    days[row] = 0
+
+            for (_, index, meal), result in zip(needs_calculation, results or []):
+                nutrition = result['nutrition_per_serving']
+                for column, macro in enumerate(MACROS):
+                    meal[f'{macro}_per_serving'] = nutrition[macro]
+                    meal_macros[index][column] = nutrition[macro]
+
+        totals = np.zeros((len(meal_plans), len(MACROS)))
+        if plan_rows:
+            rows = np.asarray(plan_rows)
+            macros = np.asarray(meal_macros)
+            for column in range(len(MACROS)):
+                totals[:, column] = np.bincount(rows, weights=macros[:, column], minlength=len(meal_plans))
+        avg_daily = np.round(np.divide(totals, days[:, None], out=np.zeros_like(totals), where=days[:, None] > 0), 1)
+
+        changed = []
+        for row, meal_plan in enumerate(meal_plans):
+            if days[row] == 0:
+                continue
+            plan_totals = dict(zip(MACROS, totals[row].tolist()))
+            plan_averages = dict(zip(MACROS, avg_daily[row].tolist()))
+
+            updated = (
+                meal_plan.total_calories != plan_totals['calories']
+                or meal_plan.avg_daily_calories != plan_averages['calories']
+                or meal_plan.total_protein != plan_totals['protein']
+                or meal_plan.total_carbs != plan_totals['carbs']
+                or meal_plan.total_fat != plan_totals['fat']
+            )
+            if not updated:
+                continue
+
+            nutrition = meal_plan.meal_plan_data.get('nutrition')
+            if not isinstance(nutrition, dict):
+                nutrition = meal_plan.meal_plan_data['nutrition'] = {}
+            nutrition.update({
+                **plan_totals,
+                **{f'avg_daily_{macro}': value for macro, value in plan_averages.items()},
+            })
+            meal_plan.total_calories = plan_totals['calories']
+            meal_plan.avg_daily_calories = plan_averages['calories']
+            meal_plan.total_protein = plan_totals['protein']
+            meal_plan.total_carbs = plan_totals['carbs']
+            meal_plan.total_fat = plan_totals['fat']
+            meal_plan.updated_at = timezone.now()
+            changed.append(meal_plan)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Fixed meal plan {meal_plan.id}: "
+                    f"total_calories={plan_totals['calories']}, "
+                    f"avg_daily_calories={plan_averages['calories']}"
+                )
+            )
+
+        if changed and not dry_run:
+            bulk_update_rows(MealPlan, changed, [
+                'meal_plan_data', 'total_calories', 'avg_daily_calories',
+                'total_protein', 'total_carbs', 'total_fat', 'updated_at'
+            ])
+        return len(changed)
+
+    @staticmethod
+    def _plan_meals(meal_plan):
+        """Each day's meal list from ``meal_plan_data``, raising ValueError if the structure is malformed"""
+        meals = (meal_plan.meal_plan_data or {}).get('meals') or {}
+        if not isinstance(meals, dict):
+            raise ValueError(f"'meals' is a {type(meals).__name__}, expected an object of days")
+
+        plan_meals = []
+        for day, day_meals in meals.items():
+            if not isinstance(day_meals, list) or not all(isinstance(meal, dict) for meal in day_meals):
+                raise ValueError(f"meals for {day} are not a list of meal objects")
+            plan_meals.append(day_meals)
+        return plan_meals
+
+    @staticmethod
+    def _as_float(value) -> float:
+        try:
+            return float(value or 0)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring non-numeric meal nutrition value {value!r}")
+            return 0.0
@@ -3,6 +3,9 @@ from django.db import transaction
 from django.db import models
 from meal_planning.models import Recipe
 from meal_planning.services.enhanced_spoonacular_service import EnhancedSpoonacularService
+from meal_planning.services.bulk_writes import bulk_update_rows
+from meal_planning.services.nutrition_calculation_service import NutritionCalculationService
+from django.utils import timezone
 import logging
 import time
 from typing import List, Dict
@@ -17,8 +20,13 @@ class Command(BaseCommand):
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=50,
-            help='Batch size for processing recipes (default: 50)'
+            help='Batch size for processing recipes (default: 50, or 1000 with --source ingredients)'
+        )
+        parser.add_argument(
+            '--source',
+            choices=['spoonacular', 'ingredients'],
+            default='spoonacular',
+            help='Fetch nutrition from Spoonacular, or recalculate it locally from ingredients_data'
         )
         parser.add_argument(
             '--dry-run',
@@ -32,10 +40,14 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        batch_size = options['batch_size']
         dry_run = options['dry_run']
         force_all = options['force_all']
 
+        if options['source'] == 'ingredients':
+            return self._recalculate_from_ingredients(options['batch_size'] or 1000, dry_run, force_all)
+
+        batch_size = options['batch_size'] or 50
+
         try:
             self.spoonacular = EnhancedSpoonacularService()
         except Exception as e:
@@ -100,6 +112,60 @@ class Command(BaseCommand):
                 self.style.WARNING(f'{error_count} recipes had errors')
             )
 
+    def _recalculate_from_ingredients(self, batch_size: int, dry_run: bool, force_all: bool):
+        """Recompute per-serving nutrition from ingredients_data, one vectorized batch at a time"""
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        recipes_to_fix = Recipe.objects.exclude(ingredients_data=[])
+        if not force_all:
+            recipes_to_fix = recipes_to_fix.filter(
+                models.Q(calories_per_serving=0) |
+                models.Q(fiber_per_serving=0)
+            )
+        total = recipes_to_fix.count()
+        self.stdout.write(f'Recalculating nutrition for {total} recipes from their ingredients')
+
+        calculator = NutritionCalculationService()
+        fields = ['calories_per_serving', 'protein_per_serving', 'carbs_per_serving',
+                  'fat_per_serving', 'fiber_per_serving']
+        started = time.monotonic()
+        updated_count = 0
+        processed = 0
+        batch = []
+
+        def flush(batch):
+            changed = []
+            for recipe, result in zip(batch, calculator.calculate_many(batch)):
+                nutrition = result['nutrition_per_serving']
+                if nutrition['calories'] <= 0:
+                    continue
+                values = [nutrition['calories'], nutrition['protein'], nutrition['carbs'],
+                          nutrition['fat'], nutrition['fiber']]
+                if [getattr(recipe, field) for field in fields] != values:
+                    for field, value in zip(fields, values):
+                        setattr(recipe, field, value)
+                    recipe.updated_at = timezone.now()  # Bulk writes skip auto_now
+                    changed.append(recipe)
+            if changed and not dry_run:
+                bulk_update_rows(Recipe, changed, fields + ['updated_at'])
+            return len(changed)
+
+        for recipe in recipes_to_fix.only('id', 'ingredients_data', 'servings', *fields).iterator(chunk_size=batch_size):
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                updated_count += flush(batch)
+                processed += len(batch)
+                batch = []
+                self.stdout.write(f'Processed {processed}/{total} recipes')
+        if batch:
+            updated_count += flush(batch)
+
+        verb = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {updated_count} of {total} recipes in {time.monotonic() - started:.1f}s'
+        ))
+
     @transaction.atomic
     def _update_recipe_nutrition(self, recipe: Recipe, dry_run: bool = False) -> bool:
         """Update nutrition data for a single recipe"""
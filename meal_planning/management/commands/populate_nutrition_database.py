@@ -1,9 +1,9 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
 from meal_planning.models import Recipe, Ingredient
-from meal_planning.services.spoonacular_service import get_spoonacular_service, SpoonacularAPIError
+from meal_planning.services.spoonacular_service import get_spoonacular_service
+from meal_planning.services.spoonacular_import import ImportCheckpoint, SpoonacularImportPipeline, call_with_rate_limit
 import logging
-import time
 from typing import List, Dict
 
 logger = logging.getLogger('nutrition')
@@ -48,6 +48,34 @@ class Command(BaseCommand):
             default='vegetarian,vegan,gluten free,dairy free,ketogenic',
             help='Comma-separated list of diet types to include'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Concurrent Spoonacular fetches (default: 4)'
+        )
+        parser.add_argument(
+            '--write-batch-size',
+            type=int,
+            default=50,
+            help='Rows per bulk upsert (default: 50)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=str(settings.BASE_DIR / 'logs' / 'populate_nutrition_database.checkpoint.json'),
+            help='Progress file used to resume an interrupted run'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from scratch'
+        )
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            help='Override SPOONACULAR_BASE_URL (e.g. a local fixture replay server)'
+        )
 
     def handle(self, *args, **options):
         """Main command handler"""
@@ -57,9 +85,11 @@ class Command(BaseCommand):
 
         # Initialize Spoonacular service
         try:
-            self.spoonacular = get_spoonacular_service()
+            self.spoonacular = get_spoonacular_service(lane='background')
         except Exception as e:
             raise CommandError(f'Failed to initialize Spoonacular service: {e}')
+        if options['base_url']:
+            self.spoonacular.base_url = options['base_url'].rstrip('/')
 
         # Parse options
         target_recipes = options['recipes']
@@ -69,6 +99,17 @@ class Command(BaseCommand):
         cuisines = [c.strip() for c in options['cuisines'].split(',')]
         diet_types = [d.strip() for d in options['diet_types'].split(',')]
 
+        checkpoint = ImportCheckpoint(options['checkpoint'], restart=options['restart'])
+        if checkpoint.sections:
+            self.stdout.write(f'Resuming from checkpoint {options["checkpoint"]}')
+        self.pipeline = SpoonacularImportPipeline(
+            self.spoonacular,
+            workers=options['workers'],
+            batch_size=options['write_batch_size'],
+            checkpoint=checkpoint,
+            report=self.stdout.write,
+        )
+
         # Import recipes
         if target_recipes > 0:
             self.stdout.write(f'Importing {target_recipes} recipes...')
@@ -80,7 +121,7 @@ class Command(BaseCommand):
             )
 
         # Import ingredients
-        if target_ingredients > 0:
+        if target_ingredients > 0 and not self.pipeline.stopped_by:
             self.stdout.write(f'Importing {target_ingredients} ingredients...')
             imported_ingredients = self.import_ingredients(
                 target_ingredients, batch_size, skip_existing
@@ -89,79 +130,30 @@ class Command(BaseCommand):
                 self.style.SUCCESS(f'Successfully imported {imported_ingredients} ingredients')
             )
 
+        if self.pipeline.stopped_by:
+            self.stdout.write(self.style.WARNING(
+                f'Stopped early: {self.pipeline.stopped_by}. Run the command again to resume from the checkpoint.'
+            ))
+            return
+
+        checkpoint.clear()
         self.stdout.write(
             self.style.SUCCESS('Database population completed!')
         )
 
     def import_recipes(self, target_count: int, batch_size: int, skip_existing: bool,
                        cuisines: List[str], diet_types: List[str]) -> int:
-        """Import recipes from Spoonacular"""
-        imported_count = 0
-        offset = 0
-
-        # Prepare search queries for variety
-        search_queries = self._prepare_recipe_search_queries(cuisines, diet_types)
-
-        for query_data in search_queries:
-            if imported_count >= target_count:
-                break
-
-            self.stdout.write(f'Searching recipes: {query_data["description"]}')
-
-            try:
-                # Search for recipes
-                search_results = self.spoonacular.search_recipes(
-                    query=query_data.get('query', ''),
-                    cuisine=query_data.get('cuisine', ''),
-                    diet=query_data.get('diet', ''),
-                    number=min(batch_size, target_count - imported_count),
-                    offset=offset
-                )
-
-                recipes = search_results.get('results', [])
-
-                if not recipes:
-                    self.stdout.write(f'No recipes found for: {query_data["description"]}')
-                    continue
-
-                # Process each recipe
-                for recipe_data in recipes:
-                    if imported_count >= target_count:
-                        break
-
-                    try:
-                        recipe_id = recipe_data.get('id')
-
-                        # Skip if already exists
-                        if skip_existing and Recipe.objects.filter(spoonacular_id=recipe_id).exists():
-                            continue
-
-                        # Get detailed recipe information
-                        detailed_recipe = self.spoonacular.get_recipe_information(recipe_id)
-
-                        # Normalize and save recipe
-                        if self._save_recipe(detailed_recipe):
-                            imported_count += 1
-                            self.stdout.write(
-                                f'Imported recipe: {detailed_recipe.get("title", "Unknown")} ({imported_count}/{target_count})')
-
-                        # Respect rate limits
-                        time.sleep(1)
-
-                    except Exception as e:
-                        logger.error(f'Failed to import recipe {recipe_data.get("id")}: {e}')
-                        continue
-
-            except SpoonacularAPIError as e:
-                logger.error(f'Spoonacular API error: {e}')
-                continue
-
-        return imported_count
+        """Import recipes from Spoonacular; returns the number of new recipes"""
+        searches = [
+            (query_data['description'], self._recipe_search(query_data, batch_size))
+            for query_data in self._prepare_recipe_search_queries(cuisines, diet_types)
+        ]
+        recipe_ids = self.pipeline.discover('recipes', searches, target_count, skip_existing)
+        self.stdout.write(f'Found {len(recipe_ids)} recipes to import')
+        return self.pipeline.run('recipes', recipe_ids)['created']
 
     def import_ingredients(self, target_count: int, batch_size: int, skip_existing: bool) -> int:
-        """Import ingredients from Spoonacular"""
-        imported_count = 0
-
+        """Import ingredients from Spoonacular; returns the number of new ingredients"""
         # Common ingredients to start with
         ingredient_queries = [
             'chicken', 'beef', 'pork', 'fish', 'salmon', 'rice', 'pasta', 'potato',
@@ -174,47 +166,24 @@ class Command(BaseCommand):
             'yogurt', 'coconut', 'almond', 'walnut', 'honey', 'vanilla'
         ]
 
-        for query in ingredient_queries:
-            if imported_count >= target_count:
-                break
-
-            try:
-                # Search for ingredients
-                search_results = self.spoonacular.search_ingredients(query, number=10)
-                ingredients = search_results.get('results', [])
-
-                for ingredient_data in ingredients:
-                    if imported_count >= target_count:
-                        break
-
-                    try:
-                        ingredient_id = ingredient_data.get('id')
-
-                        # Skip if already exists
-                        if skip_existing and Ingredient.objects.filter(spoonacular_id=ingredient_id).exists():
-                            continue
-
-                        # Get detailed ingredient information
-                        detailed_ingredient = self.spoonacular.get_ingredient_information(ingredient_id)
-
-                        # Normalize and save ingredient
-                        if self._save_ingredient(detailed_ingredient):
-                            imported_count += 1
-                            self.stdout.write(
-                                f'Imported ingredient: {detailed_ingredient.get("name", "Unknown")} ({imported_count}/{target_count})')
-
-                        # Respect rate limits
-                        time.sleep(1)
-
-                    except Exception as e:
-                        logger.error(f'Failed to import ingredient {ingredient_data.get("id")}: {e}')
-                        continue
-
-            except SpoonacularAPIError as e:
-                logger.error(f'Spoonacular API error for ingredient "{query}": {e}')
-                continue
+        searches = [
+            (query, lambda query=query: self.spoonacular.search_ingredients(query, number=10))
+            for query in ingredient_queries
+        ]
+        ingredient_ids = self.pipeline.discover('ingredients', searches, target_count, skip_existing)
+        self.stdout.write(f'Found {len(ingredient_ids)} ingredients to import')
+        return self.pipeline.run('ingredients', ingredient_ids)['created']
 
-        return imported_count
+    def _recipe_search(self, query_data: Dict, batch_size: int):
+        def search():
+            self.stdout.write(f'Searching recipes: {query_data["description"]}')
+            return self.spoonacular.search_recipes(
+                query=query_data.get('query', ''),
+                cuisine=query_data.get('cuisine', ''),
+                diet=query_data.get('diet', ''),
+                number=batch_size,
+            )
+        return search
 
     def _prepare_recipe_search_queries(self, cuisines: List[str], diet_types: List[str]) -> List[Dict]:
         """Prepare diverse search queries for recipe variety"""
@@ -266,44 +235,6 @@ class Command(BaseCommand):
 
         return queries
 
-    @transaction.atomic
-    def _save_recipe(self, spoonacular_recipe: Dict) -> bool:
-        """Save normalized recipe to database"""
-        try:
-            # Normalize the recipe data
-            normalized_data = self.spoonacular.normalize_recipe_data(spoonacular_recipe)
-
-            # Create or update recipe
-            recipe, created = Recipe.objects.update_or_create(
-                spoonacular_id=normalized_data['spoonacular_id'],
-                defaults=normalized_data
-            )
-
-            return created
-
-        except Exception as e:
-            logger.error(f'Failed to save recipe: {e}')
-            return False
-
-    @transaction.atomic
-    def _save_ingredient(self, spoonacular_ingredient: Dict) -> bool:
-        """Save normalized ingredient to database"""
-        try:
-            # Normalize the ingredient data
-            normalized_data = self.spoonacular.normalize_ingredient_data(spoonacular_ingredient)
-
-            # Create or update ingredient
-            ingredient, created = Ingredient.objects.update_or_create(
-                spoonacular_id=normalized_data['spoonacular_id'],
-                defaults=normalized_data
-            )
-
-            return created
-
-        except Exception as e:
-            logger.error(f'Failed to save ingredient: {e}')
-            return False
-
 
 # Additional management command for updating existing data
 class UpdateNutritionDataCommand(BaseCommand):
@@ -335,7 +266,7 @@ class UpdateNutritionDataCommand(BaseCommand):
         self.stdout.write(f'Updating data older than {older_than_days} days...')
 
         try:
-            spoonacular = get_spoonacular_service()
+            spoonacular = get_spoonacular_service(lane='background')
 
             # Update recipes
             old_recipes = Recipe.objects.filter(
@@ -345,7 +276,7 @@ class UpdateNutritionDataCommand(BaseCommand):
 
             for recipe in old_recipes:
                 try:
-                    updated_data = spoonacular.get_recipe_information(recipe.spoonacular_id)
+                    updated_data = call_with_rate_limit(spoonacular.get_recipe_information, recipe.spoonacular_id)
                     normalized_data = spoonacular.normalize_recipe_data(updated_data)
 
                     for field, value in normalized_data.items():
@@ -353,7 +284,6 @@ class UpdateNutritionDataCommand(BaseCommand):
                     recipe.save()
 
                     self.stdout.write(f'Updated recipe: {recipe.title}')
-                    time.sleep(1)  # Rate limiting
 
                 except Exception as e:
                     logger.error(f'Failed to update recipe {recipe.id}: {e}')
@@ -366,7 +296,7 @@ class UpdateNutritionDataCommand(BaseCommand):
 
             for ingredient in old_ingredients:
                 try:
-                    updated_data = spoonacular.get_ingredient_information(ingredient.spoonacular_id)
+                    updated_data = call_with_rate_limit(spoonacular.get_ingredient_information, ingredient.spoonacular_id)
                     normalized_data = spoonacular.normalize_ingredient_data(updated_data)
 
                     for field, value in normalized_data.items():
@@ -374,7 +304,6 @@ class UpdateNutritionDataCommand(BaseCommand):
                     ingredient.save()
 
                     self.stdout.write(f'Updated ingredient: {ingredient.name}')
-                    time.sleep(1)  # Rate limiting
 
                 except Exception as e:
                     logger.error(f'Failed to update ingredient {ingredient.id}: {e}')
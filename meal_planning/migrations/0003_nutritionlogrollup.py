@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-16 20:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_planning', '0002_nutritionprofile_spoonacular_username_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NutritionLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('days_logged', models.PositiveIntegerField(default=0)),
+                ('total_calories', models.FloatField(default=0)),
+                ('total_protein', models.FloatField(default=0)),
+                ('total_carbs', models.FloatField(default=0)),
+                ('total_fat', models.FloatField(default=0)),
+                ('total_fiber', models.FloatField(default=0)),
+                ('total_deficit_surplus', models.FloatField(default=0)),
+                ('days_on_target', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nutrition_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'nutrition_log_rollups',
+                'indexes': [models.Index(fields=['user', 'period', 'period_start'], name='nutrition_l_user_id_094c71_idx')],
+                'unique_together': {('user', 'period', 'period_start')},
+            },
+        ),
+    ]
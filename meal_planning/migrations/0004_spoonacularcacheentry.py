@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-16 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_planning', '0003_nutritionlogrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpoonacularCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('endpoint', models.CharField(max_length=255)),
+                ('params', models.JSONField(default=dict)),
+                ('response', models.JSONField()),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'spoonacular_cache_entries',
+                'indexes': [models.Index(fields=['fetched_at'], name='spoonacular_fetched_60a54b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-16 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_planning', '0004_spoonacularcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='embedding_model',
+            field=models.CharField(blank=True, help_text='Identifier of the embedding backend that produced embedding_vector', max_length=100),
+        ),
+    ]
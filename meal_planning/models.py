@@ -411,6 +411,10 @@ class Recipe(models.Model):
         size=1536,  # OpenAI embedding dimension
         null=True, blank=True
     )
+    embedding_model = models.CharField(
+        max_length=100, blank=True,
+        help_text="Identifier of the embedding backend that produced embedding_vector"
+    )
 
     # User engagement (for community-driven RAG bonus)
     view_count = models.PositiveIntegerField(default=0)
@@ -535,6 +539,63 @@ class NutritionLog(models.Model):
         ]
 
 
+class NutritionLogRollup(models.Model):
+    """
+    Materialized weekly/monthly NutritionLog totals per user.
+
+    Rebuilt per affected period whenever a log is saved or deleted, so long
+    range queries read a handful of rollup rows instead of every daily log.
+    """
+    PERIOD_CHOICES = [
+        ('week', 'Week'),  # ISO week, period_start is a Monday
+        ('month', 'Month'),  # period_start is the 1st
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='nutrition_rollups')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+
+    days_logged = models.PositiveIntegerField(default=0)
+    total_calories = models.FloatField(default=0)
+    total_protein = models.FloatField(default=0)
+    total_carbs = models.FloatField(default=0)
+    total_fat = models.FloatField(default=0)
+    total_fiber = models.FloatField(default=0)
+    total_deficit_surplus = models.FloatField(default=0)
+    # Days within 10% of the calorie target in effect when the period was last rebuilt
+    days_on_target = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'nutrition_log_rollups'
+        unique_together = ['user', 'period', 'period_start']
+        indexes = [
+            models.Index(fields=['user', 'period', 'period_start']),
+        ]
+
+
+class SpoonacularCacheEntry(models.Model):
+    """
+    Durable tier of the Spoonacular response cache.
+
+    Keyed by a digest of the endpoint and its normalized parameters (API key
+    excluded) so every process shares entries, and survives cache flushes so
+    cached responses don't cost daily quota twice.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    endpoint = models.CharField(max_length=255)
+    params = models.JSONField(default=dict)
+    response = models.JSONField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'spoonacular_cache_entries'
+        indexes = [
+            models.Index(fields=['fetched_at']),
+        ]
+
+
 # Future-ready models for bonus features
 
 class UserRecipeRating(models.Model):
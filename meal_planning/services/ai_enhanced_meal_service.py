@@ -1,12 +1,11 @@
-import openai
 import logging
 from typing import Dict, List, Optional, Any
 from django.conf import settings
+from utils.llm_gateway import get_llm_gateway
 from .enhanced_spoonacular_service import EnhancedSpoonacularService, SpoonacularAPIError
 from ..models import NutritionProfile, MealPlan, Recipe
 from datetime import datetime, timedelta, date
 import json
-from decouple import config
 
 logger = logging.getLogger('nutrition.ai_enhanced_meal')
 
@@ -21,7 +20,6 @@ class AIEnhancedMealService:
 
     def __init__(self):
         self.spoonacular_service = EnhancedSpoonacularService()
-        openai.api_key = config('OPENAI_API_KEY')
 
     def generate_smart_meal_plan(self, nutrition_profile: NutritionProfile, days: int = 7, generation_options: Dict = None) -> Dict:
         """
@@ -136,7 +134,7 @@ class AIEnhancedMealService:
             5. Meal prep recommendations
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800,
@@ -206,7 +204,7 @@ class AIEnhancedMealService:
             Format as a structured plan for each day.
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=1000,
@@ -266,7 +264,7 @@ class AIEnhancedMealService:
             5. Cooking complexity analysis
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800,
@@ -313,7 +311,7 @@ class AIEnhancedMealService:
             6. Health benefits and potential concerns
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=1000,
@@ -361,7 +359,7 @@ class AIEnhancedMealService:
             6. Personalized motivational message for the user
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800,
@@ -520,7 +518,7 @@ class AIEnhancedMealService:
             Respond in JSON format with keys: summary, recommendations, nutritional_gaps, meal_prep_tips, healthiness_score
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a registered dietitian providing nutritional analysis."},
@@ -1,10 +1,9 @@
-import openai
 import logging
 import json
 from typing import Dict, List, Optional, Any
 from django.conf import settings
 from django.db import transaction
-from decouple import config
+from utils.llm_gateway import get_llm_gateway
 from ..models import NutritionProfile, Ingredient
 from health_profiles.models import HealthProfile
 from django.utils import timezone
@@ -24,24 +23,12 @@ class AINutritionProfileService:
         self.openai_client = self._initialize_openai()
 
     def _initialize_openai(self):
-        """Initialize OpenAI client with error handling"""
-        try:
-            api_key = config('OPENAI_API_KEY', default='')
-            if not api_key:
-                logger.warning("OpenAI API key not found. AI features will be limited.")
-                return None
-            
-            # Try new client first, fallback to old API
-            try:
-                import openai
-                return openai.OpenAI(api_key=api_key)
-            except AttributeError:
-                # Fallback for older OpenAI versions
-                openai.api_key = api_key
-                return None
-        except Exception as e:
-            logger.error(f"Failed to initialize OpenAI: {str(e)}")
+        """Return the shared LLM gateway, or None when no backend is configured"""
+        gateway = get_llm_gateway()
+        if not gateway.available:
+            logger.warning("OpenAI API key not found. AI features will be limited.")
             return None
+        return gateway
 
     @transaction.atomic
     def generate_ai_nutrition_profile(self, user, force_regenerate: bool = False) -> Dict:
@@ -154,7 +141,7 @@ class AINutritionProfileService:
             }
 
             # Calculate nutrition profile using AI or fallback
-            if self.openai_client or hasattr(openai, 'api_key'):
+            if self.openai_client:
                 ai_recommendations = self._get_ai_recommendations_from_custom_data(mock_health_context)
                 
                 if ai_recommendations:
@@ -215,7 +202,7 @@ class AINutritionProfileService:
     def _get_ai_recommendations_from_custom_data(self, health_context: Dict) -> Dict:
         """Get AI recommendations from custom health context data"""
         try:
-            if not self.openai_client and not hasattr(openai, 'api_key'):
+            if not self.openai_client:
                 return None
 
             # Prepare custom context
@@ -261,32 +248,17 @@ class AINutritionProfileService:
 
             # Call OpenAI API
             try:
-                # Try new client API first
-                if self.openai_client:
-                    response = self.openai_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": prompt}],
-                        functions=[function_schema],
-                        function_call={"name": "generate_nutrition_profile"},
-                        temperature=0.3
-                    )
-                    
-                    if response.choices[0].message.function_call:
-                        function_args = json.loads(response.choices[0].message.function_call.arguments)
-                        return function_args
-                else:
-                    # Fallback to older API
-                    response = openai.ChatCompletion.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": prompt}],
-                        functions=[function_schema],
-                        function_call={"name": "generate_nutrition_profile"},
-                        temperature=0.3
-                    )
-                    
-                    if response.choices[0].message.get('function_call'):
-                        function_args = json.loads(response.choices[0].message['function_call']['arguments'])
-                        return function_args
+                response = self.openai_client.chat(
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": prompt}],
+                    functions=[function_schema],
+                    function_call={"name": "generate_nutrition_profile"},
+                    temperature=0.3
+                )
+
+                if response.choices[0].message.function_call:
+                    function_args = json.loads(response.choices[0].message.function_call.arguments)
+                    return function_args
 
             except Exception as e:
                 logger.error(f"OpenAI API call failed: {str(e)}")
@@ -390,7 +362,7 @@ class AINutritionProfileService:
     def _get_ai_nutrition_recommendations(self, nutrition_profile: NutritionProfile, health_profile: HealthProfile) -> Dict:
         """Get comprehensive nutrition recommendations from OpenAI"""
         try:
-            if not self.openai_client and not hasattr(openai, 'api_key'):
+            if not self.openai_client:
                 logger.warning("OpenAI not available, skipping AI recommendations")
                 return None
 
@@ -482,42 +454,22 @@ class AINutritionProfileService:
             prompt = self._create_nutrition_prompt(context)
 
             # Call OpenAI API
-            if self.openai_client:
-                # New client
-                response = self.openai_client.chat.completions.create(
-                    model=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['model'],
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You are an expert registered dietitian and sports nutritionist with 20+ years of experience. Provide evidence-based nutrition recommendations tailored to individual goals, health status, and preferences."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    functions=[function_schema],
-                    function_call={"name": "generate_nutrition_profile"},
-                    temperature=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['temperature'],
-                    max_tokens=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['max_tokens']
-                )
-                
-                function_response = response.choices[0].message.function_call.arguments
-            else:
-                # Legacy client
-                response = openai.ChatCompletion.create(
-                    model=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['model'],
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You are an expert registered dietitian and sports nutritionist with 20+ years of experience. Provide evidence-based nutrition recommendations tailored to individual goals, health status, and preferences."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    functions=[function_schema],
-                    function_call={"name": "generate_nutrition_profile"},
-                    temperature=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['temperature'],
-                    max_tokens=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['max_tokens']
-                )
-                
-                function_response = response.choices[0].message.function_call.arguments
+            response = self.openai_client.chat(
+                model=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['model'],
+                messages=[
+                    {
+                        "role": "system", 
+                        "content": "You are an expert registered dietitian and sports nutritionist with 20+ years of experience. Provide evidence-based nutrition recommendations tailored to individual goals, health status, and preferences."
+                    },
+                    {"role": "user", "content": prompt}
+                ],
+                functions=[function_schema],
+                function_call={"name": "generate_nutrition_profile"},
+                temperature=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['temperature'],
+                max_tokens=settings.OPENAI_MODEL_CONFIG['nutrition_analysis']['max_tokens']
+            )
+            
+            function_response = response.choices[0].message.function_call.arguments
 
             # Parse the AI response
             ai_recommendations = json.loads(function_response)
@@ -663,7 +615,7 @@ class AINutritionProfileService:
     def update_profile_based_on_progress(self, nutrition_profile: NutritionProfile, progress_data: Dict) -> Dict:
         """Update nutrition profile based on user progress and feedback"""
         try:
-            if not self.openai_client and not hasattr(openai, 'api_key'):
+            if not self.openai_client:
                 return {'status': 'error', 'message': 'AI service not available'}
 
             # Prepare progress context
@@ -690,7 +642,7 @@ class AINutritionProfileService:
     def get_nutrition_insights(self, nutrition_profile: NutritionProfile, daily_intake: Dict) -> Dict:
         """Get AI insights about daily nutrition intake"""
         try:
-            if not self.openai_client and not hasattr(openai, 'api_key'):
+            if not self.openai_client:
                 return {'insights': ['AI insights temporarily unavailable']}
 
             context = {
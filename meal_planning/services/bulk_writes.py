@@ -0,0 +1,50 @@
+# meal_planning/services/bulk_writes.py
+from typing import List, Sequence
+
+from django.db import connections, router
+
+
+def bulk_update_rows(model, objs: Sequence, fields: List[str], batch_size: int = 1000) -> int:
+    """
+    Write ``fields`` of ``objs`` back to the database, ``batch_size`` rows per statement.
+
+    Same contract as ``QuerySet.bulk_update`` (no signals, no auto_now), but on
+    PostgreSQL each batch is a single ``UPDATE ... FROM (VALUES ...)`` instead of
+    one CASE WHEN expression per row and field, whose construction dominates
+    catalogue-wide rewrites. Other backends use ``bulk_update`` directly.
+    """
+    if not objs:
+        return 0
+
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'postgresql':
+        return model.objects.bulk_update(objs, fields, batch_size=batch_size)
+
+    from psycopg2.extras import execute_values
+
+    meta = model._meta
+    pk = meta.pk
+    model_fields = [meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+
+    assignments = ', '.join(
+        f'{quote(field.column)} = v.{quote(field.column)}::{field.db_type(connection)}' for field in model_fields
+    )
+    value_columns = ', '.join(quote(column) for column in [pk.column] + [field.column for field in model_fields])
+    sql = (
+        f'UPDATE {quote(meta.db_table)} AS t SET {assignments} '
+        f'FROM (VALUES %s) AS v({value_columns}) '
+        f'WHERE t.{quote(pk.column)} = v.{quote(pk.column)}::{pk.db_type(connection)}'
+    )
+
+    updated = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            rows = [
+                [pk.get_db_prep_save(obj.pk, connection)]
+                + [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields]
+                for obj in objs[start:start + batch_size]
+            ]
+            execute_values(cursor.cursor, sql, rows, page_size=len(rows))
+            updated += cursor.cursor.rowcount
+    return updated
@@ -1,15 +1,61 @@
-import openai
 import logging
 from typing import Dict, List, Optional, Any, Tuple
 from django.conf import settings
-from decouple import config
+from utils.llm_gateway import get_llm_gateway
 from ..models import NutritionProfile, MealPlan, Recipe
 from datetime import datetime, timedelta, date
+from concurrent.futures import ThreadPoolExecutor
 import json
 import random
 
 logger = logging.getLogger('nutrition.dynamic_meal_planning')
 
+# JSON schema for the single-prompt (batched) plan response
+BATCHED_MEAL_SCHEMA = {
+    'type': 'object',
+    'required': ['meal_type', 'title', 'calories_per_serving', 'protein_per_serving',
+                 'carbs_per_serving', 'fat_per_serving', 'ingredients_data', 'instructions'],
+    'properties': {
+        'meal_type': {'type': 'string', 'enum': ['breakfast', 'lunch', 'dinner']},
+        'title': {'type': 'string'},
+        'time': {'type': 'string'},
+        'calories_per_serving': {'type': 'number'},
+        'protein_per_serving': {'type': 'number'},
+        'carbs_per_serving': {'type': 'number'},
+        'fat_per_serving': {'type': 'number'},
+        'servings': {'type': 'integer'},
+        'readyInMinutes': {'type': 'integer'},
+        'summary': {'type': 'string'},
+        'ingredients_data': {
+            'type': 'array',
+            'items': {'type': 'object', 'properties': {'original': {'type': 'string'}}},
+        },
+        'instructions': {
+            'type': 'array',
+            'items': {'type': 'object', 'properties': {'step': {'type': 'string'}}},
+        },
+        'nutrition_highlights': {'type': 'array', 'items': {'type': 'string'}},
+    },
+}
+
+BATCHED_MEAL_PLAN_SCHEMA = {
+    'type': 'object',
+    'required': ['days'],
+    'properties': {
+        'days': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['day_number', 'meals'],
+                'properties': {
+                    'day_number': {'type': 'integer'},
+                    'meals': {'type': 'array', 'items': BATCHED_MEAL_SCHEMA},
+                },
+            },
+        },
+    },
+}
+
 
 class DynamicMealPlanningService:
     """
@@ -18,12 +64,24 @@ class DynamicMealPlanningService:
     understanding of nutrition science.
     """
 
-    def __init__(self):
-        openai.api_key = config('OPENAI_API_KEY')
+    MEAL_TYPES = ['breakfast', 'lunch', 'dinner']
+    GENERATION_MODES = ('per_meal', 'batched')
+
+    def __init__(self, max_concurrent_meals: Optional[int] = None):
         self.model = "gpt-3.5-turbo"  # Can be upgraded to gpt-4 for better analysis
 
+        # Upper bound on per-meal OpenAI calls in flight at once (1 = sequential)
+        planning_config = getattr(settings, 'DYNAMIC_MEAL_PLANNING', {})
+        if max_concurrent_meals is None:
+            max_concurrent_meals = planning_config.get('max_concurrent_meals', 1)
+        self.max_concurrent_meals = max(1, int(max_concurrent_meals))
+        self.generation_mode = planning_config.get('generation_mode', 'per_meal')
+        self.batched_max_tokens = planning_config.get('batched_max_tokens', 3500)
+        self.batched_days_per_request = max(1, int(planning_config.get('batched_days_per_request', 2)))
+
     def generate_personalized_meal_plan(self, nutrition_profile: NutritionProfile, 
-                                      days: int = 1, custom_options: Dict = None) -> Dict:
+                                      days: int = 1, custom_options: Dict = None,
+                                      generation_mode: Optional[str] = None) -> Dict:
         """
         Generate a fully personalized meal plan using AI analysis of user profile
         
@@ -31,12 +89,20 @@ class DynamicMealPlanningService:
             nutrition_profile: User's complete nutrition profile
             days: Number of days to plan for
             custom_options: Additional customization options
+            generation_mode: 'per_meal' (one prompt per meal) or 'batched'
+                (every day and meal in one structured response); defaults to
+                DYNAMIC_MEAL_PLANNING['generation_mode']
         
         Returns:
             Complete personalized meal plan with AI insights
         """
         try:
             logger.info(f"Generating personalized {days}-day meal plan for user {nutrition_profile.user.id}")
+
+            generation_mode = generation_mode or self.generation_mode
+            if generation_mode not in self.GENERATION_MODES:
+                logger.warning(f"Unknown generation mode '{generation_mode}', using per-meal generation")
+                generation_mode = 'per_meal'
             
             # Step 1: Deep profile analysis
             profile_analysis = self._analyze_user_profile(nutrition_profile, custom_options)
@@ -45,7 +111,10 @@ class DynamicMealPlanningService:
             meal_strategy = self._create_meal_strategy(profile_analysis, nutrition_profile, days)
             
             # Step 3: Generate specific meals using the strategy
-            meal_plan = self._generate_strategic_meals(meal_strategy, nutrition_profile, days)
+            if generation_mode == 'batched':
+                meal_plan = self._generate_batched_strategic_meals(meal_strategy, nutrition_profile, days)
+            else:
+                meal_plan = self._generate_strategic_meals(meal_strategy, nutrition_profile, days)
             
             # Step 4: Nutritional analysis and optimization
             optimized_plan = self._optimize_nutritional_balance(meal_plan, nutrition_profile)
@@ -114,7 +183,7 @@ class DynamicMealPlanningService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=1500,
@@ -201,7 +270,7 @@ class DynamicMealPlanningService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=1000,
@@ -240,19 +309,11 @@ class DynamicMealPlanningService:
             }
 
             # Generate meals for each day
-            start_date = date.today()
-            daily_themes = meal_strategy.get('daily_themes', [])
-            
-            for day_offset in range(days):
-                current_date = start_date + timedelta(days=day_offset)
-                date_str = current_date.isoformat()
-                
-                # Get theme for this day
-                theme = daily_themes[day_offset % len(daily_themes)] if daily_themes else "balanced_nutrition"
-                
-                # Generate meals for this day
-                daily_meals = self._generate_daily_meals(meal_strategy, nutrition_profile, theme, day_offset)
-                meal_plan_data['meals'][date_str] = daily_meals
+            day_slots = self._get_day_slots(meal_strategy, days)
+
+            # All meals of the plan are generated in one bounded-concurrency pass
+            meals_per_day = self._generate_meals_for_days(meal_strategy, nutrition_profile, day_slots)
+            meal_plan_data['meals'] = self._assign_plan_dates(meals_per_day)
 
             return meal_plan_data
 
@@ -263,25 +324,229 @@ class DynamicMealPlanningService:
     def _generate_daily_meals(self, meal_strategy: Dict, nutrition_profile: NutritionProfile, 
                             theme: str, day_offset: int) -> List[Dict]:
         """Generate meals for a specific day using the meal strategy"""
-        daily_meals = []
+        return self._generate_meals_for_days(meal_strategy, nutrition_profile, [(theme, day_offset)])[0]
+
+    def _generate_meals_for_days(self, meal_strategy: Dict, nutrition_profile: NutritionProfile,
+                                 day_slots: List[Tuple[str, int]]) -> List[List[Dict]]:
+        """
+        Generate every meal for the given (theme, day_offset) slots.
+
+        Per-meal OpenAI calls are fanned out on a thread pool bounded by
+        ``max_concurrent_meals``; results are returned in plan order (one list
+        per day, meals in ``MEAL_TYPES`` order) regardless of completion order.
+        """
+        meals = self._run_meal_slots(nutrition_profile, self._get_meal_slots(meal_strategy, day_slots))
+        return self._group_meals_by_day(meals)
+
+    def _get_day_slots(self, meal_strategy: Dict, days: int) -> List[Tuple[str, int]]:
+        """Pair each day offset with its theme from the strategy"""
+        daily_themes = meal_strategy.get('daily_themes', [])
+        day_slots = []
+        for day_offset in range(days):
+            # Get theme for this day
+            theme = daily_themes[day_offset % len(daily_themes)] if daily_themes else "balanced_nutrition"
+            day_slots.append((theme, day_offset))
+        return day_slots
+
+    def _get_meal_slots(self, meal_strategy: Dict, day_slots: List[Tuple[str, int]]) -> List[Tuple]:
+        """Expand day slots into (meal_type, meal_template, theme, day_offset) slots in plan order"""
         strategy = meal_strategy.get('meal_strategy', {})
-        
-        for meal_type in ['breakfast', 'lunch', 'dinner']:
-            meal_template = strategy.get(meal_type, {})
-            
-            # Generate meal using AI with specific targets
-            meal = self._generate_strategic_meal(
-                meal_type, meal_template, nutrition_profile, theme, day_offset
+        return [
+            (meal_type, strategy.get(meal_type, {}), theme, day_offset)
+            for theme, day_offset in day_slots
+            for meal_type in self.MEAL_TYPES
+        ]
+
+    def _run_meal_slots(self, nutrition_profile: NutritionProfile, meal_slots: List[Tuple]) -> List[Dict]:
+        """Generate one meal per slot with bounded concurrency, returning meals in slot order"""
+        def generate(slot):
+            return self._generate_meal_with_fallback(nutrition_profile, *slot)
+
+        workers = min(self.max_concurrent_meals, len(meal_slots))
+        if workers <= 1:
+            return [generate(slot) for slot in meal_slots]
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='meal-planning') as executor:
+            # executor.map yields results in submission order
+            return list(executor.map(generate, meal_slots))
+
+    def _group_meals_by_day(self, meals: List[Dict]) -> List[List[Dict]]:
+        """Split a flat, plan-ordered meal list into one list per day"""
+        meals_per_day = len(self.MEAL_TYPES)
+        return [meals[i:i + meals_per_day] for i in range(0, len(meals), meals_per_day)]
+
+    def _assign_plan_dates(self, meals_per_day: List[List[Dict]]) -> Dict[str, List[Dict]]:
+        """Key each day's meals by its ISO date, starting today"""
+        start_date = date.today()
+        return {
+            (start_date + timedelta(days=day_offset)).isoformat(): daily_meals
+            for day_offset, daily_meals in enumerate(meals_per_day)
+        }
+
+    def _generate_batched_strategic_meals(self, meal_strategy: Dict, nutrition_profile: NutritionProfile,
+                                          days: int) -> Dict:
+        """
+        Generate every day and meal of the plan from structured OpenAI responses.
+
+        The days are requested in chunks of ``batched_days_per_request`` so each
+        response fits its completion budget. Meals that are missing from the response or fail ``_validate_meal_nutrition``
+        are repaired individually through the per-meal generation and
+        profile-aware fallback path.
+        """
+        try:
+            meal_plan_data = {
+                'status': 'ai_generated',
+                'message': 'Personalized meal plan generated using AI analysis',
+                'days': days,
+                'meals': {},
+                'strategy_used': meal_strategy.get('key_principles', []),
+                'generation_method': 'ai_batched_planning'
+            }
+
+            day_slots = self._get_day_slots(meal_strategy, days)
+            meal_slots = self._get_meal_slots(meal_strategy, day_slots)
+            batched_meals = self._request_batched_meal_chunks(meal_strategy, nutrition_profile, day_slots)
+
+            meals = []
+            repair_indexes = []
+            for index, (meal_type, meal_template, theme, day_offset) in enumerate(meal_slots):
+                meal = batched_meals.get((day_offset, meal_type))
+                try:
+                    is_valid = self._validate_meal_nutrition(meal, meal_template)
+                except (TypeError, ValueError):
+                    is_valid = False
+
+                if is_valid:
+                    meals.append(meal)
+                else:
+                    meals.append(None)
+                    repair_indexes.append(index)
+
+            if repair_indexes:
+                logger.info(f"Repairing {len(repair_indexes)} of {len(meal_slots)} batched meals individually")
+                repaired = self._run_meal_slots(nutrition_profile, [meal_slots[i] for i in repair_indexes])
+                for index, meal in zip(repair_indexes, repaired):
+                    meals[index] = meal
+
+            meal_plan_data['meals'] = self._assign_plan_dates(self._group_meals_by_day(meals))
+            meal_plan_data['repaired_meals'] = len(repair_indexes)
+            return meal_plan_data
+
+        except Exception as e:
+            logger.error(f"Batched meal generation failed: {str(e)}")
+            return self._generate_strategic_meals(meal_strategy, nutrition_profile, days)
+
+    def _request_batched_meal_chunks(self, meal_strategy: Dict, nutrition_profile: NutritionProfile,
+                                     day_slots: List[Tuple[str, int]]) -> Dict[Tuple[int, str], Dict]:
+        """
+        Request the plan a few days at a time and merge the responses.
+
+        A whole week of meals with ingredients and instructions does not fit in
+        one completion, and a truncated JSON reply loses every meal, so each
+        request covers at most ``batched_days_per_request`` days. Chunks run
+        concurrently, bounded by ``max_concurrent_meals``.
+        """
+        size = self.batched_days_per_request
+        chunks = [day_slots[i:i + size] for i in range(0, len(day_slots), size)]
+
+        def request(chunk):
+            return self._request_batched_meals(meal_strategy, nutrition_profile, chunk)
+
+        workers = min(self.max_concurrent_meals, len(chunks))
+        if workers <= 1:
+            responses = [request(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='meal-planning') as executor:
+                responses = list(executor.map(request, chunks))
+
+        meals = {}
+        for response in responses:
+            meals.update(response)
+        return meals
+
+    def _request_batched_meals(self, meal_strategy: Dict, nutrition_profile: NutritionProfile,
+                               day_slots: List[Tuple[str, int]]) -> Dict[Tuple[int, str], Dict]:
+        """Ask for the given days in one prompt; returns meals keyed by (day_offset, meal_type)"""
+        strategy = meal_strategy.get('meal_strategy', {})
+
+        # Shared requirements are sent once instead of once per meal
+        context = {
+            'meal_targets': {meal_type: strategy.get(meal_type, {}) for meal_type in self.MEAL_TYPES},
+            'dietary_preferences': nutrition_profile.dietary_preferences,
+            'allergies_intolerances': nutrition_profile.allergies_intolerances,
+            'cuisine_preferences': nutrition_profile.cuisine_preferences,
+            'disliked_ingredients': nutrition_profile.disliked_ingredients,
+            'days': [{'day_number': day_offset + 1, 'theme': theme} for theme, day_offset in day_slots]
+        }
+
+        prompt = f"""
+            Create a {len(day_slots)}-day meal plan with {', '.join(self.MEAL_TYPES)} for every day,
+            using the day_number values listed in the requirements.
+
+            REQUIREMENTS:
+            {json.dumps(context)}
+
+            Respond with a single JSON object that validates against this JSON schema:
+            {json.dumps(BATCHED_MEAL_PLAN_SCHEMA)}
+
+            Ensure every meal:
+            1. Meets its meal type's calorie and macro targets within 10%
+            2. Avoids all allergies and intolerances
+            3. Follows dietary preferences strictly
+            4. Uses preferred cuisines when possible
+            5. Avoids disliked ingredients
+            6. Fits its day's theme, with no repeated meals across days
+            7. Is practical to prepare
+            """
+
+        try:
+            response = get_llm_gateway().chat(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=self.batched_max_tokens,
+                temperature=0.6,
+                response_format={"type": "json_object"}
             )
-            
-            if meal:
-                daily_meals.append(meal)
-            else:
-                # Fallback to profile-aware meal
-                fallback_meal = self._generate_profile_aware_meal(meal_type, nutrition_profile, meal_template)
-                daily_meals.append(fallback_meal)
-        
-        return daily_meals
+            plan = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.warning(f"Batched meal plan request failed: {str(e)}")
+            return {}
+
+        requested_offsets = {day_offset for _, day_offset in day_slots}
+        meals = {}
+        dropped = set()
+        for day in plan.get('days', []) if isinstance(plan, dict) else []:
+            try:
+                day_offset = int(day.get('day_number')) - 1
+            except (TypeError, ValueError, AttributeError):
+                continue
+            if day_offset not in requested_offsets:
+                # Echoed or renumbered days would overwrite other chunks' meals
+                dropped.add(day_offset + 1)
+                continue
+            for meal in day.get('meals', []):
+                if isinstance(meal, dict) and meal.get('meal_type') in self.MEAL_TYPES:
+                    meals.setdefault((day_offset, meal['meal_type']), meal)
+        if dropped:
+            logger.warning(
+                f"Batched response returned unrequested day numbers {sorted(dropped)}, "
+                f"expected {sorted(offset + 1 for offset in requested_offsets)}"
+            )
+        return meals
+
+    def _generate_meal_with_fallback(self, nutrition_profile: NutritionProfile, meal_type: str,
+                                     meal_template: Dict, theme: str, day_offset: int) -> Dict:
+        """Generate a single AI meal, falling back to a profile-aware meal if it is missing or invalid"""
+        # Generate meal using AI with specific targets
+        meal = self._generate_strategic_meal(
+            meal_type, meal_template, nutrition_profile, theme, day_offset
+        )
+
+        if meal:
+            return meal
+
+        # Fallback to profile-aware meal
+        return self._generate_profile_aware_meal(meal_type, nutrition_profile, meal_template)
 
     def _generate_strategic_meal(self, meal_type: str, meal_template: Dict, 
                                nutrition_profile: NutritionProfile, theme: str, day_offset: int) -> Dict:
@@ -339,7 +604,7 @@ class DynamicMealPlanningService:
             7. Is practical to prepare
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800,
@@ -413,7 +678,7 @@ class DynamicMealPlanningService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=700,
@@ -480,7 +745,7 @@ class DynamicMealPlanningService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=500,
@@ -0,0 +1,135 @@
+# meal_planning/services/embeddings.py
+import hashlib
+import logging
+import re
+from typing import List, Optional
+
+from django.conf import settings
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger('nutrition.embeddings')
+
+
+class EmbeddingBackend:
+    """Turns texts into fixed-size float32 vectors (one row per text, L2-normalized)"""
+
+    name = 'base'
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    @property
+    def identifier(self) -> str:
+        """Names the vector space; vectors are only comparable with the same identifier"""
+        return f'{self.name}:{self.dimensions}'
+
+    def embed(self, texts: List[str]) -> 'np.ndarray':
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> 'np.ndarray':
+        return self.embed([text])[0]
+
+    @staticmethod
+    def _normalize(vectors: 'np.ndarray') -> 'np.ndarray':
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings from the OpenAI API using OPENAI_MODEL_CONFIG['embeddings']"""
+
+    name = 'openai'
+
+    def __init__(self, model: str, dimensions: int):
+        super().__init__(dimensions)
+        self.model = model
+
+    @property
+    def identifier(self) -> str:
+        return f'{self.name}:{self.model}:{self.dimensions}'
+
+    def embed(self, texts: List[str]) -> 'np.ndarray':
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+
+        from utils.llm_gateway import get_llm_gateway
+
+        response = get_llm_gateway().embeddings(model=self.model, input=texts, dimensions=self.dimensions)
+        vectors = np.array([item.embedding for item in sorted(response.data, key=lambda d: d.index)],
+                           dtype=np.float32)
+        return self._normalize(vectors)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic local stand-in for tests and offline development.
+
+    Words and character trigrams are feature-hashed (with a stable digest,
+    not Python's salted ``hash``) into signed buckets, so texts sharing
+    vocabulary land close together without any network calls.
+    """
+
+    name = 'local'
+    TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+    def embed(self, texts: List[str]) -> 'np.ndarray':
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text or ''):
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                bucket = value % self.dimensions
+                sign = 1.0 if (value >> 63) & 1 else -1.0
+                vectors[row, bucket] += sign * weight
+        return self._normalize(vectors)
+
+    def _features(self, text: str):
+        for token in self.TOKEN_PATTERN.findall(text.lower()):
+            yield f'w:{token}', 1.0
+            padded = f' {token} '
+            for i in range(len(padded) - 2):
+                yield f'c:{padded[i:i + 3]}', 0.5
+
+
+def get_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Build the configured embedding backend.
+
+    ``name`` (or RECIPE_EMBEDDINGS['backend']) selects 'openai' or 'local';
+    without an OpenAI key the local backend is used so lookups still work.
+    Its vectors live in a different space, so the vector index only searches
+    recipes whose ``embedding_model`` matches the backend's ``identifier``.
+    """
+    embedding_config = settings.OPENAI_MODEL_CONFIG.get('embeddings', {})
+    dimensions = embedding_config.get('dimensions', 1536)
+    name = name or getattr(settings, 'RECIPE_EMBEDDINGS', {}).get('backend', 'openai')
+
+    if name == 'openai' and getattr(settings, 'OPENAI_API_KEY', ''):
+        return OpenAIEmbeddingBackend(embedding_config.get('model', 'text-embedding-3-small'), dimensions)
+
+    if name == 'openai':
+        logger.warning("OPENAI_API_KEY not set, using local hashing embeddings")
+    return HashingEmbeddingBackend(dimensions)
+
+
+def recipe_embedding_text(recipe) -> str:
+    """Text representation of a recipe used for its embedding"""
+    ingredients = []
+    for item in recipe.ingredients_data or []:
+        if isinstance(item, dict):
+            ingredients.append(str(item.get('name') or item.get('original') or ''))
+        else:
+            ingredients.append(str(item))
+
+    parts = [
+        recipe.title,
+        f"Cuisine: {recipe.cuisine}" if recipe.cuisine else '',
+        f"Meal: {recipe.meal_type}" if recipe.meal_type else '',
+        f"Diet: {', '.join(recipe.dietary_tags)}" if recipe.dietary_tags else '',
+        f"Ingredients: {', '.join(ingredients[:25])}" if ingredients else '',
+        (recipe.summary or '')[:500],
+    ]
+    return '\n'.join(part for part in parts if part)
@@ -1,8 +1,7 @@
-import openai
 import logging
 from typing import Dict, List, Optional, Any, Tuple
 from django.conf import settings
-from decouple import config
+from utils.llm_gateway import get_llm_gateway
 from ..models import NutritionProfile
 from datetime import datetime, timedelta, date
 import json
@@ -17,7 +16,6 @@ class EnhancedNutritionProfileService:
     """
 
     def __init__(self):
-        openai.api_key = config('OPENAI_API_KEY')
         self.model = "gpt-3.5-turbo"
 
     def analyze_and_optimize_profile(self, nutrition_profile: NutritionProfile, 
@@ -190,7 +188,7 @@ class EnhancedNutritionProfileService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": strategy_prompt}],
                 max_tokens=1200,
@@ -302,7 +300,7 @@ class EnhancedNutritionProfileService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": analysis_prompt}],
                 max_tokens=1500,
@@ -417,7 +415,7 @@ class EnhancedNutritionProfileService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": macro_prompt}],
                 max_tokens=600,
@@ -466,7 +464,7 @@ class EnhancedNutritionProfileService:
             }}
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model=self.model,
                 messages=[{"role": "user", "content": calorie_prompt}],
                 max_tokens=600,
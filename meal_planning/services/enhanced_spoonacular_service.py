@@ -1,14 +1,22 @@
 import requests
 import logging
-import time
-from typing import Dict, List, Optional, Any, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Tuple
 from django.conf import settings
-from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 import json
 from decouple import config
 
+from utils.single_flight import get_single_flight
+
+from .spoonacular_cache import SpoonacularResponseCache
+from .spoonacular_rate_limiter import get_spoonacular_rate_limiter
+from .spoonacular_transport import get_spoonacular_transport
+
+if TYPE_CHECKING:
+    from ..models import Recipe
+
 logger = logging.getLogger('nutrition.spoonacular')
 
 
@@ -18,8 +26,11 @@ class SpoonacularAPIError(Exception):
 
 
 class RateLimitExceeded(SpoonacularAPIError):
-    """Raised when API rate limit is exceeded"""
-    pass
+    """Raised when API rate limit is exceeded; ``retry_after`` is the suggested wait in seconds"""
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class EnhancedSpoonacularService:
@@ -28,15 +39,13 @@ class EnhancedSpoonacularService:
     This service replaces custom meal plan generation with Spoonacular's native capabilities
     """
 
-    def __init__(self):
+    def __init__(self, lane: str = 'interactive'):
         self.api_key = config('SPOONACULAR_API_KEY')
         self.base_url = 'https://api.spoonacular.com'
-        
-        # Rate limiting - Spoonacular free tier: 150 requests/day, 1 request/second
-        self.rate_limit = {
-            'requests_per_day': 150,
-            'requests_per_second': 1
-        }
+
+        # Rate limiting is shared with SpoonacularService (settings.SPOONACULAR_RATE_LIMIT);
+        # 'interactive' for user requests, 'background' for batch jobs
+        self.lane = lane
 
     def _save_recipe_to_database(self, recipe_data: Dict, created_by=None) -> Optional['Recipe']:
         """
@@ -49,17 +58,72 @@ class EnhancedSpoonacularService:
         Returns:
             Saved Recipe instance or None if failed
         """
+        return self._save_recipes_to_database([recipe_data], created_by)[0]
+
+    def _save_recipes_to_database(self, recipes: List[Dict], created_by=None) -> List[Optional['Recipe']]:
+        """
+        Save several Spoonacular recipes at once
+
+        Existing recipes are looked up with one ``spoonacular_id IN (...)``
+        query and the missing ones are inserted with a single ``bulk_create``;
+        a recipe appearing more than once maps to the same row.
+
+        Args:
+            recipes: Recipe data from Spoonacular API
+            created_by: User who saved these recipes (optional)
+
+        Returns:
+            The Recipe for each input (in order), or None where saving failed
+        """
         try:
             from ..models import Recipe
-            
-            # Check if recipe already exists
-            spoonacular_id = recipe_data.get('id')
-            if spoonacular_id:
-                existing_recipe = Recipe.objects.filter(spoonacular_id=spoonacular_id).first()
-                if existing_recipe:
-                    logger.debug(f"Recipe {spoonacular_id} already exists in database")
-                    return existing_recipe
-            
+
+            spoonacular_ids = {recipe_data.get('id') for recipe_data in recipes if recipe_data.get('id')}
+            saved = {}
+            if spoonacular_ids:
+                saved = {recipe.spoonacular_id: recipe for recipe in Recipe.objects.filter(spoonacular_id__in=spoonacular_ids)}
+                if saved:
+                    logger.debug(f"{len(saved)} of {len(spoonacular_ids)} recipes already exist in database")
+
+            # Build one instance per new recipe; recipes without an id can't be deduplicated
+            results = []
+            new_recipes = []
+            for recipe_data in recipes:
+                spoonacular_id = recipe_data.get('id')
+                if spoonacular_id and spoonacular_id in saved:
+                    results.append(spoonacular_id)
+                    continue
+                recipe = self._build_recipe(recipe_data, created_by)
+                if recipe is not None:
+                    new_recipes.append(recipe)
+                    if spoonacular_id:
+                        saved[spoonacular_id] = recipe
+                results.append(spoonacular_id if spoonacular_id else recipe)
+
+            if new_recipes:
+                try:
+                    with transaction.atomic():
+                        Recipe.objects.bulk_create(new_recipes)
+                except IntegrityError:
+                    # Another request inserted some of these ids since the lookup
+                    Recipe.objects.bulk_create(new_recipes, ignore_conflicts=True)
+                    saved.update({
+                        recipe.spoonacular_id: recipe
+                        for recipe in Recipe.objects.filter(spoonacular_id__in=spoonacular_ids)
+                    })
+                logger.info(f"Saved {len(new_recipes)} new recipes to database")
+
+            return [result if isinstance(result, Recipe) else saved.get(result) for result in results]
+
+        except Exception as e:
+            logger.error(f"Failed to save recipes to database: {str(e)}")
+            return [None] * len(recipes)
+
+    def _build_recipe(self, recipe_data: Dict, created_by=None) -> Optional['Recipe']:
+        """Unsaved Recipe instance for Spoonacular ``recipe_data``, or None if it can't be built"""
+        try:
+            from ..models import Recipe
+
             # Extract recipe information
             title = recipe_data.get('title', 'Untitled Recipe')
             summary = recipe_data.get('summary', '')
@@ -81,8 +145,7 @@ class EnhancedSpoonacularService:
             # Extract allergens
             allergens = self._extract_allergens(recipe_data)
             
-            # Create recipe instance with better error handling
-            recipe = Recipe.objects.create(
+            return Recipe(
                 title=title[:300],  # Ensure title fits in field
                 summary=summary[:1000] if summary else '',  # Limit summary length
                 meal_type=meal_type,
@@ -91,7 +154,7 @@ class EnhancedSpoonacularService:
                 cook_time_minutes=max(0, cook_time),
                 total_time_minutes=max(0, ready_in_minutes),
                 difficulty_level='medium',  # Default, could be inferred
-                spoonacular_id=spoonacular_id,
+                spoonacular_id=recipe_data.get('id'),
                 ingredients_data=self._extract_ingredients_data(recipe_data),
                 instructions=self._extract_instructions(recipe_data),
                 calories_per_serving=max(0, nutrition.get('calories', 0)),
@@ -109,11 +172,8 @@ class EnhancedSpoonacularService:
                 created_by=created_by
             )
             
-            logger.info(f"Successfully saved recipe '{title}' to database")
-            return recipe
-            
         except Exception as e:
-            logger.error(f"Failed to save recipe to database: {str(e)}")
+            logger.error(f"Failed to prepare recipe {recipe_data.get('id')} for saving: {str(e)}")
             return None
 
     def _infer_meal_type(self, title: str, recipe_data: Dict) -> str:
@@ -234,36 +294,15 @@ class EnhancedSpoonacularService:
         return instructions
 
     def _check_rate_limit(self) -> bool:
-        """Check if we're within rate limits"""
-        try:
-            # Check daily limit
-            requests_today = cache.get('spoonacular_requests_today', 0)
-            if requests_today >= self.rate_limit['requests_per_day']:
-                logger.warning(f"Daily rate limit exceeded: {requests_today}/{self.rate_limit['requests_per_day']}")
-                raise RateLimitExceeded("Daily API rate limit exceeded")
-
-            # Check per-second limit
-            last_request = cache.get('spoonacular_last_request')
-            if last_request:
-                time_since_last = time.time() - last_request
-                if time_since_last < 1:  # 1 second minimum
-                    sleep_time = 1 - time_since_last
-                    logger.info(f"Rate limiting: sleeping for {sleep_time:.2f} seconds")
-                    time.sleep(sleep_time)
-        except Exception as e:
-            logger.warning(f"Cache unavailable for rate limiting: {e}")
-
+        """Take a request slot from the shared limiter; raises RateLimitExceeded instead of sleeping"""
+        decision = get_spoonacular_rate_limiter().acquire(self.lane)
+        if not decision.allowed:
+            logger.info(f"Spoonacular {self.lane} lane throttled, retry after {decision.retry_after:.2f}s")
+            raise RateLimitExceeded(
+                f"Spoonacular rate limit reached for {self.lane} requests", retry_after=decision.retry_after
+            )
         return True
 
-    def _update_rate_limit_counters(self):
-        """Update rate limiting counters after successful request"""
-        try:
-            requests_today = cache.get('spoonacular_requests_today', 0)
-            cache.set('spoonacular_requests_today', requests_today + 1, 86400)  # 24 hours
-            cache.set('spoonacular_last_request', time.time(), 3600)  # 1 hour
-        except Exception as e:
-            logger.warning(f"Cache unavailable for updating rate limit counters: {e}")
-
     def _make_request(self, endpoint: str, params: Dict = None, method: str = 'GET', data: Dict = None) -> Dict:
         """Make HTTP request to Spoonacular API with rate limiting"""
         if params is None:
@@ -271,28 +310,35 @@ class EnhancedSpoonacularService:
 
         # Add API key to params
         params['apiKey'] = self.api_key
+
+        if method.upper() == 'GET':
+            # Identical GETs in flight (in any process) share one API call
+            key = SpoonacularResponseCache.make_key(endpoint, params)
+            return get_single_flight('spoonacular').do(key, lambda: self._send_request(endpoint, params, method, data))
+        return self._send_request(endpoint, params, method, data)
+
+    def _send_request(self, endpoint: str, params: Dict, method: str, data: Dict = None) -> Dict:
+        """Perform the API call itself (rate limited)"""
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
 
         # Check rate limit
         self._check_rate_limit()
 
         try:
+            transport = get_spoonacular_transport()
             if method.upper() == 'GET':
-                response = requests.get(url, params=params, timeout=30)
+                response = transport.get(url, endpoint, params=params)
             elif method.upper() == 'POST':
-                response = requests.post(url, params=params, json=data, timeout=30)
+                response = transport.post(url, endpoint, params=params, json=data)
             else:
                 raise SpoonacularAPIError(f"Unsupported HTTP method: {method}")
 
-            # Update rate limit counters
-            self._update_rate_limit_counters()
-
             if response.status_code == 401:
                 raise SpoonacularAPIError("Invalid API key")
             elif response.status_code == 402:
                 raise RateLimitExceeded("API quota exceeded")
             elif response.status_code == 429:
-                raise RateLimitExceeded("Rate limit exceeded")
+                raise RateLimitExceeded("Rate limit exceeded", retry_after=transport.retry_after(response))
             elif not response.ok:
                 raise SpoonacularAPIError(f"API request failed: {response.status_code} - {response.text}")
 
@@ -831,7 +877,8 @@ class EnhancedSpoonacularService:
         
         meals_data = data.get('meals', [])
         
-        for i, meal in enumerate(meals_data):
+        detailed_meals = []
+        for meal in meals_data:
             # Get detailed recipe information if not already complete
             detailed_meal = meal
             recipe_id = meal.get('id')
@@ -849,10 +896,12 @@ class EnhancedSpoonacularService:
                 except Exception as e:
                     logger.warning(f"Failed to fetch detailed recipe info for {recipe_id}: {str(e)}")
                     detailed_meal = meal
-            
-            # Save recipe to database with detailed information
-            # saved_recipe = self._save_recipe_to_database(detailed_meal, created_by)
-            
+            detailed_meals.append(detailed_meal)
+
+        # Save every recipe of the day to database in one batch
+        saved_recipes = self._save_recipes_to_database(detailed_meals, created_by)
+
+        for i, (meal, detailed_meal, saved_recipe) in enumerate(zip(meals_data, detailed_meals, saved_recipes)):
             # Use meal type and time from the meal data (already set in generate_custom_meal_plan)
             meal_type = meal.get('meal_type', f'meal_{i+1}')
             meal_time = meal.get('time', '12:00')
@@ -921,6 +970,12 @@ class EnhancedSpoonacularService:
         }
 
         week_data = data.get('week', {})
+        day_keys = [day_key for day_key in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+                    if day_key in week_data]
+
+        # Save every recipe of the week to database in one batch, then hand each day its rows
+        week_meals = [meal for day_key in day_keys for meal in week_data[day_key].get('meals', [])]
+        saved_recipes = iter(self._save_recipes_to_database(week_meals, created_by))
         
         for day_key in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
             if day_key in week_data:
@@ -939,8 +994,7 @@ class EnhancedSpoonacularService:
                     meal_times = ['08:00', '12:30', '19:00']
                     
                     for i, meal in enumerate(day_meals_data):
-                        # Save recipe to database - commented out to prevent auto-save during meal plan generation
-                        # saved_recipe = self._save_recipe_to_database(meal, created_by)
+                        saved_recipe = next(saved_recipes)
                         
                         meal_type = meal_types[i] if i < len(meal_types) else 'snack'
                         meal_time = meal_times[i] if i < len(meal_times) else '15:00'
@@ -0,0 +1,213 @@
+# meal_planning/services/ingredient_resolver.py
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from ..models import Ingredient
+
+logger = logging.getLogger('nutrition.ingredient_resolver')
+
+
+class IngredientResolver:
+    """
+    In-process ingredient name resolution.
+
+    Loads the Ingredient table once and answers lookups from memory:
+    normalized exact names first, then substring matches (narrowed by a
+    trigram index), then caller-supplied variations and finally trigram
+    similarity. Resolved names are kept in an LRU. Signals invalidate the
+    resolver on Ingredient saves/deletes; a cheap count/updated_at check every
+    ``refresh_interval`` seconds catches changes made by other processes.
+    """
+
+    SEPARATORS = re.compile(r'[\s_\-]+')
+
+    def __init__(self, refresh_interval: float = None, cache_size: int = None, fuzzy_threshold: float = None):
+        config = getattr(settings, 'INGREDIENT_RESOLVER', {})
+        self.refresh_interval = refresh_interval if refresh_interval is not None else config.get('refresh_interval', 300.0)
+        self.cache_size = cache_size or config.get('cache_size', 4096)
+        self.fuzzy_threshold = fuzzy_threshold if fuzzy_threshold is not None else config.get('fuzzy_threshold', 0.6)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._ingredients: List[Ingredient] = []
+        self._exact: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._clean_names: List[str] = []
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._resolved: OrderedDict = OrderedDict()
+        self._version = None
+        self._last_checked = 0.0
+
+    def __len__(self):
+        return len(self._ingredients)
+
+    @classmethod
+    def normalize(cls, name: str) -> str:
+        """Lowercase and collapse spaces/underscores/hyphens to single spaces"""
+        return cls.SEPARATORS.sub(' ', (name or '').lower()).strip()
+
+    @staticmethod
+    def trigrams(text: str) -> Set[str]:
+        padded = f'  {text} '
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    # === LOADING ===
+
+    def refresh(self, force: bool = False):
+        """Reload the ingredient table if it changed (checked at most once per refresh_interval)"""
+        now = time.monotonic()
+        if not force and self._version is not None and now - self._last_checked < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and self._version is not None and now - self._last_checked < self.refresh_interval:
+                return
+
+            stats = Ingredient.objects.aggregate(total=Count('id'), latest=Max('updated_at'))
+            version = (stats['total'], stats['latest'])
+            if force or version != self._version:
+                self._load(version)
+            self._last_checked = time.monotonic()
+
+    def invalidate(self):
+        """Drop all loaded ingredients and resolved names; the next lookup reloads"""
+        with self._lock:
+            self._reset()
+
+    def _load(self, version):
+        started = time.monotonic()
+        self._reset()
+        # Ordered by primary key so ties resolve to the row QuerySet.first() would return
+        self._ingredients = list(Ingredient.objects.order_by('pk'))
+
+        for position, ingredient in enumerate(self._ingredients):
+            name = ingredient.name.lower()
+            clean = (ingredient.name_clean or '').lower()
+            self._names.append(name)
+            self._clean_names.append(clean)
+
+            for key in (self.normalize(name), self.normalize(clean)):
+                if key:
+                    self._exact.setdefault(key, position)
+                    self._exact.setdefault(key.replace(' ', ''), position)
+
+            for trigram in self.trigrams(name) | self.trigrams(clean):
+                self._trigrams.setdefault(trigram, set()).add(position)
+
+        self._version = version
+        logger.info(f"Loaded {len(self._ingredients)} ingredients into resolver in {time.monotonic() - started:.3f}s")
+
+    # === MATCHING ===
+
+    def _candidates(self, term: str) -> Optional[Set[int]]:
+        """Positions whose name or name_clean contains every trigram of ``term``"""
+        postings = []
+        for trigram in {term[i:i + 3] for i in range(len(term) - 2)}:
+            posting = self._trigrams.get(trigram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        if not postings:
+            return None  # Too short to narrow down, scan everything
+        postings.sort(key=len)
+        return set.intersection(*postings)
+
+    def _first_containing(self, term: str) -> Optional[int]:
+        """Lowest position whose name contains ``term`` (or name_clean contains its underscored form)"""
+        term = term.lower()
+        clean_term = term.replace(' ', '_')
+        if not term:
+            return None
+
+        candidates = self._candidates(term)
+        if candidates is not None and clean_term != term:
+            clean_candidates = self._candidates(clean_term)
+            candidates = None if clean_candidates is None else candidates | clean_candidates
+        positions = sorted(candidates) if candidates is not None else range(len(self._ingredients))
+
+        for position in positions:
+            if term in self._names[position] or clean_term in self._clean_names[position]:
+                return position
+        return None
+
+    def _most_similar(self, term: str) -> Optional[int]:
+        query = self.trigrams(term)
+        counts: Dict[int, int] = {}
+        for trigram in query:
+            for position in self._trigrams.get(trigram, ()):
+                counts[position] = counts.get(position, 0) + 1
+
+        best, best_score = None, self.fuzzy_threshold
+        for position in sorted(counts):
+            score = counts[position] / len(query | self.trigrams(self._names[position]))
+            if score > best_score:
+                best, best_score = position, score
+        return best
+
+    def _resolve_position(self, name: str, variations: Iterable[str]) -> Optional[int]:
+        key = self.normalize(name)
+        position = self._exact.get(key)
+        if position is None:
+            position = self._exact.get(key.replace(' ', ''))
+        if position is not None:
+            return position
+
+        position = self._first_containing(name.strip())
+        if position is not None:
+            return position
+
+        for variation in variations:
+            position = self._first_containing(variation)
+            if position is not None:
+                return position
+
+        if self.fuzzy_threshold < 1:
+            return self._most_similar(key)
+        return None
+
+    # === PUBLIC API ===
+
+    def resolve(self, name: str, variations: Iterable[str] = ()) -> Optional[Ingredient]:
+        """Resolve an ingredient name to an Ingredient, or None if nothing matches"""
+        if not name or not name.strip():
+            return None
+
+        cache_key = (name.strip().lower(), tuple(variations))
+        with self._lock:
+            self.refresh()
+            if cache_key in self._resolved:
+                self._resolved.move_to_end(cache_key)
+                position = self._resolved[cache_key]
+            else:
+                position = self._resolve_position(name, cache_key[1])
+                self._resolved[cache_key] = position
+                if len(self._resolved) > self.cache_size:
+                    self._resolved.popitem(last=False)
+            return self._ingredients[position] if position is not None else None
+
+    def resolve_many(self, names: Iterable[str]) -> Dict[str, Optional[Ingredient]]:
+        """Resolve several names at once (one freshness check for the whole batch)"""
+        self.refresh()
+        return {name: self.resolve(name) for name in names}
+
+
+_ingredient_resolver = None
+_ingredient_resolver_lock = threading.Lock()
+
+
+def get_ingredient_resolver() -> IngredientResolver:
+    """Return the shared per-process ingredient resolver"""
+    global _ingredient_resolver
+    if _ingredient_resolver is None:
+        with _ingredient_resolver_lock:
+            if _ingredient_resolver is None:
+                _ingredient_resolver = IngredientResolver()
+    return _ingredient_resolver
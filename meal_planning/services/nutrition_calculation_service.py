@@ -1,8 +1,11 @@
 # nutrition/services/nutrition_calculation_service.py
 import logging
-from typing import Dict, List, Any, Optional
-from django.db.models import Q
+import re
+from typing import Dict, Iterable, List, Any, Optional
+
+import numpy as np
 from meal_planning.models import Ingredient
+from meal_planning.services.ingredient_resolver import get_ingredient_resolver
 
 logger = logging.getLogger('nutrition')
 
@@ -19,7 +22,15 @@ class NutritionCalculationService:
     - calculate_meal_macros: Calculate macronutrient distribution
     """
 
+    NUTRIENT_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium')
+    INGREDIENT_LINE_PATTERN = re.compile(
+        r'^(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)?\s*'
+        r'(?:(?P<unit>g|grams?|kg|kilograms?|oz|ounces?|lbs?|pounds?|cups?|tbsp|tablespoons?|tsp|teaspoons?|'
+        r'ml|milliliters?|l|liters?|pieces?|items?|medium|large|small)\b\.?)?\s*(?P<name>.+)$'
+    )
+
     def __init__(self):
+        self.ingredient_resolver = get_ingredient_resolver()
         self.allergen_mappings = {
             'nuts': ['almond', 'walnut', 'pecan', 'cashew', 'pistachio', 'hazelnut', 'macadamia'],
             'peanuts': ['peanut', 'groundnut'],
@@ -178,6 +189,135 @@ class NutritionCalculationService:
                 'error': str(e)
             }
 
+    def calculate_many(self, recipes: Iterable[Any]) -> List[Dict]:
+        """
+        Calculate per-serving nutrition for many recipes at once
+
+        Every ingredient line is parsed and each distinct name is resolved once.
+        The lines then form a sparse (recipes x ingredients) gram matrix in
+        coordinate form, which is multiplied by the per-100g nutrient matrix with
+        NumPy. Unknown ingredients use the same estimates as
+        calculate_recipe_nutrition (which contribute no sodium).
+
+        Args:
+            recipes: Recipe instances, or dicts with 'ingredients' and 'servings'
+
+        Returns:
+            One dict per recipe, in input order, with nutrition_per_serving,
+            total_nutrition, servings and calculation_confidence
+        """
+        rows: List[int] = []
+        columns: List[int] = []
+        grams: List[float] = []
+        found: List[bool] = []
+        servings_list: List[int] = []
+
+        column_for_key: Dict[tuple, int] = {}
+        nutrient_rows: List[tuple] = []
+        grams_factor: Dict[tuple, float] = {}
+
+        for row, recipe in enumerate(recipes):
+            if isinstance(recipe, dict):
+                ingredient_lines, servings = recipe.get('ingredients') or [], recipe.get('servings')
+            else:
+                ingredient_lines, servings = recipe.ingredients_data or [], recipe.servings
+            servings_list.append(servings if servings and servings > 0 else 1)
+
+            for line in ingredient_lines:
+                name, quantity, unit = self._parse_ingredient_line(line)
+                if not name:
+                    continue
+
+                ingredient = self._find_ingredient(name)
+                key = ('db', ingredient.id) if ingredient else ('estimate', name)
+                column = column_for_key.get(key)
+                if column is None:
+                    column = column_for_key[key] = len(nutrient_rows)
+                    nutrient_rows.append(self._nutrient_vector(ingredient, name))
+
+                factor_key = (unit, name)
+                if factor_key not in grams_factor:
+                    grams_factor[factor_key] = self._convert_to_grams(1.0, unit, name)
+
+                rows.append(row)
+                columns.append(column)
+                grams.append(quantity * grams_factor[factor_key])
+                found.append(ingredient is not None)
+
+        recipe_count = len(servings_list)
+        if recipe_count == 0:
+            return []
+
+        totals = np.zeros((recipe_count, len(self.NUTRIENT_FIELDS)))
+        line_count = np.zeros(recipe_count)
+        found_count = np.zeros(recipe_count)
+        if rows:
+            rows_array = np.asarray(rows, dtype=np.int64)
+            contributions = (np.asarray(grams)[:, None] / 100.0) * np.asarray(nutrient_rows)[columns]
+            for k in range(len(self.NUTRIENT_FIELDS)):
+                totals[:, k] = np.bincount(rows_array, weights=contributions[:, k], minlength=recipe_count)
+            line_count = np.bincount(rows_array, minlength=recipe_count)
+            found_count = np.bincount(rows_array, weights=np.asarray(found, dtype=float), minlength=recipe_count)
+
+        servings_array = np.asarray(servings_list, dtype=float)
+        per_serving = np.round(totals / servings_array[:, None], 1)
+        totals = np.round(totals, 1)
+        confidence = np.round(np.divide(found_count * 100, line_count, out=np.zeros(recipe_count),
+                                        where=line_count > 0), 1)
+
+        return [
+            {
+                'nutrition_per_serving': dict(zip(self.NUTRIENT_FIELDS, per_serving[i].tolist())),
+                'total_nutrition': dict(zip(self.NUTRIENT_FIELDS, totals[i].tolist())),
+                'servings': servings_list[i],
+                'calculation_confidence': float(confidence[i]),
+            }
+            for i in range(recipe_count)
+        ]
+
+    def _nutrient_vector(self, ingredient: Optional[Ingredient], ingredient_name: str) -> tuple:
+        """Per-100g values in NUTRIENT_FIELDS order, from the database or the estimate table"""
+        if ingredient:
+            return (ingredient.calories_per_100g, ingredient.protein_per_100g, ingredient.carbs_per_100g,
+                    ingredient.fat_per_100g, ingredient.fiber_per_100g, ingredient.sodium_per_100g)
+        estimate = self._estimated_nutrition_per_100g(ingredient_name)
+        return (estimate['calories'], estimate['protein'], estimate['carbs'], estimate['fat'], estimate['fiber'], 0)
+
+    def _parse_ingredient_line(self, line: Any) -> tuple:
+        """
+        Normalize an ingredient entry to (name, quantity, unit)
+
+        Handles our {'name', 'quantity', 'unit'} dicts, Spoonacular's {'name', 'amount',
+        'unit', 'original'} dicts and plain strings such as '200g pasta' or '1 tbsp olive oil'.
+        """
+        if isinstance(line, dict):
+            name = (line.get('name') or '').strip().lower()
+            quantity = line.get('quantity', line.get('amount'))
+            unit = (line.get('unit') or '').strip().lower()
+            if name and quantity is not None:
+                try:
+                    return name, float(quantity), unit or 'gram'
+                except (TypeError, ValueError):
+                    pass
+            line = line.get('original') or line.get('original_string') or name
+
+        match = self.INGREDIENT_LINE_PATTERN.match(str(line).strip().lower())
+        if not match or not match.group('quantity'):
+            return str(line).strip().lower(), 0.0, 'gram'  # "salt to taste"
+        name = match.group('name').strip(' ,')
+        return name, self._parse_quantity(match.group('quantity')), match.group('unit') or 'piece'
+
+    @staticmethod
+    def _parse_quantity(text: str) -> float:
+        total = 0.0
+        for part in text.split():
+            if '/' in part:
+                numerator, denominator = part.split('/', 1)
+                total += float(numerator) / float(denominator) if float(denominator) else 0
+            else:
+                total += float(part)
+        return total
+
     def validate_dietary_restrictions(self, ingredients: List[str],
                                       dietary_preferences: List[str],
                                       allergies: List[str]) -> Dict:
@@ -319,38 +459,11 @@ class NutritionCalculationService:
             return []
 
     def _find_ingredient(self, ingredient_name: str) -> Optional[Ingredient]:
-        """Find ingredient in database with fuzzy matching"""
+        """Find ingredient in database with fuzzy matching (served from the in-process resolver)"""
         try:
-            # Direct match first
-            ingredient = Ingredient.objects.filter(
-                Q(name__iexact=ingredient_name) |
-                Q(name_clean__iexact=ingredient_name.replace(' ', '_'))
-            ).first()
-
-            if ingredient:
-                return ingredient
-
-            # Partial match
-            ingredient = Ingredient.objects.filter(
-                Q(name__icontains=ingredient_name) |
-                Q(name_clean__icontains=ingredient_name.replace(' ', '_'))
-            ).first()
-
-            if ingredient:
-                return ingredient
-
-            # Check for common variations
-            variations = self._get_ingredient_variations(ingredient_name)
-            for variation in variations:
-                ingredient = Ingredient.objects.filter(
-                    Q(name__icontains=variation) |
-                    Q(name_clean__icontains=variation.replace(' ', '_'))
-                ).first()
-
-                if ingredient:
-                    return ingredient
-
-            return None
+            return self.ingredient_resolver.resolve(
+                ingredient_name, variations=self._get_ingredient_variations(ingredient_name)
+            )
 
         except Exception as e:
             logger.error(f"Error finding ingredient '{ingredient_name}': {e}")
@@ -429,6 +542,21 @@ class NutritionCalculationService:
     def _estimate_ingredient_nutrition(self, ingredient_name: str, quantity: float, unit: str) -> Dict:
         """Estimate nutrition for unknown ingredients"""
         quantity_grams = self._convert_to_grams(quantity, unit, ingredient_name)
+        estimated_nutrition = self._estimated_nutrition_per_100g(ingredient_name)
+
+        # Scale by quantity
+        multiplier = quantity_grams / 100.0
+
+        return {
+            'calories': estimated_nutrition['calories'] * multiplier,
+            'protein': estimated_nutrition['protein'] * multiplier,
+            'carbs': estimated_nutrition['carbs'] * multiplier,
+            'fat': estimated_nutrition['fat'] * multiplier,
+            'fiber': estimated_nutrition['fiber'] * multiplier
+        }
+
+    def _estimated_nutrition_per_100g(self, ingredient_name: str) -> Dict:
+        """Rough per-100g nutrition for ingredients missing from the database"""
         ingredient_name = ingredient_name.lower()
 
         # Basic nutrition estimates per 100g
@@ -466,16 +594,7 @@ class NutritionCalculationService:
                 estimated_nutrition = nutrition
                 break
 
-        # Scale by quantity
-        multiplier = quantity_grams / 100.0
-
-        return {
-            'calories': estimated_nutrition['calories'] * multiplier,
-            'protein': estimated_nutrition['protein'] * multiplier,
-            'carbs': estimated_nutrition['carbs'] * multiplier,
-            'fat': estimated_nutrition['fat'] * multiplier,
-            'fiber': estimated_nutrition['fiber'] * multiplier
-        }
+        return estimated_nutrition
 
     def _check_dietary_preference(self, ingredients: List[str], preference: str) -> Dict:
         """Check if ingredients comply with dietary preference"""
@@ -0,0 +1,194 @@
+# meal_planning/services/nutrition_log_analytics.py
+from datetime import date
+from typing import Dict, List, Optional
+
+from utils.downsampling import lttb_indices, take
+from utils.lazy_imports import lazy_import
+from ..models import NutritionLog, NutritionProfile
+
+np = lazy_import('numpy')
+
+
+class NutritionLogAnalytics:
+    """
+    Nutrition log statistics for one user and date range.
+
+    The range is pulled with a single ``values_list`` query into a NumPy
+    array; averages, target hit rates, the trend regression and period
+    comparisons are all derived from that array. Backs the progress_summary,
+    goal_stats and trends endpoints of NutritionLogViewSet.
+    """
+
+    FIELDS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat', 'calorie_deficit_surplus')
+    METRICS = ('calories', 'protein', 'carbs', 'fat')
+
+    # (lower, upper) multipliers of the profile target that count as "on target"
+    TARGET_RANGES = {
+        'calories': (0.9, 1.1),
+        'protein': (0.8, None),
+        'carbs': (0.8, 1.2),
+        'fat': (0.8, 1.2),
+    }
+
+    def __init__(self, user, start_date: date, end_date: date, queryset=None):
+        self.start_date = start_date
+        self.end_date = end_date
+
+        queryset = queryset if queryset is not None else NutritionLog.objects.filter(user=user)
+        rows = list(
+            queryset.filter(date__gte=start_date, date__lte=end_date)
+            .order_by('date')
+            .values_list('date', *self.FIELDS)
+        )
+        self.dates: List[date] = [row[0] for row in rows]
+        self.values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(self.FIELDS))
+
+    @property
+    def total_days(self) -> int:
+        return len(self.dates)
+
+    def column(self, name: str) -> 'np.ndarray':
+        """Daily values for a metric ('calories', ...) or raw field name"""
+        field = name if name in self.FIELDS else f'total_{name}'
+        return self.values[:, self.FIELDS.index(field)]
+
+    # === BUILDING BLOCKS ===
+
+    def averages(self) -> Dict[str, float]:
+        if not self.total_days:
+            return {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'total_deficit': 0}
+
+        means = self.values.mean(axis=0)
+        averages = {metric: round(float(means[i]), 1) for i, metric in enumerate(self.METRICS)}
+        averages['total_deficit'] = round(float(self.column('calorie_deficit_surplus').sum()), 1)
+        return averages
+
+    def target_hits(self, nutrition_profile: NutritionProfile) -> Dict[str, int]:
+        """Number of logged days within TARGET_RANGES of each profile target"""
+        targets = self.targets(nutrition_profile)
+        hits = {}
+        for metric, (lower, upper) in self.TARGET_RANGES.items():
+            values = self.column(metric)
+            on_target = values >= targets[metric] * lower
+            if upper is not None:
+                on_target &= values <= targets[metric] * upper
+            hits[metric] = int(np.count_nonzero(on_target))
+        return hits
+
+    @staticmethod
+    def targets(nutrition_profile: NutritionProfile) -> Dict[str, float]:
+        return {
+            'calories': nutrition_profile.calorie_target,
+            'protein': nutrition_profile.protein_target,
+            'carbs': nutrition_profile.carb_target,
+            'fat': nutrition_profile.fat_target
+        }
+
+    @staticmethod
+    def _date_range(start_date: str, end_date: str) -> Dict[str, str]:
+        return {'start_date': start_date, 'end_date': end_date}
+
+    # === ENDPOINT PAYLOADS ===
+
+    def progress_summary(self, nutrition_profile: NutritionProfile, start_date: str, end_date: str) -> Dict:
+        total_days = self.total_days
+        days_on_target = self.target_hits(nutrition_profile)['calories'] if total_days else 0
+        consistency_score = (days_on_target / total_days * 100) if total_days > 0 else 0
+
+        return {
+            'averages': self.averages(),
+            'targets': self.targets(nutrition_profile),
+            'stats': {
+                'total_days': total_days,
+                'days_on_target': days_on_target,
+                'consistency_score': round(consistency_score, 1)
+            },
+            'date_range': self._date_range(start_date, end_date)
+        }
+
+    def goal_stats(self, nutrition_profile: NutritionProfile, start_date: str, end_date: str) -> Dict:
+        total_days = self.total_days
+        if not total_days:
+            return {
+                'total_days': 0,
+                'achievements': {metric: {'days_achieved': 0, 'percentage': 0} for metric in self.METRICS},
+                'overall_consistency': 0,
+                'date_range': self._date_range(start_date, end_date)
+            }
+
+        hits = self.target_hits(nutrition_profile)
+        return {
+            'total_days': total_days,
+            'achievements': {
+                metric: {
+                    'days_achieved': hits[metric],
+                    'percentage': round(hits[metric] / total_days * 100, 1)
+                }
+                for metric in self.METRICS
+            },
+            'overall_consistency': round(sum(hits.values()) / (4 * total_days) * 100, 1),
+            'date_range': self._date_range(start_date, end_date)
+        }
+
+    def trends(self, metric: str, start_date: str, end_date: str, max_points: Optional[int] = None) -> Dict:
+        """Trend payload; ``max_points`` downsamples daily_data (LTTB), statistics use every day"""
+        values = self.column(metric)
+        daily_values = values.tolist()
+        dates = [log_date.strftime('%Y-%m-%d') for log_date in self.dates]
+        trend_data = {
+            'metric': metric,
+            'date_range': self._date_range(start_date, end_date),
+            'daily_data': {'dates': dates, 'values': daily_values},
+            'data_points': len(daily_values)
+        }
+        if max_points is not None and max_points < len(daily_values):
+            indices = lttb_indices([log_date.toordinal() for log_date in self.dates], values, max_points)
+            trend_data['daily_data'] = {'dates': take(dates, indices), 'values': take(daily_values, indices)}
+            trend_data['returned_points'] = len(indices)
+        no_change = {'recent_average': 0, 'previous_average': 0, 'change': 0, 'change_percentage': 0}
+
+        if len(daily_values) == 0:
+            trend_data['statistics'] = {
+                'average': 0, 'minimum': 0, 'maximum': 0, 'slope': 0, 'trend_direction': 'no_data'
+            }
+            trend_data['period_comparison'] = no_change
+        elif len(daily_values) == 1:
+            trend_data['statistics'] = {
+                'average': daily_values[0], 'minimum': daily_values[0], 'maximum': daily_values[0],
+                'slope': 0, 'trend_direction': 'insufficient_data'
+            }
+            trend_data['period_comparison'] = no_change
+        else:
+            slope = self._slope(values)
+            trend_direction = 'increasing' if slope > 0.1 else ('decreasing' if slope < -0.1 else 'stable')
+
+            # Recent half vs previous half of the logged days
+            mid_point = len(values) // 2
+            recent_avg = float(values[mid_point:].mean())
+            previous_avg = float(values[:mid_point].mean()) if mid_point > 0 else 0
+
+            trend_data['statistics'] = {
+                'average': round(float(values.mean()), 1),
+                'minimum': round(float(values.min()), 1),
+                'maximum': round(float(values.max()), 1),
+                'slope': round(slope, 3),
+                'trend_direction': trend_direction
+            }
+            trend_data['period_comparison'] = {
+                'recent_average': round(recent_avg, 1),
+                'previous_average': round(previous_avg, 1),
+                'change': round(recent_avg - previous_avg, 1),
+                'change_percentage': round((recent_avg - previous_avg) / previous_avg * 100, 1) if previous_avg > 0 else 0
+            }
+
+        return trend_data
+
+    @staticmethod
+    def _slope(values: 'np.ndarray') -> float:
+        """Least-squares slope of values against their position (one unit per logged day)"""
+        x = np.arange(len(values), dtype=np.float64)
+        x_centered = x - x.mean()
+        denominator = float(x_centered @ x_centered)
+        if denominator == 0:
+            return 0.0
+        return float(x_centered @ (values - values.mean())) / denominator
@@ -0,0 +1,235 @@
+# meal_planning/services/nutrition_rollups.py
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from ..models import NutritionLog, NutritionLogRollup, NutritionProfile
+
+ROLLUP_SUMS = {
+    'total_calories': 'total_calories',
+    'total_protein': 'total_protein',
+    'total_carbs': 'total_carbs',
+    'total_fat': 'total_fat',
+    'total_fiber': 'total_fiber',
+    'total_deficit_surplus': 'calorie_deficit_surplus',
+}
+
+
+def period_start(day: date, period: str) -> date:
+    """First day of the ISO week (Monday) or calendar month containing ``day``"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(start: date, period: str) -> date:
+    if period == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+class NutritionRollupService:
+    """Maintains NutritionLogRollup rows and answers range totals from them"""
+
+    PERIODS = ('week', 'month')
+    ON_TARGET_RANGE = (0.9, 1.1)
+
+    # === MAINTENANCE ===
+
+    @classmethod
+    def refresh_for_dates(cls, user_id, dates: Iterable[date], calorie_target: Optional[float] = None):
+        """Rebuild the week and month rollups containing ``dates`` for one user"""
+        periods = {(period, period_start(day, period)) for day in dates for period in cls.PERIODS}
+        if not periods:
+            return
+
+        if calorie_target is None:
+            calorie_target = (
+                NutritionProfile.objects.filter(user_id=user_id).values_list('calorie_target', flat=True).first()
+            )
+
+        with transaction.atomic():
+            for period, start in sorted(periods):
+                cls._rebuild_period(user_id, period, start, calorie_target)
+
+    @classmethod
+    def _rebuild_period(cls, user_id, period: str, start: date, calorie_target: Optional[float]):
+        aggregates = cls._log_sums()
+        aggregates['days_logged'] = Count('id')
+        if calorie_target:
+            lower, upper = cls.ON_TARGET_RANGE
+            aggregates['days_on_target'] = Count('id', filter=Q(
+                total_calories__gte=calorie_target * lower,
+                total_calories__lte=calorie_target * upper
+            ))
+
+        totals = NutritionLog.objects.filter(
+            user_id=user_id, date__gte=start, date__lte=period_end(start, period)
+        ).aggregate(**aggregates)
+
+        if not totals['days_logged']:
+            NutritionLogRollup.objects.filter(user_id=user_id, period=period, period_start=start).delete()
+            return
+
+        defaults = {key: totals[f'sum_{key}'] or 0 for key in ROLLUP_SUMS}
+        defaults['days_logged'] = totals['days_logged']
+        defaults['days_on_target'] = totals.get('days_on_target') or 0
+        NutritionLogRollup.objects.update_or_create(
+            user_id=user_id, period=period, period_start=start, defaults=defaults
+        )
+
+    @classmethod
+    def backfill(cls, user_ids: Optional[Iterable] = None, batch_size: int = 2000) -> int:
+        """
+        Rebuild rollups from scratch with one grouped query per period.
+
+        Restricted to ``user_ids`` when given; returns the number of rows written.
+        """
+        logs = NutritionLog.objects.all()
+        existing = NutritionLogRollup.objects.all()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            logs = logs.filter(user_id__in=user_ids)
+            existing = existing.filter(user_id__in=user_ids)
+
+        rows = []
+        for period, trunc in (('week', TruncWeek), ('month', TruncMonth)):
+            grouped = (
+                logs.annotate(bucket=trunc('date'))
+                .values('user_id', 'bucket')
+                .annotate(days_logged=Count('id'), days_on_target=cls._on_target_count(), **cls._log_sums())
+            )
+            for group in grouped.iterator(chunk_size=batch_size):
+                rows.append(NutritionLogRollup(
+                    user_id=group['user_id'], period=period, period_start=group['bucket'],
+                    days_logged=group['days_logged'], days_on_target=group['days_on_target'],
+                    **{key: group[f'sum_{key}'] or 0 for key in ROLLUP_SUMS}
+                ))
+
+        with transaction.atomic():
+            existing.delete()
+            NutritionLogRollup.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+
+    @staticmethod
+    def _log_sums() -> Dict[str, Sum]:
+        # Aliased so they don't clash with the NutritionLog fields being summed
+        return {f'sum_{key}': Sum(field) for key, field in ROLLUP_SUMS.items()}
+
+    @classmethod
+    def _on_target_count(cls) -> Count:
+        """Count of logs within ON_TARGET_RANGE of the owner's current calorie target"""
+        target = F('user__nutrition_profile__calorie_target')
+        return Count('id', filter=Q(
+            user__nutrition_profile__calorie_target__gt=0,
+            total_calories__gte=target * cls.ON_TARGET_RANGE[0],
+            total_calories__lte=target * cls.ON_TARGET_RANGE[1],
+        ))
+
+    # === QUERIES ===
+
+    @staticmethod
+    def _plan_range(start_date: date, end_date: date) -> Tuple[List[date], List[date], List[date]]:
+        """Cover [start, end] greedily with whole months, then whole ISO weeks, then single days"""
+        months, weeks, days = [], [], []
+        cursor = start_date
+        while cursor <= end_date:
+            if cursor.day == 1 and period_end(cursor, 'month') <= end_date:
+                months.append(cursor)
+                cursor = period_end(cursor, 'month') + timedelta(days=1)
+            elif cursor.weekday() == 0 and cursor + timedelta(days=6) <= end_date:
+                weeks.append(cursor)
+                cursor += timedelta(days=7)
+            else:
+                days.append(cursor)
+                cursor += timedelta(days=1)
+        return months, weeks, days
+
+    @classmethod
+    def range_totals(cls, user, start_date: date, end_date: date) -> Dict[str, float]:
+        """
+        Sums, logged-day count and on-target days for a date range.
+
+        Whole months and weeks come from rollup rows; only the ragged edges
+        are read from NutritionLog, so the cost is at most two queries
+        however long the range is.
+        """
+        months, weeks, days = cls._plan_range(start_date, end_date)
+        totals = {key: 0.0 for key in ROLLUP_SUMS}
+        totals['days_logged'] = 0
+        totals['days_on_target'] = 0
+
+        if months or weeks:
+            rollup_filter = Q(period='month', period_start__in=months) | Q(period='week', period_start__in=weeks)
+            rollups = NutritionLogRollup.objects.filter(rollup_filter, user=user).aggregate(
+                sum_days_logged=Sum('days_logged'), sum_days_on_target=Sum('days_on_target'),
+                **{f'sum_{key}': Sum(key) for key in ROLLUP_SUMS}
+            )
+            for key in totals:
+                totals[key] += rollups[f'sum_{key}'] or 0
+
+        if days:
+            edges = NutritionLog.objects.filter(user=user, date__in=days).aggregate(
+                sum_days_logged=Count('id'), sum_days_on_target=cls._on_target_count(), **cls._log_sums()
+            )
+            for key in totals:
+                totals[key] += edges[f'sum_{key}'] or 0
+
+        return totals
+
+    @staticmethod
+    def averages(totals: Dict[str, float]) -> Dict[str, float]:
+        """Per-logged-day averages in the NutritionLogAnalytics.averages() shape"""
+        days = totals['days_logged']
+        if not days:
+            return {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'total_deficit': 0}
+        averages = {
+            metric: round(totals[f'total_{metric}'] / days, 1) for metric in ('calories', 'protein', 'carbs', 'fat')
+        }
+        averages['total_deficit'] = round(totals['total_deficit_surplus'], 1)
+        return averages
+
+    @classmethod
+    def period_series(cls, user, period: str, start_date: date, end_date: date) -> List[NutritionLogRollup]:
+        """
+        Rollup rows of one granularity overlapping [start, end], oldest first.
+
+        A first or last period that extends past the range is recomputed from
+        NutritionLog for only the days inside it, as an unsaved row whose
+        ``period_start`` is the clipped start. The series therefore adds up
+        to ``range_totals`` for the same range, at the cost of up to two
+        extra queries.
+        """
+        rollups = NutritionLogRollup.objects.filter(
+            user=user, period=period,
+            period_start__gte=period_start(start_date, period), period_start__lte=end_date
+        ).order_by('period_start')
+
+        series = []
+        for rollup in rollups:
+            start, end = rollup.period_start, period_end(rollup.period_start, period)
+            if start >= start_date and end <= end_date:
+                series.append(rollup)
+                continue
+            clipped = cls._clipped_rollup(user, period, max(start, start_date), min(end, end_date))
+            if clipped is not None:
+                series.append(clipped)
+        return series
+
+    @classmethod
+    def _clipped_rollup(cls, user, period: str, start: date, end: date) -> Optional[NutritionLogRollup]:
+        """Unsaved rollup row for the part of a period inside the requested range"""
+        totals = NutritionLog.objects.filter(user=user, date__gte=start, date__lte=end).aggregate(
+            sum_days_logged=Count('id'), sum_days_on_target=cls._on_target_count(), **cls._log_sums()
+        )
+        if not totals['sum_days_logged']:
+            return None
+        return NutritionLogRollup(
+            user=user, period=period, period_start=start,
+            days_logged=totals['sum_days_logged'], days_on_target=totals['sum_days_on_target'] or 0,
+            **{key: totals[f'sum_{key}'] or 0 for key in ROLLUP_SUMS}
+        )
@@ -4,9 +4,10 @@ import json
 from typing import Dict, List, Optional, Any
 from django.db.models import Q
 from django.db import transaction
+from utils.llm_gateway import get_llm_gateway
 from ..models import Recipe, Ingredient, NutritionProfile
-import openai
-from decouple import config
+from .recipe_index import get_recipe_index
+from .recipe_vector_index import get_recipe_vector_index
 
 logger = logging.getLogger('nutrition.rag_recipe')
 
@@ -22,8 +23,9 @@ class RAGRecipeService:
     """
 
     def __init__(self):
-        openai.api_key = config('OPENAI_API_KEY', default='')
         self.min_recipe_database_size = 100  # Minimum recipes needed for good RAG
+        self.recipe_index = get_recipe_index()
+        self.vector_index = get_recipe_vector_index()
 
     @transaction.atomic
     def get_rag_recipe_recommendations(self, nutrition_profile: NutritionProfile, 
@@ -84,50 +86,70 @@ class RAGRecipeService:
         """
         Retrieve recipes from database that match user preferences
         
-        This is the "Retrieval" part of RAG
+        This is the "Retrieval" part of RAG. Filtering and ranking run against
+        the in-memory recipe index; only the top matches are loaded from the DB.
         """
         try:
-            # Start with base query
-            recipes = Recipe.objects.filter(meal_type=meal_type)
-            
-            # Filter by dietary preferences
-            for dietary_pref in nutrition_profile.dietary_preferences or []:
-                recipes = recipes.filter(dietary_tags__contains=[dietary_pref])
-            
-            # Exclude allergens
-            for allergen in nutrition_profile.allergies_intolerances or []:
-                recipes = recipes.exclude(allergens__contains=[allergen])
-            
-            # Filter by cuisine if specified
-            if cuisine_preference:
-                recipes = recipes.filter(cuisine__icontains=cuisine_preference)
-            elif nutrition_profile.cuisine_preferences:
-                recipes = recipes.filter(cuisine__in=nutrition_profile.cuisine_preferences)
-            
-            # Exclude disliked ingredients
-            for disliked in nutrition_profile.disliked_ingredients or []:
-                recipes = recipes.exclude(ingredients__icontains=disliked)
-            
-            # Filter by calorie range (within 20% of target per meal)
+            # Calorie range is within 20% of target per meal
             meal_calorie_target = nutrition_profile.calorie_target // nutrition_profile.meals_per_day
-            calorie_min = meal_calorie_target * 0.8
-            calorie_max = meal_calorie_target * 1.2
-            
-            recipes = recipes.filter(
-                nutrition_per_serving__calories__gte=calorie_min,
-                nutrition_per_serving__calories__lte=calorie_max
+
+            ranked = self.recipe_index.search(
+                meal_type=meal_type,
+                calorie_target=meal_calorie_target,
+                dietary_preferences=nutrition_profile.dietary_preferences,
+                allergens=nutrition_profile.allergies_intolerances,
+                cuisine_preference=cuisine_preference,
+                cuisine_preferences=nutrition_profile.cuisine_preferences,
+                disliked_ingredients=nutrition_profile.disliked_ingredients,
+                calorie_tolerance=0.2,
+                limit=10
             )
-            
-            # Order by rating and relevance
-            recipes = recipes.order_by('-rating', '-created_at')
-            
-            # Return top 10 most relevant recipes
-            return list(recipes[:10])
+
+            # Return top 10 most relevant recipes, in ranked order
+            recipes_by_id = Recipe.objects.in_bulk([recipe_id for recipe_id, _ in ranked])
+            recipes = []
+            for recipe_id, relevance_score in ranked:
+                recipe = recipes_by_id.get(recipe_id)
+                if recipe is not None:
+                    recipe.relevance_score = relevance_score
+                    recipes.append(recipe)
+
+            return recipes
             
         except Exception as e:
             logger.error(f"Error retrieving relevant recipes: {str(e)}")
             return []
 
+    def semantic_search_recipes(self, query: str, limit: int = 10, queryset=None) -> List[Recipe]:
+        """
+        Find recipes similar to a free-text query ("something like a Thai green curry")
+        using the embedding vector index.
+
+        If ``queryset`` is given, only its recipes are ranked. Each returned recipe
+        carries a ``similarity_score``; recipes without embeddings are never returned.
+        """
+        try:
+            candidate_ids = None
+            if queryset is not None:
+                candidate_ids = list(queryset.filter(embedding_vector__isnull=False).values_list('id', flat=True))
+                if not candidate_ids:
+                    return []
+
+            ranked = self.vector_index.search_text(query, limit=limit, candidate_ids=candidate_ids)
+
+            recipes_by_id = Recipe.objects.in_bulk([recipe_id for recipe_id, _ in ranked])
+            recipes = []
+            for recipe_id, similarity in ranked:
+                recipe = recipes_by_id.get(recipe_id)
+                if recipe is not None:
+                    recipe.similarity_score = similarity
+                    recipes.append(recipe)
+            return recipes
+
+        except Exception as e:
+            logger.error(f"Error in semantic recipe search: {str(e)}")
+            return []
+
     def _generate_rag_recipes(self, retrieved_recipes: List[Recipe], 
                             nutrition_profile: NutritionProfile, 
                             meal_type: str, cuisine_preference: str = None) -> List[Dict]:
@@ -166,7 +188,7 @@ class RAGRecipeService:
             Format each recipe as JSON with: title, ingredients, instructions, nutrition_estimate, cooking_time, difficulty
             """
 
-            response = openai.ChatCompletion.create(
+            response = get_llm_gateway().chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=2000,
@@ -191,14 +213,24 @@ class RAGRecipeService:
             context += f"""
             Recipe {i}: {recipe.title}
             Cuisine: {recipe.cuisine}
-            Ingredients: {', '.join(recipe.ingredients[:10])}  # First 10 ingredients
-            Calories: {recipe.nutrition_per_serving.get('calories', 'N/A')}
-            Protein: {recipe.nutrition_per_serving.get('protein', 'N/A')}g
-            Rating: {recipe.rating}/5
+            Ingredients: {', '.join(self._ingredient_names(recipe)[:10])}  # First 10 ingredients
+            Calories: {recipe.calories_per_serving}
+            Protein: {recipe.protein_per_serving}g
+            Rating: {recipe.rating_avg}/5
             Tags: {', '.join(recipe.dietary_tags or [])}
             """
         return context
 
+    def _ingredient_names(self, recipe: Recipe) -> List[str]:
+        """Readable ingredient lines from a recipe's ingredients_data"""
+        names = []
+        for item in recipe.ingredients_data or []:
+            if isinstance(item, dict):
+                names.append(str(item.get('original') or item.get('name') or ''))
+            else:
+                names.append(str(item))
+        return names
+
     def _prepare_user_context(self, nutrition_profile: NutritionProfile, 
                             meal_type: str, cuisine_preference: str = None) -> str:
         """Prepare user requirements as context for AI"""
@@ -281,15 +313,21 @@ class RAGRecipeService:
                     'id': recipe.id,
                     'title': recipe.title,
                     'cuisine': recipe.cuisine,
-                    'ingredients': recipe.ingredients,
-                    'instructions': recipe.preparation_steps,
-                    'nutrition': recipe.nutrition_per_serving,
-                    'rating': recipe.rating,
+                    'ingredients': recipe.ingredients_data,
+                    'instructions': recipe.instructions,
+                    'nutrition': {
+                        'calories': recipe.calories_per_serving,
+                        'protein': recipe.protein_per_serving,
+                        'carbs': recipe.carbs_per_serving,
+                        'fat': recipe.fat_per_serving,
+                    },
+                    'rating': recipe.rating_avg,
                     'source': 'database',
                     'dietary_tags': recipe.dietary_tags or [],
-                    'cooking_time': recipe.cook_time,
+                    'cooking_time': recipe.total_time_minutes,
                     'difficulty': recipe.difficulty_level,
-                    'relevance_score': self._calculate_relevance_score(recipe, nutrition_profile)
+                    'relevance_score': getattr(recipe, 'relevance_score', None)
+                    or self._calculate_relevance_score(recipe, nutrition_profile)
                 })
             
             # Add AI-generated recipes
@@ -320,7 +358,7 @@ class RAGRecipeService:
             score = 0.0
             
             # Base score from rating
-            score += (recipe.rating or 0) / 5 * 0.3
+            score += (recipe.rating_avg or 0) / 5 * 0.3
             
             # Dietary preference matching
             user_prefs = set(nutrition_profile.dietary_preferences or [])
@@ -336,7 +374,7 @@ class RAGRecipeService:
             
             # Calorie target matching
             meal_target = nutrition_profile.calorie_target // nutrition_profile.meals_per_day
-            recipe_calories = recipe.nutrition_per_serving.get('calories', meal_target)
+            recipe_calories = recipe.calories_per_serving or meal_target
             calorie_diff = abs(recipe_calories - meal_target) / meal_target
             score += max(0, (1 - calorie_diff)) * 0.2
             
@@ -377,7 +415,7 @@ class RAGRecipeService:
                     'id': recipe.id,
                     'title': recipe.title,
                     'cuisine': recipe.cuisine,
-                    'rating': recipe.rating,
+                    'rating': recipe.rating_avg,
                     'source': 'database_basic',
                     'relevance_score': 0.6
                 })
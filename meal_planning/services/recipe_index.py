@@ -0,0 +1,319 @@
+# meal_planning/services/recipe_index.py
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db.models import Max
+
+from ..models import Recipe
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger('nutrition.recipe_index')
+
+
+class RecipeIndex:
+    """
+    Process-local, NumPy-backed index of the recipe catalogue.
+
+    Holds per-serving macros, ratings, meal type / cuisine codes and bitsets of
+    dietary tags and allergens as flat arrays, so candidate filtering and
+    relevance scoring run as vectorized operations instead of ORM filter
+    chains. The index refreshes incrementally from ``Recipe.updated_at`` and
+    falls back to a full rebuild when rows have been deleted.
+    """
+
+    MACRO_FIELDS = ('calories_per_serving', 'protein_per_serving', 'carbs_per_serving', 'fat_per_serving')
+    LOAD_FIELDS = ('id', 'meal_type', 'cuisine', *MACRO_FIELDS, 'rating_avg', 'created_at',
+                   'updated_at', 'dietary_tags', 'allergens', 'ingredients_data')
+
+    def __init__(self, refresh_interval: float = 30.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._ids: List = []
+        self._positions: Dict = {}
+        self._macros = np.zeros((0, len(self.MACRO_FIELDS)), dtype=np.float32)
+        self._rating = np.zeros(0, dtype=np.float32)
+        self._created_at = np.zeros(0, dtype=np.float64)
+        self._meal_type = np.zeros(0, dtype=np.int32)
+        self._cuisine = np.zeros(0, dtype=np.int32)
+        self._dietary_bits = np.zeros((0, 1), dtype=np.uint64)
+        self._allergen_bits = np.zeros((0, 1), dtype=np.uint64)
+        self._ingredient_text: List[str] = []
+
+        self._meal_type_codes: Dict[str, int] = {}
+        self._cuisine_codes: Dict[str, int] = {}
+        self._dietary_vocab: Dict[str, int] = {}
+        self._allergen_vocab: Dict[str, int] = {}
+        self._term_masks: Dict[str, 'np.ndarray'] = {}
+
+        self._watermark = None
+        self._last_checked = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    # === REFRESH ===
+
+    def refresh(self, force: bool = False):
+        """Bring the index up to date with the Recipe table (at most once per refresh_interval)"""
+        now = time.monotonic()
+        if not force and self._watermark is not None and now - self._last_checked < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and self._watermark is not None and now - self._last_checked < self.refresh_interval:
+                return
+
+            if self._watermark is None:
+                self._rebuild()
+            else:
+                changed = list(
+                    Recipe.objects.filter(updated_at__gte=self._watermark).values_list(*self.LOAD_FIELDS)
+                )
+                if changed:
+                    self._upsert_rows(changed)
+                # Deletes are only detectable as a shrinking table
+                if Recipe.objects.count() != len(self._ids):
+                    self._rebuild()
+
+            self._last_checked = time.monotonic()
+
+    def invalidate(self):
+        """Drop the index; the next refresh performs a full rebuild"""
+        with self._lock:
+            self._reset()
+
+    def _rebuild(self):
+        started = time.monotonic()
+        self._reset()
+        watermark = Recipe.objects.aggregate(latest=Max('updated_at'))['latest']
+        rows = list(Recipe.objects.values_list(*self.LOAD_FIELDS).iterator(chunk_size=2000))
+        self._upsert_rows(rows)
+        self._watermark = watermark if watermark is not None else self._watermark
+        logger.info(f"Built recipe index with {len(self._ids)} recipes in {time.monotonic() - started:.3f}s")
+
+    def _upsert_rows(self, rows: Sequence[tuple]):
+        if not rows:
+            return
+
+        new_rows = [row for row in rows if row[0] not in self._positions]
+        if new_rows:
+            self._grow(len(new_rows))
+
+        for row in rows:
+            (recipe_id, meal_type, cuisine, calories, protein, carbs, fat, rating,
+             created_at, updated_at, dietary_tags, allergens, ingredients_data) = row
+
+            position = self._positions.get(recipe_id)
+            if position is None:
+                position = len(self._ids)
+                self._positions[recipe_id] = position
+                self._ids.append(recipe_id)
+                self._ingredient_text.append('')
+
+            self._macros[position] = (calories or 0, protein or 0, carbs or 0, fat or 0)
+            self._rating[position] = rating or 0
+            self._created_at[position] = created_at.timestamp() if created_at else 0
+            self._meal_type[position] = self._code(self._meal_type_codes, meal_type or '')
+            self._cuisine[position] = self._code(self._cuisine_codes, cuisine or '')
+            self._dietary_bits = self._set_bits(self._dietary_bits, self._dietary_vocab, position, dietary_tags)
+            self._allergen_bits = self._set_bits(self._allergen_bits, self._allergen_vocab, position, allergens)
+            self._ingredient_text[position] = self._flatten_ingredients(ingredients_data)
+
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        # Substring masks depend on ingredient text, recompute lazily
+        self._term_masks.clear()
+
+    def _grow(self, count: int):
+        size = len(self._ids) + count
+        self._macros = self._resize(self._macros, size)
+        self._rating = self._resize(self._rating, size)
+        self._created_at = self._resize(self._created_at, size)
+        self._meal_type = self._resize(self._meal_type, size)
+        self._cuisine = self._resize(self._cuisine, size)
+        self._dietary_bits = self._resize(self._dietary_bits, size)
+        self._allergen_bits = self._resize(self._allergen_bits, size)
+
+    @staticmethod
+    def _resize(array: 'np.ndarray', size: int) -> 'np.ndarray':
+        grown = np.zeros((size,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array[:size]
+        return grown
+
+    @staticmethod
+    def _code(codes: Dict[str, int], value: str) -> int:
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
+
+    def _set_bits(self, bits: 'np.ndarray', vocab: Dict[str, int], position: int,
+                  values: Optional[Iterable[str]]) -> 'np.ndarray':
+        bits[position] = 0
+        for value in values or []:
+            bit = self._code(vocab, value)
+            word, offset = divmod(bit, 64)
+            if word >= bits.shape[1]:
+                widened = np.zeros((bits.shape[0], word + 1), dtype=np.uint64)
+                widened[:, :bits.shape[1]] = bits
+                bits = widened
+            bits[position, word] |= np.uint64(1 << offset)
+        return bits
+
+    @staticmethod
+    def _flatten_ingredients(ingredients_data) -> str:
+        if not ingredients_data:
+            return ''
+        if isinstance(ingredients_data, dict):
+            ingredients_data = list(ingredients_data.values())
+        if not isinstance(ingredients_data, list):
+            return str(ingredients_data).lower()
+
+        parts = []
+        for item in ingredients_data:
+            if isinstance(item, dict):
+                parts.append(str(item.get('original') or item.get('name') or ''))
+            else:
+                parts.append(str(item))
+        return ' | '.join(parts).lower()
+
+    # === QUERY HELPERS ===
+
+    def _mask_for_values(self, bits: 'np.ndarray', vocab: Dict[str, int], values: Iterable[str]) -> Optional['np.ndarray']:
+        """Build a query bitmask row; returns None if a value is unknown to the index"""
+        mask = np.zeros(bits.shape[1], dtype=np.uint64)
+        for value in values:
+            bit = vocab.get(value)
+            if bit is None:
+                return None
+            word, offset = divmod(bit, 64)
+            mask[word] |= np.uint64(1 << offset)
+        return mask
+
+    def _has_all(self, bits: 'np.ndarray', vocab: Dict[str, int], values: List[str]) -> 'np.ndarray':
+        mask = self._mask_for_values(bits, vocab, values)
+        if mask is None:
+            return np.zeros(len(bits), dtype=bool)
+        return np.all((bits & mask) == mask, axis=1)
+
+    def _has_any(self, bits: 'np.ndarray', vocab: Dict[str, int], values: List[str]) -> 'np.ndarray':
+        mask = self._mask_for_values(bits, vocab, [value for value in values if value in vocab])
+        return np.any((bits & mask) != 0, axis=1)
+
+    def _term_mask(self, term: str) -> 'np.ndarray':
+        """Case-insensitive substring match against ingredient text (cached per term)"""
+        term = term.lower()
+        mask = self._term_masks.get(term)
+        if mask is None:
+            mask = np.fromiter((term in text for text in self._ingredient_text), dtype=bool,
+                               count=len(self._ingredient_text))
+            self._term_masks[term] = mask
+        return mask
+
+    # === RETRIEVAL ===
+
+    def search(self, meal_type: str, calorie_target: float, dietary_preferences: List[str] = None,
+               allergens: List[str] = None, cuisine_preference: str = None,
+               cuisine_preferences: List[str] = None, disliked_ingredients: List[str] = None,
+               calorie_tolerance: float = 0.2, limit: int = 10) -> List[tuple]:
+        """
+        Return the top ``limit`` (recipe_id, relevance_score) pairs for the query.
+
+        Filtering matches the previous ORM chain: all dietary preferences must
+        be tagged, no listed allergen may be present, cuisine must match, no
+        disliked ingredient may appear and calories must lie within
+        ``calorie_tolerance`` of the per-meal target.
+        """
+        self.refresh()
+        dietary_preferences = list(dietary_preferences or [])
+        cuisine_preferences = list(cuisine_preferences or [])
+
+        with self._lock:
+            if not self._ids:
+                return []
+
+            meal_code = self._meal_type_codes.get(meal_type)
+            if meal_code is None:
+                return []
+
+            # Cheapest, most selective filters first; the rest run on the surviving rows only
+            calories = self._macros[:, 0]
+            positions = np.flatnonzero(
+                (self._meal_type == meal_code)
+                & (calories >= calorie_target * (1 - calorie_tolerance))
+                & (calories <= calorie_target * (1 + calorie_tolerance))
+            )
+
+            if positions.size and dietary_preferences:
+                keep = self._has_all(self._dietary_bits[positions], self._dietary_vocab, dietary_preferences)
+                positions = positions[keep]
+            if positions.size and allergens:
+                keep = ~self._has_any(self._allergen_bits[positions], self._allergen_vocab, list(allergens))
+                positions = positions[keep]
+
+            if positions.size and cuisine_preference:
+                needle = cuisine_preference.lower()
+                codes = [code for name, code in self._cuisine_codes.items() if needle in name.lower()]
+                positions = positions[np.isin(self._cuisine[positions], codes)]
+            elif positions.size and cuisine_preferences:
+                codes = [self._cuisine_codes[name] for name in cuisine_preferences if name in self._cuisine_codes]
+                positions = positions[np.isin(self._cuisine[positions], codes)]
+
+            for disliked in disliked_ingredients or []:
+                if positions.size:
+                    positions = positions[~self._term_mask(disliked)[positions]]
+
+            if positions.size == 0:
+                return []
+
+            scores = self.score(positions, calorie_target, dietary_preferences, cuisine_preferences)
+
+            # Highest score first; rating, then recency break ties
+            order = np.lexsort((-self._created_at[positions], -self._rating[positions], -scores))[:limit]
+            return [(self._ids[positions[i]], float(scores[i])) for i in order]
+
+    def score(self, positions: 'np.ndarray', calorie_target: float, dietary_preferences: List[str],
+              cuisine_preferences: List[str]) -> 'np.ndarray':
+        """Vectorized equivalent of RAGRecipeService._calculate_relevance_score"""
+        scores = np.clip(self._rating[positions], 0, 5) / 5 * 0.3
+
+        if dietary_preferences:
+            matched = np.zeros(positions.size, dtype=np.float32)
+            bits = self._dietary_bits[positions]
+            for preference in set(dietary_preferences):
+                bit = self._dietary_vocab.get(preference)
+                if bit is not None:
+                    word, offset = divmod(bit, 64)
+                    matched += (bits[:, word] >> np.uint64(offset)) & np.uint64(1)
+            scores += matched / len(set(dietary_preferences)) * 0.3
+
+        if cuisine_preferences:
+            codes = [self._cuisine_codes[name] for name in cuisine_preferences if name in self._cuisine_codes]
+            scores += np.isin(self._cuisine[positions], codes) * 0.2
+
+        if calorie_target:
+            calorie_diff = np.abs(self._macros[positions, 0] - calorie_target) / calorie_target
+            scores += np.maximum(0, 1 - calorie_diff) * 0.2
+
+        return np.minimum(1.0, scores)
+
+
+_recipe_index = None
+_recipe_index_lock = threading.Lock()
+
+
+def get_recipe_index() -> RecipeIndex:
+    """Return the shared per-process recipe index"""
+    global _recipe_index
+    if _recipe_index is None:
+        with _recipe_index_lock:
+            if _recipe_index is None:
+                _recipe_index = RecipeIndex()
+    return _recipe_index
@@ -0,0 +1,278 @@
+# meal_planning/services/recipe_vector_index.py
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence
+
+from django.conf import settings
+from django.db.models import Max
+
+from ..models import Recipe
+from .embeddings import EmbeddingBackend, get_embedding_backend
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger('nutrition.recipe_vector_index')
+
+
+class RecipeVectorIndex:
+    """
+    Process-local nearest-neighbour index over ``Recipe.embedding_vector``.
+
+    Vectors are held as one L2-normalized float32 matrix, so cosine similarity
+    is a single matrix-vector product. Below ``ivf_min_size`` rows every query
+    is scored exactly; above it an IVF index (spherical k-means centroids and
+    inverted lists) restricts scoring to the ``nprobe`` closest clusters.
+    Refreshes incrementally from ``Recipe.updated_at`` like RecipeIndex.
+
+    Only vectors whose ``Recipe.embedding_model`` matches the query backend's
+    ``identifier`` are indexed, so queries are never ranked against vectors
+    from another embedding space.
+    """
+
+    def __init__(self, refresh_interval: float = None, ivf_min_size: int = None, nprobe: int = None,
+                 backend: EmbeddingBackend = None):
+        config = getattr(settings, 'RECIPE_EMBEDDINGS', {})
+        self.refresh_interval = refresh_interval if refresh_interval is not None else config.get('refresh_interval', 60.0)
+        self.ivf_min_size = ivf_min_size if ivf_min_size is not None else config.get('ivf_min_size', 5000)
+        self.nprobe = nprobe or config.get('nprobe', 8)
+        self._backend = backend
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._ids: List = []
+        self._positions: Dict = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._dimensions = None
+
+        self._centroids = None
+        self._assignment = np.zeros(0, dtype=np.int32)
+        self._list_order = None
+        self._list_offsets = None
+
+        self._watermark = None
+        self._last_checked = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            self._backend = get_embedding_backend()
+        return self._backend
+
+    # === REFRESH ===
+
+    def refresh(self, force: bool = False):
+        """Bring the index up to date with embedded recipes (at most once per refresh_interval)"""
+        now = time.monotonic()
+        if not force and self._watermark is not None and now - self._last_checked < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and self._watermark is not None and now - self._last_checked < self.refresh_interval:
+                return
+
+            if self._watermark is None:
+                self._rebuild()
+            else:
+                embedding_model = self.backend.identifier
+                changed = [
+                    # Vectors from another backend count as cleared
+                    (recipe_id, vector if model == embedding_model else None, updated_at)
+                    for recipe_id, vector, updated_at, model in
+                    Recipe.objects.filter(updated_at__gte=self._watermark)
+                    .values_list('id', 'embedding_vector', 'updated_at', 'embedding_model')
+                ]
+                cleared = any(vector is None and recipe_id in self._positions for recipe_id, vector, _ in changed)
+                if changed and not cleared:
+                    self._upsert_rows(changed)
+                # Deleted rows and cleared vectors both show up as a count mismatch
+                if cleared or self._embedded_queryset().count() != len(self._ids):
+                    self._rebuild()
+
+            self._last_checked = time.monotonic()
+
+    def invalidate(self):
+        """Drop the index; the next refresh performs a full rebuild"""
+        with self._lock:
+            self._reset()
+
+    def _embedded_queryset(self):
+        return Recipe.objects.filter(embedding_vector__isnull=False, embedding_model=self.backend.identifier)
+
+    def _rebuild(self):
+        started = time.monotonic()
+        self._reset()
+        queryset = self._embedded_queryset()
+        mismatched = (
+            Recipe.objects.filter(embedding_vector__isnull=False)
+            .exclude(embedding_model=self.backend.identifier).count()
+        )
+        if mismatched:
+            logger.error(
+                f"{mismatched} recipe embeddings were not produced by the {self.backend.identifier} "
+                f"backend and are excluded from search; run embed_recipes to re-embed them"
+            )
+        watermark = Recipe.objects.aggregate(latest=Max('updated_at'))['latest']
+        rows = list(queryset.values_list('id', 'embedding_vector', 'updated_at').iterator(chunk_size=1000))
+        self._upsert_rows(rows)
+        self._watermark = watermark if watermark is not None else self._watermark
+        logger.info(f"Built recipe vector index with {len(self._ids)} vectors in {time.monotonic() - started:.3f}s")
+
+    def _upsert_rows(self, rows: Sequence[tuple]):
+        rows = [row for row in rows if row[1]]
+        if not rows:
+            return
+
+        if self._dimensions is None:
+            self._dimensions = len(rows[0][1])
+            self._vectors = np.zeros((0, self._dimensions), dtype=np.float32)
+
+        rows = [row for row in rows if len(row[1]) == self._dimensions]
+        new_count = sum(1 for row in rows if row[0] not in self._positions)
+        if new_count:
+            size = len(self._ids) + new_count
+            grown = np.zeros((size, self._dimensions), dtype=np.float32)
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+            assignment = np.zeros(size, dtype=np.int32)
+            assignment[:len(self._assignment)] = self._assignment
+            self._assignment = assignment
+
+        touched = []
+        for recipe_id, vector, updated_at in rows:
+            position = self._positions.get(recipe_id)
+            if position is None:
+                position = len(self._ids)
+                self._positions[recipe_id] = position
+                self._ids.append(recipe_id)
+            self._vectors[position] = vector
+            touched.append(position)
+
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        touched = np.array(touched, dtype=np.int64)
+        norms = np.linalg.norm(self._vectors[touched], axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._vectors[touched] /= norms
+
+        if self._centroids is not None:
+            # Keep the clustering, just file the changed rows under their nearest centroid
+            self._assignment[touched] = np.argmax(self._vectors[touched] @ self._centroids.T, axis=1)
+            self._list_order = None
+
+    # === IVF ===
+
+    def _ensure_ivf(self):
+        if len(self._ids) < self.ivf_min_size:
+            return False
+        if self._centroids is None:
+            self._train_ivf()
+        if self._list_order is None:
+            self._list_order = np.argsort(self._assignment[:len(self._ids)], kind='stable')
+            counts = np.bincount(self._assignment[:len(self._ids)], minlength=len(self._centroids))
+            self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        return True
+
+    def _train_ivf(self, iterations: int = 10, seed: int = 0):
+        """Spherical k-means with sqrt(n) clusters, trained on a sample of the vectors"""
+        started = time.monotonic()
+        count = len(self._ids)
+        vectors = self._vectors[:count]
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+
+        sample = vectors[rng.choice(count, size=min(count, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 8192):
+            assignment[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+
+        self._centroids = centroids
+        self._assignment[:count] = assignment
+        self._list_order = None
+        logger.info(f"Trained IVF index ({nlist} lists) over {count} vectors in {time.monotonic() - started:.3f}s")
+
+    def _ivf_candidates(self, query: 'np.ndarray', nprobe: int) -> 'np.ndarray':
+        closest = np.argsort(-(self._centroids @ query))[:nprobe]
+        return np.concatenate([
+            self._list_order[self._list_offsets[cluster]:self._list_offsets[cluster + 1]] for cluster in closest
+        ])
+
+    # === SEARCH ===
+
+    def search(self, query_vector: Iterable[float], limit: int = 10, candidate_ids: Iterable = None,
+               exact: bool = None, nprobe: int = None) -> List[tuple]:
+        """
+        Return the ``limit`` nearest (recipe_id, cosine_similarity) pairs.
+
+        ``candidate_ids`` restricts the search to those recipes (always exact).
+        ``exact`` forces brute-force scoring even when the IVF index is built.
+        """
+        self.refresh()
+        with self._lock:
+            if not self._ids:
+                return []
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            if query.shape != (self._dimensions,):
+                logger.warning(f"Query vector has {query.size} dimensions, index has {self._dimensions}")
+                return []
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            query = query / norm
+
+            if candidate_ids is not None:
+                positions = np.fromiter((self._positions[recipe_id] for recipe_id in candidate_ids
+                                         if recipe_id in self._positions), dtype=np.int64)
+            elif not exact and self._ensure_ivf():
+                positions = self._ivf_candidates(query, nprobe or self.nprobe)
+            else:
+                positions = None
+
+            vectors = self._vectors[:len(self._ids)] if positions is None else self._vectors[positions]
+            if len(vectors) == 0:
+                return []
+            scores = vectors @ query
+
+            top = min(limit, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            if positions is not None:
+                return [(self._ids[positions[i]], float(scores[i])) for i in best]
+            return [(self._ids[i], float(scores[i])) for i in best]
+
+    def search_text(self, query: str, limit: int = 10, candidate_ids: Iterable = None,
+                    exact: bool = None) -> List[tuple]:
+        """Embed ``query`` with the configured backend and search for similar recipes"""
+        if not query:
+            return []
+        return self.search(self.backend.embed_one(query), limit=limit, candidate_ids=candidate_ids, exact=exact)
+
+
+_recipe_vector_index = None
+_recipe_vector_index_lock = threading.Lock()
+
+
+def get_recipe_vector_index() -> RecipeVectorIndex:
+    """Return the shared per-process recipe vector index"""
+    global _recipe_vector_index
+    if _recipe_vector_index is None:
+        with _recipe_vector_index_lock:
+            if _recipe_vector_index is None:
+                _recipe_vector_index = RecipeVectorIndex()
+    return _recipe_vector_index
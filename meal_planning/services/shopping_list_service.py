@@ -3,7 +3,8 @@ from decimal import Decimal
 import logging
 import re
 from typing import Dict, List, Any, Tuple
-from ..models import Recipe, MealPlan, Ingredient
+from ..models import Recipe, MealPlan
+from .ingredient_resolver import get_ingredient_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -411,18 +412,7 @@ class ShoppingListService:
     def _find_ingredient_by_name(self, ingredient_name: str):
         """Find ingredient in database by name (fuzzy matching)"""
         try:
-            # Try exact match first
-            ingredient = Ingredient.objects.filter(
-                name_clean=ingredient_name.lower().replace(' ', '')
-            ).first()
-            
-            if not ingredient:
-                # Try partial match
-                ingredient = Ingredient.objects.filter(
-                    name__icontains=ingredient_name
-                ).first()
-            
-            return ingredient
+            return get_ingredient_resolver().resolve(ingredient_name)
         except Exception:
             return None
     
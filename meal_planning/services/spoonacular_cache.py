@@ -0,0 +1,196 @@
+# meal_planning/services/spoonacular_cache.py
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..models import SpoonacularCacheEntry
+
+logger = logging.getLogger('nutrition.spoonacular_cache')
+
+
+class SpoonacularResponseCache:
+    """
+    Content-addressed cache for Spoonacular GET responses.
+
+    Keys are SHA-256 digests of the endpoint and its normalized parameters
+    (credentials excluded), so every gunicorn/Celery process computes the same
+    key. Entries live in the Django cache and, when ``durable`` is on, in the
+    spoonacular_cache_entries table, which refills the Django cache after a
+    flush. Entries are fresh for the endpoint's CACHE_TIMEOUTS lifetime; for
+    ``stale_ttl`` seconds after that they are still served while a background
+    thread refetches them, and past that they are only used if the refetch
+    fails.
+    """
+
+    KEY_PREFIX = 'spoonacular_response:'
+    EXCLUDED_PARAMS = frozenset({'apiKey', 'api_key'})
+
+    def __init__(self, stale_ttl: int = None, durable: bool = None):
+        config = getattr(settings, 'SPOONACULAR_CACHE', {})
+        self.stale_ttl = stale_ttl if stale_ttl is not None else config.get('stale_ttl', 604800)
+        self.durable = durable if durable is not None else config.get('durable', True)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    # === KEYS AND LIFETIMES ===
+
+    @classmethod
+    def normalize_params(cls, params: Optional[Dict]) -> Dict[str, str]:
+        """Drop credentials and empty values; render values the way they go on the wire"""
+        normalized = {}
+        for name, value in (params or {}).items():
+            if name in cls.EXCLUDED_PARAMS or value is None:
+                continue
+            if isinstance(value, bool):
+                value = 'true' if value else 'false'
+            elif isinstance(value, (list, tuple)):
+                value = ','.join(str(item) for item in value)
+            normalized[str(name)] = str(value)
+        return dict(sorted(normalized.items()))
+
+    @classmethod
+    def make_key(cls, endpoint: str, params: Optional[Dict] = None) -> str:
+        payload = json.dumps([endpoint.strip('/'), cls.normalize_params(params)], separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def ttl_for(endpoint: str) -> int:
+        """Fresh lifetime in seconds for responses from ``endpoint``"""
+        timeouts = getattr(settings, 'CACHE_TIMEOUTS', {})
+        default = getattr(settings, 'SPOONACULAR_RATE_LIMIT', {}).get('cache_duration', 3600)
+        path = endpoint.strip('/')
+        if path.startswith('food/ingredients'):
+            return timeouts.get('spoonacular_ingredient', default)
+        if path.startswith('recipes'):
+            return timeouts.get('spoonacular_recipe', default)
+        return default
+
+    # === PUBLIC API ===
+
+    def get_or_fetch(self, endpoint: str, params: Optional[Dict], fetch: Callable[[], Any]) -> Any:
+        """Return the cached response for (endpoint, params), calling ``fetch`` on a miss"""
+        key = self.make_key(endpoint, params)
+        ttl = self.ttl_for(endpoint)
+        entry = self._read(key, ttl)
+
+        if entry is not None:
+            age = (timezone.now() - entry['fetched_at']).total_seconds()
+            if age < ttl:
+                logger.debug(f"Cache hit for endpoint: {endpoint}")
+                return entry['data']
+            if age < ttl + self.stale_ttl:
+                logger.debug(f"Serving stale response for {endpoint} while refreshing")
+                self._schedule_refresh(key, endpoint, params, fetch)
+                return entry['data']
+
+        try:
+            data = fetch()
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f"Refetch of {endpoint} failed ({e}), serving expired cached response")
+            return entry['data']
+
+        self.store(key, endpoint, params, data, ttl)
+        return data
+
+    def store(self, key: str, endpoint: str, params: Optional[Dict], data: Any, ttl: int = None):
+        fetched_at = timezone.now()
+        ttl = ttl if ttl is not None else self.ttl_for(endpoint)
+        try:
+            cache.set(self.KEY_PREFIX + key, {'data': data, 'fetched_at': fetched_at}, ttl + self.stale_ttl)
+        except Exception as e:
+            logger.warning(f"Cache unavailable for writing, continuing without caching: {e}")
+
+        if self.durable:
+            try:
+                SpoonacularCacheEntry.objects.update_or_create(key=key, defaults={
+                    'endpoint': endpoint,
+                    'params': self.normalize_params(params),
+                    'response': data,
+                    'fetched_at': fetched_at,
+                })
+            except Exception as e:
+                logger.warning(f"Could not persist Spoonacular response for {endpoint}: {e}")
+
+    def purge_expired(self) -> int:
+        """Delete durable entries too old to be served even as stale"""
+        longest = max(self.ttl_for('recipes'), self.ttl_for('food/ingredients'), self.ttl_for(''))
+        cutoff = timezone.now() - timedelta(seconds=longest + self.stale_ttl)
+        deleted, _ = SpoonacularCacheEntry.objects.filter(fetched_at__lt=cutoff).delete()
+        return deleted
+
+    # === TIERS ===
+
+    def _read(self, key: str, ttl: int) -> Optional[Dict]:
+        try:
+            entry = cache.get(self.KEY_PREFIX + key)
+            if entry is not None:
+                return entry
+        except Exception as e:
+            logger.warning(f"Cache unavailable for reading, proceeding without cache: {e}")
+
+        if not self.durable:
+            return None
+        try:
+            row = SpoonacularCacheEntry.objects.filter(key=key).values('response', 'fetched_at').first()
+        except Exception as e:
+            logger.warning(f"Could not read persisted Spoonacular response: {e}")
+            return None
+        if row is None:
+            return None
+
+        entry = {'data': row['response'], 'fetched_at': row['fetched_at']}
+        remaining = ttl + self.stale_ttl - (timezone.now() - row['fetched_at']).total_seconds()
+        if remaining > 0:
+            try:
+                cache.set(self.KEY_PREFIX + key, entry, int(remaining))
+            except Exception:
+                pass
+        return entry
+
+    # === BACKGROUND REFRESH ===
+
+    def _schedule_refresh(self, key: str, endpoint: str, params: Optional[Dict], fetch: Callable[[], Any]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='spoonacular-refresh')
+        self._executor.submit(self._refresh, key, endpoint, params, fetch)
+
+    def _refresh(self, key: str, endpoint: str, params: Optional[Dict], fetch: Callable[[], Any]):
+        try:
+            self.store(key, endpoint, params, fetch())
+            logger.info(f"Refreshed cached Spoonacular response for {endpoint}")
+        except Exception as e:
+            logger.warning(f"Background refresh of {endpoint} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+            close_old_connections()
+
+
+_spoonacular_cache = None
+_spoonacular_cache_lock = threading.Lock()
+
+
+def get_spoonacular_cache() -> SpoonacularResponseCache:
+    """Return the shared per-process Spoonacular response cache"""
+    global _spoonacular_cache
+    if _spoonacular_cache is None:
+        with _spoonacular_cache_lock:
+            if _spoonacular_cache is None:
+                _spoonacular_cache = SpoonacularResponseCache()
+    return _spoonacular_cache
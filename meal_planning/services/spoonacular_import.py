@@ -0,0 +1,296 @@
+# meal_planning/services/spoonacular_import.py
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, close_old_connections, transaction
+
+from ..models import Ingredient, Recipe
+from .ingredient_resolver import get_ingredient_resolver
+from .spoonacular_service import RateLimitExceeded
+
+logger = logging.getLogger('nutrition.spoonacular_import')
+
+# Longest limiter wait an import sleeps through; anything longer (i.e. the
+# background share of the daily quota is spent) stops the run
+MAX_RATE_LIMIT_WAIT = 60
+
+
+def call_with_rate_limit(func, *args, **kwargs):
+    """Call a Spoonacular service method, waiting out short rate-limit pauses"""
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except RateLimitExceeded as e:
+            if e.retry_after is None or e.retry_after > MAX_RATE_LIMIT_WAIT:
+                raise
+            time.sleep(e.retry_after)
+
+
+class ImportCheckpoint:
+    """
+    Progress of an import, persisted as JSON after every search and write batch.
+
+    Per kind ('recipes' / 'ingredients') it records the searches already run,
+    the candidate Spoonacular ids they produced (in discovery order) and the
+    ids already written, so a rerun skips straight to the unwritten ones.
+    Without a path the checkpoint lives in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None, restart: bool = False):
+        self.path = path
+        self.sections = {}
+        if path and os.path.exists(path) and not restart:
+            with open(path) as f:
+                for kind, section in json.load(f).items():
+                    self.sections[kind] = {
+                        'searched': set(section.get('searched', [])),
+                        'candidates': list(section.get('candidates', [])),
+                        'written': set(section.get('written', [])),
+                    }
+
+    def section(self, kind: str) -> Dict:
+        return self.sections.setdefault(kind, {'searched': set(), 'candidates': [], 'written': set()})
+
+    def pending(self, kind: str) -> List[int]:
+        section = self.section(kind)
+        return [spoonacular_id for spoonacular_id in section['candidates'] if spoonacular_id not in section['written']]
+
+    def save(self):
+        if not self.path:
+            return
+        data = {
+            kind: {
+                'searched': sorted(section['searched']),
+                'candidates': section['candidates'],
+                'written': sorted(section['written']),
+            }
+            for kind, section in self.sections.items()
+        }
+        # Write-then-rename so an interrupted save never leaves a truncated file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.sections = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SpoonacularImportPipeline:
+    """
+    Three-stage bulk importer for Spoonacular recipes and ingredients.
+
+    1. Fetch: a bounded pool of ``workers`` threads requests item details
+       through the service (cache, transport and rate limiter included),
+       keeping at most ``2 * workers`` requests in flight.
+    2. Normalize: completed responses go through the service's
+       ``normalize_recipe_data`` / ``normalize_ingredient_data``; rows missing
+       fields the model requires are counted as failures.
+    3. Write: every ``batch_size`` rows are upserted with one
+       ``bulk_create(update_conflicts=True)`` keyed on ``spoonacular_id``,
+       then recorded in the checkpoint.
+
+    A RateLimitExceeded the fetchers can't wait out stops the run after
+    flushing what was fetched; rerunning with the same checkpoint resumes.
+    """
+
+    KINDS = {
+        'recipes': (Recipe, 'get_recipe_information', 'normalize_recipe_data'),
+        'ingredients': (Ingredient, 'get_ingredient_information', 'normalize_ingredient_data'),
+    }
+    REQUIRED_FIELDS = {
+        'recipes': ('spoonacular_id', 'title', 'calories_per_serving', 'protein_per_serving',
+                    'carbs_per_serving', 'fat_per_serving'),
+        'ingredients': ('spoonacular_id', 'name'),
+    }
+
+    def __init__(self, service, workers: int = 4, batch_size: int = 50, checkpoint: ImportCheckpoint = None,
+                 report: Callable[[str], None] = None, report_interval: float = 10.0):
+        self.service = service
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint = checkpoint or ImportCheckpoint()
+        self.report = report or logger.info
+        self.report_interval = report_interval
+        self.stopped_by = None
+
+    # === DISCOVERY ===
+
+    def discover(self, kind: str, searches: Iterable[Tuple[str, Callable[[], Dict]]], target: int,
+                 skip_existing: bool = False) -> List[int]:
+        """
+        Run ``(key, search)`` pairs in order until ``target`` unwritten ids are known.
+
+        Searches already recorded in the checkpoint are skipped. With
+        ``skip_existing`` ids that already have a row are not queued.
+        """
+        model = self.KINDS[kind][0]
+        section = self.checkpoint.section(kind)
+
+        for key, search in searches:
+            if len(self.checkpoint.pending(kind)) >= target:
+                break
+            if key in section['searched']:
+                continue
+            try:
+                results = call_with_rate_limit(search).get('results', [])
+            except RateLimitExceeded as e:
+                self.stopped_by = e
+                break
+            except Exception as e:
+                logger.error(f'Spoonacular {kind} search "{key}" failed: {e}')
+                continue
+
+            known = set(section['candidates'])
+            found = [item.get('id') for item in results if item.get('id') and item.get('id') not in known]
+            if skip_existing and found:
+                existing = set(model.objects.filter(spoonacular_id__in=found).values_list('spoonacular_id', flat=True))
+                found = [spoonacular_id for spoonacular_id in found if spoonacular_id not in existing]
+            section['candidates'].extend(dict.fromkeys(found))
+            section['searched'].add(key)
+            self.checkpoint.save()
+
+        return self.checkpoint.pending(kind)[:target]
+
+    # === PIPELINE ===
+
+    def run(self, kind: str, spoonacular_ids: List[int]) -> Dict:
+        """Fetch, normalize and upsert ``spoonacular_ids``; returns the run's counters"""
+        model, fetch_name, normalize_name = self.KINDS[kind]
+        fetch = getattr(self.service, fetch_name)
+        normalize = getattr(self.service, normalize_name)
+
+        stats = {'fetched': 0, 'created': 0, 'updated': 0, 'failed': 0, 'started': time.monotonic()}
+        self._last_report = stats['started']
+        pending = iter(spoonacular_ids)
+        buffer = []
+
+        def handle(spoonacular_id, fetch_call):
+            try:
+                raw = fetch_call()
+            except RateLimitExceeded as e:
+                self.stopped_by = e
+                return
+            except Exception as e:
+                logger.error(f'Failed to fetch {kind} {spoonacular_id}: {e}')
+                stats['failed'] += 1
+                return
+            stats['fetched'] += 1
+            row = self._normalize(kind, normalize, raw)
+            if row is None:
+                stats['failed'] += 1
+            else:
+                buffer.append(row)
+            if len(buffer) >= self.batch_size:
+                self._write(kind, model, buffer, stats)
+                buffer.clear()
+            self._maybe_report(kind, stats)
+
+        if self.workers == 1:
+            for spoonacular_id in pending:
+                if self.stopped_by:
+                    break
+                handle(spoonacular_id, lambda: call_with_rate_limit(fetch, spoonacular_id))
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='spoonacular-import') as executor:
+                in_flight = {}
+
+                def submit_next():
+                    for spoonacular_id in pending:
+                        in_flight[executor.submit(self._fetch, fetch, spoonacular_id)] = spoonacular_id
+                        return
+
+                for _ in range(2 * self.workers):
+                    submit_next()
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        handle(in_flight.pop(future), future.result)
+                        if not self.stopped_by:
+                            submit_next()
+
+        if buffer:
+            self._write(kind, model, buffer, stats)
+        self._maybe_report(kind, stats, force=True)
+        stats['elapsed'] = time.monotonic() - stats.pop('started')
+        return stats
+
+    def _fetch(self, fetch: Callable, spoonacular_id: int) -> Dict:
+        try:
+            return call_with_rate_limit(fetch, spoonacular_id)
+        finally:
+            close_old_connections()
+
+    def _normalize(self, kind: str, normalize: Callable, raw: Dict) -> Optional[Dict]:
+        try:
+            row = normalize(raw)
+        except Exception as e:
+            logger.error(f'Failed to normalize {kind} {raw.get("id")}: {e}')
+            return None
+        missing = [field for field in self.REQUIRED_FIELDS[kind] if row.get(field) in (None, '')]
+        if missing:
+            logger.warning(f'Skipping {kind} {row.get("spoonacular_id")}: missing {", ".join(missing)}')
+            return None
+        return row
+
+    def _write(self, kind: str, model, rows: List[Dict], stats: Dict):
+        """Upsert one batch keyed on spoonacular_id and checkpoint it"""
+        rows = list({row['spoonacular_id']: row for row in rows}.values())
+        ids = [row['spoonacular_id'] for row in rows]
+        existing = set(model.objects.filter(spoonacular_id__in=ids).values_list('spoonacular_id', flat=True))
+        # Only overwrite the fields Spoonacular provides; ratings, embeddings etc. are kept
+        update_fields = sorted(set().union(*rows) - {'spoonacular_id'}) + ['updated_at']
+
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    [model(**row) for row in rows],
+                    update_conflicts=True, unique_fields=['spoonacular_id'], update_fields=update_fields,
+                )
+            written = ids
+        except IntegrityError as e:
+            # Another unique constraint (e.g. Ingredient.name) rejected the batch; retry row by row
+            logger.warning(f'Batch upsert of {len(rows)} {kind} failed ({e}), writing rows individually')
+            written = self._write_rows(kind, model, rows)
+            stats['failed'] += len(rows) - len(written)
+
+        created = len(set(written) - existing)
+        stats['created'] += created
+        stats['updated'] += len(written) - created
+
+        self.checkpoint.section(kind)['written'].update(written)
+        self.checkpoint.save()
+        if model is Ingredient:
+            # bulk_create sends no post_save signals
+            get_ingredient_resolver().invalidate()
+
+    def _write_rows(self, kind: str, model, rows: List[Dict]) -> List[int]:
+        written = []
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    model.objects.update_or_create(spoonacular_id=row['spoonacular_id'], defaults=row)
+                written.append(row['spoonacular_id'])
+            except IntegrityError as e:
+                logger.error(f'Failed to save {kind} {row["spoonacular_id"]}: {e}')
+        return written
+
+    def _maybe_report(self, kind: str, stats: Dict, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        elapsed = max(now - stats['started'], 1e-6)
+        written = stats['created'] + stats['updated']
+        self.report(
+            f"{kind}: {written} written ({stats['created']} new, {stats['updated']} updated), "
+            f"{stats['failed']} failed, {stats['fetched'] / elapsed:.1f} fetched/s, {written / elapsed:.1f} written/s"
+        )
@@ -0,0 +1,193 @@
+# meal_planning/services/spoonacular_rate_limiter.py
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('nutrition.spoonacular_rate_limiter')
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    retry_after: float  # Seconds until a request in this lane could be allowed (0 when allowed)
+    used_today: int
+    lane: str
+
+
+# GCRA for request spacing plus a per-day quota counter, evaluated atomically.
+# KEYS: [tat_key, day_key]; ARGV: [now, interval, tolerance, daily_cap, day_ttl]
+# Returns {allowed, retry_after (string, -1 = daily cap reached), used_today}
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local daily_cap = tonumber(ARGV[4])
+
+local used = tonumber(redis.call('GET', KEYS[2]) or '0')
+if used >= daily_cap then
+    return {0, '-1', used}
+end
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then
+    tat = now
+end
+if now < tat - tolerance then
+    return {0, tostring(tat - tolerance - now), used}
+end
+
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+used = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[5]))
+return {1, '0', used}
+"""
+
+
+class SpoonacularRateLimiter:
+    """
+    Non-blocking limiter shared by every process calling Spoonacular.
+
+    Requests are spaced with GCRA (one request per ``60 / requests_per_minute``
+    seconds on average, with a per-lane burst allowance) and counted against
+    the daily quota. Each lane may only use its share of the daily quota, so
+    background jobs (``lane='background'``) can never exhaust the requests
+    left for interactive users, and get no burst allowance. ``acquire()``
+    returns a decision immediately instead of sleeping.
+
+    With a Redis cache the check-and-update runs as one Lua script; otherwise
+    an in-process limiter with the same rules is used. If Redis errors, the
+    in-process limiter takes over until Redis is retried
+    ``redis_retry_seconds`` later.
+    """
+
+    DEFAULT_LANES = {
+        'interactive': {'daily_share': 1.0, 'burst': 3},
+        'background': {'daily_share': 0.7, 'burst': 1},
+    }
+
+    def __init__(self, requests_per_day: int = None, requests_per_minute: int = None, lanes: Dict = None,
+                 redis_retry_seconds: float = None):
+        rate_limit = getattr(settings, 'SPOONACULAR_RATE_LIMIT', {})
+        self.requests_per_day = requests_per_day or rate_limit.get('requests_per_day', 150)
+        self.requests_per_minute = requests_per_minute or rate_limit.get('requests_per_minute', 10)
+        self.lanes = lanes or rate_limit.get('lanes', self.DEFAULT_LANES)
+        self.interval = 60.0 / self.requests_per_minute
+        self.redis_retry_seconds = (
+            redis_retry_seconds if redis_retry_seconds is not None else rate_limit.get('redis_retry_seconds', 30)
+        )
+
+        self._script = None
+        self._redis_retry_at = None  # Set while Redis is considered down: time of the next retry
+        self._local_lock = threading.Lock()
+        self._local_tat = 0.0
+        self._local_day = None
+        self._local_used = 0
+
+    # === PUBLIC API ===
+
+    def acquire(self, lane: str = 'interactive') -> RateLimitDecision:
+        """Take one request slot in ``lane`` if available"""
+        lane_config = self.lanes.get(lane, self.lanes['interactive'])
+        tolerance = self.interval * max(lane_config.get('burst', 1) - 1, 0)
+        daily_cap = int(self.requests_per_day * lane_config.get('daily_share', 1.0))
+        now = time.time()
+
+        result = self._acquire_redis(now, tolerance, daily_cap)
+        if result is None:
+            result = self._acquire_local(now, tolerance, daily_cap)
+        allowed, retry_after, used = result
+
+        if retry_after < 0:
+            retry_after = self.seconds_until_reset(now)
+            logger.warning(f"Spoonacular daily quota for {lane} lane reached ({used}/{daily_cap})")
+        return RateLimitDecision(bool(allowed), round(retry_after, 3), int(used), lane)
+
+    def used_today(self) -> int:
+        day_key = self._day_key(time.time())
+        try:
+            return int(cache.get(day_key, 0))
+        except Exception:
+            return self._local_used
+
+    @staticmethod
+    def seconds_until_reset(now: float) -> float:
+        """Seconds until the daily quota resets (midnight UTC)"""
+        current = datetime.fromtimestamp(now, dt_timezone.utc)
+        midnight = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (midnight - current).total_seconds()
+
+    # === BACKENDS ===
+
+    @staticmethod
+    def _day_key(now: float) -> str:
+        return f"spoonacular_quota_{datetime.fromtimestamp(now, dt_timezone.utc):%Y%m%d}"
+
+    def _redis_client(self):
+        """Raw redis-py client behind Django's RedisCache, or None for other backends"""
+        if not hasattr(cache, '_cache') or not hasattr(cache._cache, 'get_client'):
+            return None
+        return cache._cache.get_client(write=True)
+
+    def _acquire_redis(self, now: float, tolerance: float, daily_cap: int):
+        if self._redis_retry_at is not None and now < self._redis_retry_at:
+            return None
+        try:
+            client = self._redis_client()
+            if client is None:
+                return None
+            if self._script is None:
+                self._script = client.register_script(GCRA_SCRIPT)
+            allowed, retry_after, used = self._script(
+                keys=[cache.make_key('spoonacular_gcra_tat'), cache.make_key(self._day_key(now))],
+                args=[now, self.interval, tolerance, daily_cap, 2 * 86400],
+                client=client,
+            )
+        except Exception as e:
+            if self._redis_retry_at is None:
+                logger.warning(
+                    f"Redis rate limiter unavailable, using in-process limiter "
+                    f"(retrying every {self.redis_retry_seconds}s): {e}"
+                )
+            self._script = None
+            self._redis_retry_at = now + self.redis_retry_seconds
+            return None
+
+        if self._redis_retry_at is not None:
+            logger.info("Redis rate limiter available again, leaving in-process limiter")
+            self._redis_retry_at = None
+        return int(allowed), float(retry_after), int(used)
+
+    def _acquire_local(self, now: float, tolerance: float, daily_cap: int):
+        day = self._day_key(now)
+        with self._local_lock:
+            if day != self._local_day:
+                self._local_day, self._local_used = day, 0
+            if self._local_used >= daily_cap:
+                return 0, -1.0, self._local_used
+
+            tat = max(self._local_tat, now)
+            if now < tat - tolerance:
+                return 0, tat - tolerance - now, self._local_used
+
+            self._local_tat = tat + self.interval
+            self._local_used += 1
+            return 1, 0.0, self._local_used
+
+
+_spoonacular_rate_limiter = None
+_spoonacular_rate_limiter_lock = threading.Lock()
+
+
+def get_spoonacular_rate_limiter() -> SpoonacularRateLimiter:
+    """Return the shared per-process Spoonacular rate limiter"""
+    global _spoonacular_rate_limiter
+    if _spoonacular_rate_limiter is None:
+        with _spoonacular_rate_limiter_lock:
+            if _spoonacular_rate_limiter is None:
+                _spoonacular_rate_limiter = SpoonacularRateLimiter()
+    return _spoonacular_rate_limiter
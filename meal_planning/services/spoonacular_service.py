@@ -1,14 +1,18 @@
 # nutrition/services/spoonacular_service.py
 import requests
 import logging
-import time
 from typing import Dict, List, Optional, Any
 from django.conf import settings
-from django.core.cache import cache
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 
+from utils.single_flight import get_single_flight
+
+from .spoonacular_cache import SpoonacularResponseCache, get_spoonacular_cache
+from .spoonacular_rate_limiter import get_spoonacular_rate_limiter
+from .spoonacular_transport import get_spoonacular_transport
+
 logger = logging.getLogger('nutrition.spoonacular')
 
 
@@ -18,8 +22,11 @@ class SpoonacularAPIError(Exception):
 
 
 class RateLimitExceeded(SpoonacularAPIError):
-    """Raised when API rate limit is exceeded"""
-    pass
+    """Raised when API rate limit is exceeded; ``retry_after`` is the suggested wait in seconds"""
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class SpoonacularService:
@@ -28,53 +35,30 @@ class SpoonacularService:
     Handles rate limiting, caching, and data normalization
     """
 
-    def __init__(self):
+    def __init__(self, lane: str = 'interactive'):
         self.api_key = settings.SPOONACULAR_API_KEY
         self.base_url = settings.SPOONACULAR_BASE_URL
         self.endpoints = settings.SPOONACULAR_ENDPOINTS
         self.rate_limit = settings.SPOONACULAR_RATE_LIMIT
 
-        # Rate limiting tracking
-        self.requests_today_key = 'spoonacular_requests_today'
-        self.last_request_key = 'spoonacular_last_request'
+        # Rate limiter lane: 'interactive' for user requests, 'background' for batch jobs
+        self.lane = lane
 
     def _check_rate_limit(self) -> bool:
-        """Check if we're within rate limits"""
-        try:
-            # Check daily limit
-            requests_today = cache.get(self.requests_today_key, 0)
-            if requests_today >= self.rate_limit['requests_per_day']:
-                logger.warning(f"Daily rate limit exceeded: {requests_today}/{self.rate_limit['requests_per_day']}")
-                raise RateLimitExceeded("Daily API rate limit exceeded")
-
-            # Check per-minute limit
-            last_request = cache.get(self.last_request_key)
-            if last_request:
-                time_since_last = time.time() - last_request
-                min_interval = 60 / self.rate_limit['requests_per_minute']
-                if time_since_last < min_interval:
-                    sleep_time = min_interval - time_since_last
-                    logger.info(f"Rate limiting: sleeping for {sleep_time:.2f} seconds")
-                    time.sleep(sleep_time)
-        except Exception as e:
-            logger.warning(f"Cache unavailable for rate limiting, proceeding without cache: {e}")
-            # Continue without rate limiting if cache is unavailable
+        """
+        Take a request slot from the shared limiter for this service's lane.
 
+        Never sleeps: raises RateLimitExceeded carrying ``retry_after`` (seconds)
+        when the lane is out of budget, so callers decide whether to wait.
+        """
+        decision = get_spoonacular_rate_limiter().acquire(self.lane)
+        if not decision.allowed:
+            logger.info(f"Spoonacular {self.lane} lane throttled, retry after {decision.retry_after:.2f}s")
+            raise RateLimitExceeded(
+                f"Spoonacular rate limit reached for {self.lane} requests", retry_after=decision.retry_after
+            )
         return True
 
-    def _update_rate_limit_counters(self):
-        """Update rate limiting counters after successful request"""
-        try:
-            # Update daily counter
-            requests_today = cache.get(self.requests_today_key, 0)
-            cache.set(self.requests_today_key, requests_today + 1, 86400)  # 24 hours
-
-            # Update last request timestamp
-            cache.set(self.last_request_key, time.time(), 3600)  # 1 hour
-        except Exception as e:
-            logger.warning(f"Cache unavailable for updating rate limit counters: {e}")
-            # Continue without updating counters if cache is unavailable
-
     def _make_request(self, endpoint: str, params: Dict = None, use_cache: bool = True) -> Dict:
         """
         Make HTTP request to Spoonacular API with rate limiting and caching
@@ -82,23 +66,30 @@ class SpoonacularService:
         if params is None:
             params = {}
 
-        # Add API key to params
+        # Add API key to params (excluded from cache keys)
         params['apiKey'] = self.api_key
 
-        # Create cache key
-        cache_key = f"spoonacular_{endpoint}_{hash(str(sorted(params.items())))}"
+        if not use_cache:
+            return self._fetch(endpoint, params)
 
-        # Try to get from cache first
-        if use_cache:
-            try:
-                cached_result = cache.get(cache_key)
-                if cached_result:
-                    logger.debug(f"Cache hit for endpoint: {endpoint}")
-                    return cached_result
-            except Exception as e:
-                logger.warning(f"Cache unavailable for reading, proceeding without cache: {e}")
-                use_cache = False  # Disable caching for this request
+        fetched = []
+
+        def call_api():
+            fetched.append(endpoint)
+            return self._fetch(endpoint, params)
+
+        def fetch():
+            # Identical misses in flight (in any process) share one API call
+            key = SpoonacularResponseCache.make_key(endpoint, params)
+            return get_single_flight('spoonacular').do(key, call_api)
 
+        data = get_spoonacular_cache().get_or_fetch(endpoint, params, fetch)
+        if not fetched:
+            get_spoonacular_transport().record_cache_hit(endpoint)
+        return data
+
+    def _fetch(self, endpoint: str, params: Dict) -> Dict:
+        """Perform the API call itself (rate limited, uncached)"""
         # Check rate limits
         self._check_rate_limit()
 
@@ -107,22 +98,9 @@ class SpoonacularService:
 
         try:
             logger.info(f"Making request to Spoonacular: {endpoint}")
-            response = requests.get(url, params=params, timeout=30)
+            response = get_spoonacular_transport().get(url, endpoint, params=params)
             response.raise_for_status()
-
-            # Update rate limit counters
-            self._update_rate_limit_counters()
-
-            data = response.json()
-
-            # Cache the response
-            if use_cache:
-                try:
-                    cache.set(cache_key, data, self.rate_limit['cache_duration'])
-                except Exception as e:
-                    logger.warning(f"Cache unavailable for writing, continuing without caching: {e}")
-
-            return data
+            return response.json()
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Spoonacular API request failed: {e}")
@@ -296,16 +274,15 @@ class SpoonacularService:
         }
 
         try:
+            self._check_rate_limit()
             url = f"{self.base_url}/users/connect"
             params = {'apiKey': self.api_key}
             
             logger.info(f"Connecting user to Spoonacular: {username}")
-            response = requests.post(url, json=data, params=params, timeout=30)
+            response = get_spoonacular_transport().post(
+                url, self.endpoints['connect_user'], json=data, params=params
+            )
             response.raise_for_status()
-
-            # Update rate limit counters
-            self._update_rate_limit_counters()
-
             result = response.json()
             logger.info(f"Successfully connected user {username} to Spoonacular")
             return result
@@ -363,13 +340,12 @@ class SpoonacularService:
         }
 
         try:
+            self._check_rate_limit()
             url = f"{self.base_url}{endpoint}"
-            response = requests.post(url, json=data, params=params, timeout=30)
+            response = get_spoonacular_transport().post(
+                url, self.endpoints['add_to_meal_plan'], json=data, params=params
+            )
             response.raise_for_status()
-
-            # Update rate limit counters
-            self._update_rate_limit_counters()
-
             return response.json()
 
         except requests.exceptions.RequestException as e:
@@ -423,16 +399,15 @@ class SpoonacularService:
             Dictionary with deletion result
         """
         endpoint = f"/mealplanner/{spoonacular_username}/shopping-list/items/{item_id}"
-        params = {'hash': user_hash}
+        params = {'hash': user_hash, 'apiKey': self.api_key}
 
         try:
+            self._check_rate_limit()
             url = f"{self.base_url}{endpoint}"
-            response = requests.delete(url, params=params, timeout=30)
+            response = get_spoonacular_transport().request(
+                'DELETE', url, self.endpoints['shopping_list_item'], params=params
+            )
             response.raise_for_status()
-
-            # Update rate limit counters
-            self._update_rate_limit_counters()
-
             return response.json() if response.content else {}
 
         except requests.exceptions.RequestException as e:
@@ -818,9 +793,9 @@ class SpoonacularService:
 
 
 # Utility functions for external use
-def get_spoonacular_service() -> SpoonacularService:
+def get_spoonacular_service(lane: str = 'interactive') -> SpoonacularService:
     """Get configured Spoonacular service instance"""
-    return SpoonacularService()
+    return SpoonacularService(lane=lane)
 
 
 def search_recipes_by_dietary_preferences(preferences: Dict) -> List[Dict]:
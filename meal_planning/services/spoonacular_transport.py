@@ -0,0 +1,193 @@
+# meal_planning/services/spoonacular_transport.py
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger('nutrition.spoonacular_transport')
+
+
+class SpoonacularTransport:
+    """
+    Shared HTTP layer for SpoonacularService and EnhancedSpoonacularService.
+
+    One keep-alive ``requests.Session`` per process (connection pool sized by
+    ``pool_maxsize``), bounded retries with jittered exponential backoff on
+    429/5xx and connection errors (a ``Retry-After`` header is honoured up to
+    ``backoff_max`` seconds; longer waits are returned to the caller instead of
+    slept), per-endpoint (connect, read) timeouts, and per-endpoint counters
+    for latency, bytes, retries, errors and cache hits.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+    ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+    def __init__(self, max_retries: int = None, backoff_base: float = None, backoff_max: float = None,
+                 pool_maxsize: int = None, timeouts: Dict = None):
+        config = getattr(settings, 'SPOONACULAR_TRANSPORT', {})
+        self.max_retries = max_retries if max_retries is not None else config.get('max_retries', 3)
+        self.backoff_base = backoff_base if backoff_base is not None else config.get('backoff_base', 0.5)
+        self.backoff_max = backoff_max if backoff_max is not None else config.get('backoff_max', 8.0)
+        self.timeouts = timeouts or config.get('timeouts', {})
+        self.default_timeout = tuple(self.timeouts.get('default', (3.05, 30)))
+
+        pool_maxsize = pool_maxsize or config.get('pool_maxsize', 20)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            'requests': 0, 'cache_hits': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'latency_ms': 0.0,
+        })
+
+    # === HELPERS ===
+
+    @classmethod
+    def endpoint_label(cls, endpoint: str) -> str:
+        """Endpoint path with numeric ids collapsed, e.g. 'recipes/{id}/information'"""
+        return cls.ID_SEGMENT.sub('/{id}', '/' + endpoint.strip('/')).lstrip('/')
+
+    def timeout_for(self, label: str) -> Tuple[float, float]:
+        for prefix, timeout in self.timeouts.items():
+            if prefix != 'default' and label.startswith(prefix):
+                return tuple(timeout)
+        return self.default_timeout
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry ``attempt`` (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def never_sent(error: requests.exceptions.ConnectionError) -> bool:
+        """Whether a connection error happened before any of the request reached the server"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    @staticmethod
+    def retry_after(response: requests.Response) -> Optional[float]:
+        """Seconds requested by a Retry-After header (delta-seconds or HTTP date), if any"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    # === REQUESTS ===
+
+    def request(self, method: str, url: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session, retrying transient failures.
+
+        ``endpoint`` is the API path (used for timeouts and stats). Non-idempotent
+        methods are only retried when the request never reached the server (429,
+        or a connection that could not be established); a connection dropped
+        after sending is re-raised, since the server may have applied it.
+        Raises ``requests.RequestException`` once retries are exhausted for
+        connection errors; HTTP error responses are returned for the caller to
+        interpret.
+        """
+        method = method.upper()
+        label = self.endpoint_label(endpoint)
+        kwargs.setdefault('timeout', self.timeout_for(label))
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                if attempt >= self.max_retries or not (method in self.IDEMPOTENT_METHODS or self.never_sent(e)):
+                    self._record(label, started, attempt, error=True)
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Spoonacular {label} connection failed ({e}), retrying in {delay:.2f}s")
+            except requests.exceptions.RequestException:
+                self._record(label, started, attempt, error=True)
+                raise
+            else:
+                retryable = response.status_code in self.RETRY_STATUSES and (
+                    method in self.IDEMPOTENT_METHODS or response.status_code == 429
+                )
+                if not retryable or attempt >= self.max_retries:
+                    self._record(label, started, attempt, response=response)
+                    return response
+
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                elif delay > self.backoff_max:
+                    # Don't park a worker thread for a long server-mandated wait
+                    self._record(label, started, attempt, response=response)
+                    return response
+                logger.warning(f"Spoonacular {label} returned {response.status_code}, retrying in {delay:.2f}s")
+
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url: str, endpoint: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, endpoint, **kwargs)
+
+    def post(self, url: str, endpoint: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, endpoint, **kwargs)
+
+    # === STATS ===
+
+    def _record(self, label: str, started: float, retries: int, response: requests.Response = None, error: bool = False):
+        latency_ms = (time.monotonic() - started) * 1000
+        size = len(response.content) if response is not None else 0
+        error = error or (response is not None and not response.ok)
+        with self._stats_lock:
+            stats = self._stats[label]
+            stats['requests'] += 1
+            stats['retries'] += retries
+            stats['errors'] += int(error)
+            stats['bytes'] += size
+            stats['latency_ms'] += latency_ms
+        status = response.status_code if response is not None else 'error'
+        logger.debug(f"Spoonacular {label}: status={status} latency={latency_ms:.0f}ms bytes={size} retries={retries}")
+
+    def record_cache_hit(self, endpoint: str):
+        with self._stats_lock:
+            self._stats[self.endpoint_label(endpoint)]['cache_hits'] += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-endpoint counters for this process, with average latency"""
+        with self._stats_lock:
+            snapshot = {label: dict(values) for label, values in self._stats.items()}
+        for values in snapshot.values():
+            values['avg_latency_ms'] = round(values['latency_ms'] / values['requests'], 1) if values['requests'] else 0.0
+        return snapshot
+
+
+_spoonacular_transport = None
+_spoonacular_transport_lock = threading.Lock()
+
+
+def get_spoonacular_transport() -> SpoonacularTransport:
+    """Return the shared per-process Spoonacular transport"""
+    global _spoonacular_transport
+    if _spoonacular_transport is None:
+        with _spoonacular_transport_lock:
+            if _spoonacular_transport is None:
+                _spoonacular_transport = SpoonacularTransport()
+    return _spoonacular_transport
@@ -0,0 +1,49 @@
+# meal_planning/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Ingredient, NutritionLog, NutritionProfile
+from .services.ingredient_resolver import get_ingredient_resolver
+from .services.nutrition_rollups import NutritionRollupService
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_resolver(sender, **kwargs):
+    """Resolved names may point at stale or deleted rows once an ingredient changes"""
+    get_ingredient_resolver().invalidate()
+
+
+@receiver(pre_save, sender=NutritionLog)
+def remember_nutrition_log_date(sender, instance, **kwargs):
+    """Note the stored date, so a log moved to another day also leaves its old periods"""
+    instance._previous_date = None
+    if instance.pk is not None:
+        instance._previous_date = sender.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+
+
+@receiver(post_save, sender=NutritionLog)
+@receiver(post_delete, sender=NutritionLog)
+def refresh_nutrition_rollups(sender, instance, **kwargs):
+    """Keep the week/month rollups containing this log's date (and any previous date) in step with it"""
+    dates = {instance.date}
+    previous_date = getattr(instance, '_previous_date', None)
+    if previous_date is not None:
+        dates.add(previous_date)
+    NutritionRollupService.refresh_for_dates(instance.user_id, dates)
+
+
+@receiver(pre_save, sender=NutritionProfile)
+def remember_calorie_target(sender, instance, **kwargs):
+    instance._previous_calorie_target = None
+    if instance.pk is not None:
+        instance._previous_calorie_target = (
+            sender.objects.filter(pk=instance.pk).values_list('calorie_target', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=NutritionProfile)
+def rebuild_rollups_for_calorie_target(sender, instance, created, **kwargs):
+    """Rollups count days_on_target against the calorie target, so a new target rebuilds them"""
+    if created or getattr(instance, '_previous_calorie_target', None) != instance.calorie_target:
+        NutritionRollupService.backfill(user_ids=[instance.user_id])
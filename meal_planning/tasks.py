@@ -0,0 +1,21 @@
+from celery import shared_task
+import logging
+
+from .services.spoonacular_cache import get_spoonacular_cache
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def purge_spoonacular_cache():
+    """
+    Trim durable Spoonacular cache entries too old to be served even as stale
+    """
+    try:
+        deleted = get_spoonacular_cache().purge_expired()
+        logger.info(f"Purged {deleted} expired Spoonacular cache entries")
+        return {'success': True, 'deleted': deleted}
+
+    except Exception as e:
+        logger.error(f"Error purging Spoonacular cache entries: {str(e)}")
+        return {'success': False, 'error': str(e)}
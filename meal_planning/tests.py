@@ -1,3 +1,882 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import json
+import os
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+import numpy as np
+
+from utils.downsampling import lttb_indices
+from utils.llm_gateway import FakeLLMBackend, LLMGateway
+from utils.single_flight import SingleFlight, get_single_flight
+
+from .models import (
+    Ingredient, MealPlan, NutritionLog, NutritionLogRollup, NutritionProfile, Recipe, SpoonacularCacheEntry,
+)
+from .services.dynamic_meal_planning_service import DynamicMealPlanningService
+from .services.embeddings import HashingEmbeddingBackend
+from .services.enhanced_spoonacular_service import EnhancedSpoonacularService
+from .services.ingredient_resolver import get_ingredient_resolver
+from .services.nutrition_calculation_service import NutritionCalculationService
+from .services.nutrition_log_analytics import NutritionLogAnalytics
+from .services.nutrition_rollups import NutritionRollupService
+from .services.recipe_index import RecipeIndex
+from .services.recipe_vector_index import RecipeVectorIndex
+from .services.spoonacular_cache import SpoonacularResponseCache, get_spoonacular_cache
+from .services.spoonacular_import import ImportCheckpoint, SpoonacularImportPipeline
+from .services.spoonacular_rate_limiter import SpoonacularRateLimiter
+from .services.spoonacular_service import get_spoonacular_service
+from .services.spoonacular_transport import SpoonacularTransport
+from .tasks import purge_spoonacular_cache
+
+
+def make_nutrition_profile(**overrides):
+    """Lightweight stand-in for NutritionProfile (no database access needed)"""
+    profile = dict(
+        calorie_target=2000,
+        protein_target=100.0,
+        carb_target=250.0,
+        fat_target=67.0,
+        dietary_preferences=[],
+        allergies_intolerances=[],
+        cuisine_preferences=[],
+        disliked_ingredients=[],
+        meals_per_day=3,
+        snacks_per_day=1,
+        breakfast_time=None,
+        lunch_time=None,
+        dinner_time=None,
+    )
+    profile.update(overrides)
+    return SimpleNamespace(**profile)
+
+
+def create_recipe(title, **overrides):
+    """Create a dinner recipe with sensible defaults for index tests"""
+    fields = dict(
+        title=title,
+        meal_type='dinner',
+        cuisine='italian',
+        prep_time_minutes=10,
+        total_time_minutes=30,
+        ingredients_data=[{'original': '200g pasta'}, {'original': '1 tbsp olive oil'}],
+        instructions=[{'step': 'Cook'}],
+        calories_per_serving=600,
+        protein_per_serving=30,
+        carbs_per_serving=70,
+        fat_per_serving=20,
+        dietary_tags=['vegetarian'],
+        allergens=[],
+        rating_avg=4.0,
+        source_type='rag_database',
+    )
+    fields.update(overrides)
+    return Recipe.objects.create(**fields)
+
+
+class DynamicMealPlanningConcurrencyTestCase(SimpleTestCase):
+    def setUp(self):
+        self.profile = make_nutrition_profile()
+        self.strategy = {
+            'meal_strategy': {
+                meal_type: {'calorie_target': 600} for meal_type in DynamicMealPlanningService.MEAL_TYPES
+            },
+            'daily_themes': ['mediterranean', 'high_protein'],
+        }
+
+    def _fake_strategic_meal(self, meal_type, meal_template, nutrition_profile, theme, day_offset):
+        # Finish out of submission order to prove ordering is preserved
+        time.sleep(0.01 * ((7 - day_offset) % 3))
+        if meal_type == 'lunch' and day_offset == 2:
+            return None  # Simulates a meal that failed validation
+        return {'title': f'{meal_type}-{day_offset}', 'meal_type': meal_type, 'theme': theme}
+
+    def test_weekly_plan_is_ordered_and_falls_back_per_meal(self):
+        service = DynamicMealPlanningService(max_concurrent_meals=5)
+
+        with patch.object(service, '_generate_strategic_meal', side_effect=self._fake_strategic_meal):
+            plan = service._generate_strategic_meals(self.strategy, self.profile, 7)
+
+        days = list(plan['meals'].values())
+        self.assertEqual(len(days), 7)
+        for day_offset, meals in enumerate(days):
+            self.assertEqual([m['meal_type'] for m in meals], ['breakfast', 'lunch', 'dinner'])
+            if day_offset == 2:
+                self.assertTrue(meals[1]['id'].startswith('profile_aware_lunch'))
+            else:
+                self.assertEqual(meals[1]['title'], f'lunch-{day_offset}')
+        self.assertEqual(days[1][0]['theme'], 'high_protein')
+
+    def test_in_flight_calls_are_bounded(self):
+        service = DynamicMealPlanningService(max_concurrent_meals=3)
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def slow_meal(meal_type, *args):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+            return {'title': meal_type, 'meal_type': meal_type}
+
+        with patch.object(service, '_generate_strategic_meal', side_effect=slow_meal):
+            service._generate_strategic_meals(self.strategy, self.profile, 7)
+
+        self.assertGreater(state['peak'], 1)
+        self.assertLessEqual(state['peak'], 3)
+
+    def test_batched_mode_repairs_invalid_and_missing_meals(self):
+        service = DynamicMealPlanningService(max_concurrent_meals=2)
+        service.batched_days_per_request = 2
+        batched = {
+            (day_offset, meal_type): {'title': f'batched-{meal_type}-{day_offset}', 'meal_type': meal_type,
+                                      'calories_per_serving': 610}
+            for day_offset in range(3) for meal_type in DynamicMealPlanningService.MEAL_TYPES
+        }
+        batched[(0, 'dinner')]['calories_per_serving'] = 1500  # Fails validation
+        del batched[(2, 'breakfast')]  # Missing from the response
+
+        with patch.object(service, '_request_batched_meals', return_value=batched) as batched_request, \
+                patch.object(service, '_generate_strategic_meal', side_effect=self._fake_strategic_meal) as per_meal:
+            plan = service._generate_batched_strategic_meals(self.strategy, self.profile, 3)
+
+        requested_days = sorted([day for _, day in call.args[2]] for call in batched_request.call_args_list)
+        self.assertEqual(requested_days, [[0, 1], [2]])
+        self.assertEqual(per_meal.call_count, 2)
+        self.assertEqual(plan['repaired_meals'], 2)
+
+        days = list(plan['meals'].values())
+        self.assertEqual(days[0][0]['title'], 'batched-breakfast-0')
+        self.assertEqual(days[0][2]['title'], 'dinner-0')
+        self.assertEqual(days[2][0]['title'], 'breakfast-2')
+        self.assertEqual(days[2][1]['title'], 'batched-lunch-2')
+
+    def test_batched_chunk_ignores_days_it_did_not_request(self):
+        def reply(request):
+            return json.dumps({'days': [
+                {'day_number': day, 'meals': [{'meal_type': 'lunch', 'title': f'lunch-{day}'}]} for day in (1, 3, 4)
+            ]})
+
+        gateway = LLMGateway(backend=FakeLLMBackend(responder=reply), response_cache=False)
+        service = DynamicMealPlanningService()
+        with patch('meal_planning.services.dynamic_meal_planning_service.get_llm_gateway', return_value=gateway), \
+                self.assertLogs('nutrition.dynamic_meal_planning', 'WARNING'):
+            meals = service._request_batched_meals(self.strategy, self.profile, [('mediterranean', 2), ('high_protein', 3)])
+
+        self.assertEqual(sorted(meals), [(2, 'lunch'), (3, 'lunch')])
+
+
+class RecipeIndexTestCase(TestCase):
+    def test_search_matches_orm_filters_and_ranks(self):
+        best = create_recipe('Best', rating_avg=5.0)
+        ok = create_recipe('Ok', rating_avg=3.0, calories_per_serving=700)
+        create_recipe('Gluten', allergens=['gluten'])
+        create_recipe('Meaty', dietary_tags=[])
+        create_recipe('Mushroom', ingredients_data=[{'original': '100g Mushrooms'}])
+        create_recipe('Too big', calories_per_serving=900)
+        create_recipe('Breakfast', meal_type='breakfast')
+        create_recipe('Thai', cuisine='thai')
+
+        index = RecipeIndex()
+        results = index.search(
+            meal_type='dinner', calorie_target=600, dietary_preferences=['vegetarian'],
+            allergens=['gluten'], cuisine_preferences=['italian'], disliked_ingredients=['mushroom']
+        )
+
+        self.assertEqual([recipe_id for recipe_id, _ in results], [best.id, ok.id])
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+
+    def test_incremental_refresh_picks_up_changes_and_deletes(self):
+        first = create_recipe('First')
+        index = RecipeIndex(refresh_interval=0)
+        self.assertEqual(len(index.search('dinner', 600)), 1)
+
+        second = create_recipe('Second', dietary_tags=['vegan'])
+        first.dietary_tags = ['vegan']
+        first.save()
+        vegan = index.search('dinner', 600, dietary_preferences=['vegan'])
+        self.assertEqual({recipe_id for recipe_id, _ in vegan}, {first.id, second.id})
+        self.assertEqual(len(index), 2)
+
+        second.delete()
+        self.assertEqual([recipe_id for recipe_id, _ in index.search('dinner', 600)], [first.id])
+
+
+class RecipeVectorIndexTestCase(TestCase):
+    def test_hashing_backend_is_deterministic_and_normalized(self):
+        backend = HashingEmbeddingBackend(256)
+        vectors = backend.embed(['Thai green curry', 'thai green curry', 'chocolate cake'])
+
+        np.testing.assert_array_equal(vectors[0], vectors[1])
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertGreater(vectors[0] @ backend.embed_one('green curry with rice'), vectors[0] @ vectors[2])
+
+    def test_embed_command_and_semantic_search(self):
+        titles = ['Thai green curry', 'Chocolate lava cake', 'Spaghetti carbonara']
+        for title in titles:
+            create_recipe(title)
+
+        with patch.dict('django.conf.settings.RECIPE_EMBEDDINGS', {'backend': 'local'}):
+            call_command('embed_recipes', batch_size=2, stdout=StringIO())
+        self.assertFalse(Recipe.objects.filter(embedding_vector__isnull=True).exists())
+
+        index = RecipeVectorIndex(refresh_interval=0, backend=HashingEmbeddingBackend(1536))
+        results = index.search_text('green curry', limit=2)
+        self.assertEqual(Recipe.objects.get(id=results[0][0]).title, 'Thai green curry')
+
+        cake = Recipe.objects.get(title='Chocolate lava cake')
+        restricted = index.search_text('green curry', candidate_ids=[cake.id])
+        self.assertEqual([recipe_id for recipe_id, _ in restricted], [cake.id])
+
+    def test_vectors_from_another_backend_are_not_searched(self):
+        create_recipe('Thai green curry')
+        with patch.dict('django.conf.settings.RECIPE_EMBEDDINGS', {'backend': 'local'}):
+            call_command('embed_recipes', stdout=StringIO())
+        self.assertEqual(Recipe.objects.get().embedding_model, 'local:1536')
+
+        other_backend = HashingEmbeddingBackend(1536)
+        other_backend.name = 'openai'  # Same dimensions, different vector space
+        index = RecipeVectorIndex(refresh_interval=0, backend=other_backend)
+        with self.assertLogs('nutrition.recipe_vector_index', 'ERROR'):
+            self.assertEqual(index.search_text('green curry'), [])
+
+    def test_ivf_search_agrees_with_exact_search(self):
+        rng = np.random.default_rng(7)
+        centers = rng.normal(size=(20, 32))
+        vectors = centers[rng.integers(0, 20, 2000)] + rng.normal(scale=0.1, size=(2000, 32))
+
+        index = RecipeVectorIndex(refresh_interval=3600, ivf_min_size=1000, nprobe=4)
+        index._watermark = object()  # Skip database refreshes
+        index._last_checked = time.monotonic()
+        index._upsert_rows([(i, vector.tolist(), None) for i, vector in enumerate(vectors)])
+
+        hits = 0
+        for query in vectors[:50]:
+            exact = [recipe_id for recipe_id, _ in index.search(query, limit=10, exact=True)]
+            approximate = [recipe_id for recipe_id, _ in index.search(query, limit=10)]
+            hits += len(set(exact) & set(approximate))
+        self.assertIsNotNone(index._centroids)
+        self.assertGreater(hits / 500, 0.9)
+
+
+class IngredientNutritionTestCase(TestCase):
+    def setUp(self):
+        for name, calories in [('olive oil', 884), ('chicken breast', 165), ('red onion', 40), ('tomato', 18)]:
+            Ingredient.objects.create(name=name, name_clean=name.replace(' ', '_'), calories_per_100g=calories)
+        get_ingredient_resolver().invalidate()
+
+    def test_recipe_resolves_with_at_most_one_query(self):
+        service = NutritionCalculationService()
+        ingredients = [
+            {'name': 'Olive Oil', 'quantity': 10, 'unit': 'g'},
+            {'name': 'chicken', 'quantity': 200, 'unit': 'g'},
+            {'name': 'onion', 'quantity': 100, 'unit': 'g'},
+            {'name': 'tomatos', 'quantity': 100, 'unit': 'g'},
+            {'name': 'unobtainium', 'quantity': 5, 'unit': 'g'},
+        ]
+
+        with self.assertNumQueries(2):  # Freshness check + table load
+            service.calculate_recipe_nutrition(ingredients)
+        with self.assertNumQueries(0):
+            service.calculate_recipe_nutrition(ingredients)
+
+        self.assertEqual(service._find_ingredient('chicken').name, 'chicken breast')
+        self.assertEqual(service._find_ingredient('onion').name, 'red onion')
+        self.assertEqual(service._find_ingredient('tomatos').name, 'tomato')
+        self.assertIsNone(service._find_ingredient('unobtainium'))
+
+    def test_saves_invalidate_resolved_names(self):
+        resolver = get_ingredient_resolver()
+        self.assertIsNone(resolver.resolve('chicken thigh'))
+
+        Ingredient.objects.create(name='chicken thigh', name_clean='chicken_thigh', calories_per_100g=209)
+        self.assertEqual(resolver.resolve('chicken thigh').name, 'chicken thigh')
+
+    def test_calculate_many_matches_single_recipe_calculation(self):
+        service = NutritionCalculationService()
+        pasta = [
+            {'name': 'olive oil', 'quantity': 2, 'unit': 'tbsp'},
+            {'name': 'chicken', 'quantity': 300, 'unit': 'g'},
+            {'name': 'mystery cheese', 'quantity': 50, 'unit': 'g'},
+        ]
+        salad = ['200g tomato', '1/2 cup red onion', 'salt to taste']
+
+        results = service.calculate_many([
+            {'ingredients': pasta, 'servings': 2},
+            create_recipe('Salad', ingredients_data=salad, servings=1),
+            {'ingredients': [], 'servings': 1},
+        ])
+
+        expected = service.calculate_recipe_nutrition(pasta, servings=2)
+        self.assertEqual(results[0]['nutrition_per_serving'], expected['nutrition_per_serving'])
+        self.assertEqual(results[0]['calculation_confidence'], expected['calculation_confidence'])
+        # 200g of tomato + 120ml of onion
+        self.assertAlmostEqual(results[1]['total_nutrition']['calories'], 2 * 18 + 1.2 * 40, places=1)
+        self.assertEqual(results[2]['total_nutrition']['calories'], 0)
+
+    def test_fix_meal_plan_calories_skips_malformed_plans(self):
+        user = get_user_model().objects.create_user(username='planner', email='planner@example.com', password='x')
+        plan_fields = dict(user=user, start_date=date.today(), end_date=date.today(), total_calories=0,
+                           avg_daily_calories=0, total_protein=0, total_carbs=0, total_fat=0)
+        broken = [
+            MealPlan.objects.create(meal_plan_data={'meals': ['not', 'a', 'dict']}, **plan_fields),
+            MealPlan.objects.create(meal_plan_data={'meals': {'2024-01-01': ['not a meal']}}, **plan_fields),
+        ]
+        valid = MealPlan.objects.create(meal_plan_data={'meals': {
+            '2024-01-01': [{'calories_per_serving': 500, 'protein_per_serving': 30}],
+            '2024-01-02': [{'calories_per_serving': 700, 'protein_per_serving': 40}],
+        }}, **plan_fields)
+
+        output = StringIO()
+        call_command('fix_meal_plan_calories', batch_size=2, stdout=output)
+
+        valid.refresh_from_db()
+        self.assertEqual((valid.total_calories, valid.avg_daily_calories, valid.total_protein), (1200, 600, 70))
+        self.assertIn('Successfully fixed 1 meal plans', output.getvalue())
+        for plan in broken:
+            self.assertIn(f'Error fixing meal plan {plan.id}', output.getvalue())
+
+
+class NutritionLogAnalyticsTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='logger', email='logger@example.com', password='x')
+        self.profile = make_nutrition_profile()
+        self.start = date(2025, 1, 1)
+        # Calories climb 100/day: 1700, 1800, ... 2400
+        for day in range(8):
+            NutritionLog.objects.create(
+                user=self.user, date=self.start + timedelta(days=day),
+                total_calories=1700 + 100 * day, total_protein=70 + 5 * day,
+                total_carbs=250, total_fat=40 + 10 * day, calorie_deficit_surplus=-200 + 50 * day
+            )
+
+    def test_all_endpoint_payloads_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            analytics = NutritionLogAnalytics(self.user, self.start, self.start + timedelta(days=6))
+
+        goals = analytics.goal_stats(self.profile, '2025-01-01', '2025-01-07')
+        self.assertEqual(goals['total_days'], 7)
+        self.assertEqual(goals['achievements']['calories']['days_achieved'], 5)  # 1800..2200
+        self.assertEqual(goals['achievements']['protein']['days_achieved'], 5)  # >= 80
+        self.assertEqual(goals['achievements']['fat']['days_achieved'], 3)  # 53.6..80.4
+
+        summary = analytics.progress_summary(self.profile, '2025-01-01', '2025-01-07')
+        self.assertEqual(summary['averages']['calories'], 2000.0)
+        self.assertEqual(summary['averages']['total_deficit'], -350.0)
+        self.assertEqual(summary['stats']['days_on_target'], 5)
+
+        trends = analytics.trends('calories', '2025-01-01', '2025-01-07')
+        self.assertEqual(trends['statistics']['slope'], 100.0)
+        self.assertEqual(trends['statistics']['trend_direction'], 'increasing')
+        self.assertEqual(trends['period_comparison']['previous_average'], 1800.0)
+        self.assertEqual(trends['daily_data']['dates'][0], '2025-01-01')
+
+    def test_trends_downsampling_keeps_endpoints_extremes_and_statistics(self):
+        analytics = NutritionLogAnalytics(self.user, self.start, self.start + timedelta(days=7))
+        full = analytics.trends('fat', '2025-01-01', '2025-01-08')
+        thinned = analytics.trends('fat', '2025-01-01', '2025-01-08', max_points=4)
+
+        dates = thinned['daily_data']['dates']
+        self.assertEqual((dates[0], dates[-1]), ('2025-01-01', '2025-01-08'))
+        self.assertEqual(thinned['returned_points'], len(dates))
+        self.assertLess(len(dates), 8)
+        self.assertEqual(thinned['statistics'], full['statistics'])
+        self.assertEqual(thinned['data_points'], 8)
+
+    def test_lttb_keeps_the_shape_of_a_long_series(self):
+        x = np.arange(20000, dtype=np.float64)
+        y = np.sin(x / 500)
+        y[12345] = 5  # A one-day spike must survive
+        y[777] = -5
+
+        indices = lttb_indices(x, y, 500)
+
+        self.assertLessEqual(len(indices), 502)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual((indices[0], indices[-1]), (0, 19999))
+        self.assertIn(12345, indices)
+        self.assertIn(777, indices)
+        np.testing.assert_array_equal(lttb_indices(x, y, None), np.arange(20000))
+
+    def test_empty_range(self):
+        analytics = NutritionLogAnalytics(self.user, date(2024, 1, 1), date(2024, 1, 7))
+        self.assertEqual(analytics.goal_stats(self.profile, 'a', 'b')['overall_consistency'], 0)
+        self.assertEqual(analytics.trends('fat', 'a', 'b')['statistics']['trend_direction'], 'no_data')
+        self.assertEqual(analytics.progress_summary(self.profile, 'a', 'b')['averages']['calories'], 0)
+
+
+class NutritionLogRollupTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='rollup', email='rollup@example.com', password='x')
+        NutritionProfile.objects.create(
+            user=self.user, calorie_target=2000, protein_target=100, carb_target=250, fat_target=67
+        )
+        # 2025-01-01 is a Wednesday; log every day through mid-March
+        self.start = date(2025, 1, 1)
+        for day in range(75):
+            NutritionLog.objects.create(
+                user=self.user, date=self.start + timedelta(days=day),
+                total_calories=1800 + 10 * day, total_protein=100, calorie_deficit_surplus=-200 + 10 * day
+            )
+
+    def test_signals_keep_rollups_current(self):
+        january = NutritionLogRollup.objects.get(user=self.user, period='month', period_start=date(2025, 1, 1))
+        self.assertEqual(january.days_logged, 31)
+        self.assertEqual(january.total_calories, sum(1800 + 10 * day for day in range(31)))
+
+        NutritionLog.objects.get(user=self.user, date=date(2025, 1, 6)).delete()
+        january.refresh_from_db()
+        self.assertEqual(january.days_logged, 30)
+        week = NutritionLogRollup.objects.get(user=self.user, period='week', period_start=date(2025, 1, 6))
+        self.assertEqual(week.days_logged, 6)
+
+    def test_moving_a_log_updates_both_periods(self):
+        log = NutritionLog.objects.get(user=self.user, date=date(2025, 1, 6))
+        log.date = date(2025, 5, 20)
+        log.save()
+
+        january = NutritionRollupService.range_totals(self.user, date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(january['days_logged'], 30)
+        self.assertEqual(NutritionLogRollup.objects.get(user=self.user, period='week', period_start=date(2025, 1, 6)).days_logged, 6)
+        self.assertEqual(NutritionRollupService.range_totals(self.user, date(2025, 5, 1), date(2025, 5, 31))['days_logged'], 1)
+
+    def test_calorie_target_change_rebuilds_days_on_target(self):
+        start, end = date(2025, 1, 1), date(2025, 2, 28)
+        profile = NutritionProfile.objects.get(user=self.user)
+        profile.calorie_target = 2400
+        profile.save()
+
+        raw = NutritionLog.objects.filter(user=self.user, date__gte=start, date__lte=end)
+        on_target = raw.filter(total_calories__gte=2400 * 0.9, total_calories__lte=2400 * 1.1).count()
+        self.assertEqual(NutritionRollupService.range_totals(self.user, start, end)['days_on_target'], on_target)
+
+    def test_range_totals_match_raw_logs(self):
+        start, end = date(2025, 1, 3), date(2025, 3, 10)
+        raw = NutritionLog.objects.filter(user=self.user, date__gte=start, date__lte=end)
+        on_target = raw.filter(total_calories__gte=1800, total_calories__lte=2200).count()
+
+        with self.assertNumQueries(2):
+            totals = NutritionRollupService.range_totals(self.user, start, end)
+
+        self.assertEqual(totals['days_logged'], raw.count())
+        self.assertEqual(totals['days_on_target'], on_target)
+        self.assertAlmostEqual(totals['total_calories'], sum(raw.values_list('total_calories', flat=True)))
+
+    def test_period_series_is_clipped_to_the_range(self):
+        start, end = date(2025, 1, 3), date(2025, 1, 20)  # Friday to Monday
+        series = NutritionRollupService.period_series(self.user, 'week', start, end)
+        totals = NutritionRollupService.range_totals(self.user, start, end)
+
+        self.assertEqual([rollup.period_start for rollup in series],
+                         [date(2025, 1, 3), date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 20)])
+        self.assertEqual([rollup.days_logged for rollup in series], [3, 7, 7, 1])
+        self.assertEqual(sum(rollup.days_logged for rollup in series), totals['days_logged'])
+        self.assertAlmostEqual(sum(rollup.total_calories for rollup in series), totals['total_calories'])
+
+    def test_backfill_rebuilds_from_logs(self):
+        expected = sorted(NutritionLogRollup.objects.values_list('period', 'period_start', 'days_logged', 'days_on_target'))
+        NutritionLogRollup.objects.all().delete()
+
+        call_command('backfill_nutrition_rollups', stdout=StringIO())
+        rebuilt = sorted(NutritionLogRollup.objects.values_list('period', 'period_start', 'days_logged', 'days_on_target'))
+        self.assertEqual(rebuilt, expected)
+
+
+class SpoonacularResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = SpoonacularResponseCache(stale_ttl=3600)
+        self.calls = []
+
+    def fetch(self):
+        self.calls.append(1)
+        return {'results': [len(self.calls)]}
+
+    def test_keys_ignore_param_order_and_api_key(self):
+        key = SpoonacularResponseCache.make_key('/recipes/complexSearch', {'query': 'soup', 'number': 10, 'apiKey': 'a'})
+        self.assertEqual(key, SpoonacularResponseCache.make_key('/recipes/complexSearch', {'apiKey': 'b', 'number': '10', 'query': 'soup'}))
+        self.assertNotEqual(key, SpoonacularResponseCache.make_key('/recipes/complexSearch', {'query': 'stew', 'number': 10}))
+        self.assertEqual(SpoonacularResponseCache.ttl_for('/food/ingredients/search'), 604800)
+
+    def test_durable_tier_survives_cache_flush(self):
+        params = {'query': 'soup', 'apiKey': 'secret'}
+        self.assertEqual(self.cache.get_or_fetch('/recipes/complexSearch', params, self.fetch), {'results': [1]})
+        self.assertNotIn('apiKey', SpoonacularCacheEntry.objects.get().params)
+
+        cache.clear()
+        self.assertEqual(self.cache.get_or_fetch('/recipes/complexSearch', params, self.fetch), {'results': [1]})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_stale_entries_are_served_while_refreshing(self):
+        self.cache.get_or_fetch('/recipes/complexSearch', {'query': 'soup'}, self.fetch)
+        cache.clear()
+        SpoonacularCacheEntry.objects.update(fetched_at=timezone.now() - timedelta(days=1, minutes=30))
+
+        with patch.object(self.cache, '_schedule_refresh') as schedule_refresh:
+            self.assertEqual(self.cache.get_or_fetch('/recipes/complexSearch', {'query': 'soup'}, self.fetch), {'results': [1]})
+        schedule_refresh.assert_called_once()
+        self.assertEqual(len(self.calls), 1)
+
+        # Past the stale window the entry is refetched, but still used if the API fails
+        cache.clear()
+        SpoonacularCacheEntry.objects.update(fetched_at=timezone.now() - timedelta(days=3))
+        def failing_fetch():
+            raise RuntimeError('quota exhausted')
+        self.assertEqual(self.cache.get_or_fetch('/recipes/complexSearch', {'query': 'soup'}, failing_fetch), {'results': [1]})
+
+    def test_purge_task_deletes_entries_past_the_stale_window(self):
+        self.cache.get_or_fetch('/recipes/complexSearch', {'query': 'soup'}, self.fetch)
+        self.cache.get_or_fetch('/recipes/complexSearch', {'query': 'stew'}, self.fetch)
+        stale_key = SpoonacularResponseCache.make_key('/recipes/complexSearch', {'query': 'stew'})
+        SpoonacularCacheEntry.objects.filter(key=stale_key).update(fetched_at=timezone.now() - timedelta(days=30))
+
+        with patch('meal_planning.tasks.get_spoonacular_cache', return_value=self.cache):
+            self.assertEqual(purge_spoonacular_cache(), {'success': True, 'deleted': 1})
+        self.assertFalse(SpoonacularCacheEntry.objects.filter(key=stale_key).exists())
+        self.assertEqual(SpoonacularCacheEntry.objects.count(), 1)
+
+
+class SpoonacularTransportTestCase(SimpleTestCase):
+    def make_response(self, status_code, headers=None):
+        return SimpleNamespace(status_code=status_code, ok=status_code < 400, headers=headers or {}, content=b'{}')
+
+    def setUp(self):
+        self.transport = SpoonacularTransport(max_retries=3, backoff_base=0.5, backoff_max=8.0)
+
+    @patch('meal_planning.services.spoonacular_transport.time.sleep')
+    def test_retries_transient_errors_honouring_retry_after(self, sleep):
+        responses = [self.make_response(503), self.make_response(429, {'Retry-After': '2'}), self.make_response(200)]
+        with patch.object(self.transport.session, 'request', side_effect=responses) as request:
+            response = self.transport.get('https://api.example.com/recipes/42/information', '/recipes/42/information')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(sleep.call_args_list[1].args, (2.0,))
+        self.assertEqual(request.call_args.kwargs['timeout'], (3.05, 30))
+        stats = self.transport.stats()['recipes/{id}/information']
+        self.assertEqual((stats['requests'], stats['retries'], stats['errors']), (1, 2, 0))
+
+    @patch('meal_planning.services.spoonacular_transport.time.sleep')
+    def test_does_not_retry_unsafe_or_long_waits(self, sleep):
+        with patch.object(self.transport.session, 'request', return_value=self.make_response(503)) as request:
+            self.assertEqual(self.transport.post('https://api.example.com/users/connect', 'users/connect').status_code, 503)
+        self.assertEqual(request.call_count, 1)
+
+        long_wait = self.make_response(429, {'Retry-After': '3600'})
+        with patch.object(self.transport.session, 'request', return_value=long_wait) as request:
+            self.assertEqual(self.transport.get('https://api.example.com/food/ingredients/search', 'food/ingredients/search').status_code, 429)
+        self.assertEqual(request.call_count, 1)
+        sleep.assert_not_called()
+
+    @patch('meal_planning.services.spoonacular_transport.time.sleep')
+    def test_post_is_only_retried_when_the_connection_was_never_made(self, sleep):
+        import requests
+        from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+        dropped = requests.exceptions.ConnectionError(ProtocolError('Connection aborted.', ConnectionResetError()))
+        with patch.object(self.transport.session, 'request', side_effect=dropped) as request, \
+                self.assertRaises(requests.exceptions.ConnectionError):
+            self.transport.post('https://api.example.com/users/connect', 'users/connect')
+        self.assertEqual(request.call_count, 1)
+
+        refused = requests.exceptions.ConnectionError(MaxRetryError(
+            None, '/users/connect', NewConnectionError(None, 'Connection refused'),
+        ))
+        with patch.object(self.transport.session, 'request', side_effect=[refused, self.make_response(200)]) as request:
+            self.assertEqual(self.transport.post('https://api.example.com/users/connect', 'users/connect').status_code, 200)
+        self.assertEqual(request.call_count, 2)
+
+    def test_shopping_list_delete_uses_the_transport(self):
+        service = get_spoonacular_service()
+        response = Mock(status_code=200, ok=True, headers={}, content=b'')
+        with patch('meal_planning.services.spoonacular_service.get_spoonacular_transport', return_value=self.transport), \
+                patch.object(service, '_check_rate_limit', return_value=True), \
+                patch.object(self.transport.session, 'request', return_value=response) as request:
+            self.assertEqual(service.delete_from_shopping_list('cook', 'user-hash', 7), {})
+
+        method, url = request.call_args.args
+        self.assertEqual(method, 'DELETE')
+        self.assertTrue(url.endswith('/mealplanner/cook/shopping-list/items/7'))
+        self.assertEqual(request.call_args.kwargs['params'], {'hash': 'user-hash', 'apiKey': service.api_key})
+        self.assertEqual(self.transport.stats()['mealplanner/{username}/shopping-list/items/{id}']['requests'], 1)
+
+
+class SpoonacularRateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.limiter = SpoonacularRateLimiter(requests_per_day=10, requests_per_minute=6)
+        self.now = 1_700_000_000.0
+
+    def acquire(self, lane, at=0.0):
+        with patch('meal_planning.services.spoonacular_rate_limiter.time.time', return_value=self.now + at):
+            return self.limiter.acquire(lane)
+
+    def test_bursts_then_returns_retry_after_without_sleeping(self):
+        self.assertTrue(all(self.acquire('interactive').allowed for _ in range(3)))
+
+        decision = self.acquire('interactive')
+        self.assertFalse(decision.allowed)
+        self.assertAlmostEqual(decision.retry_after, 10.0)
+        self.assertTrue(self.acquire('interactive', at=10.0).allowed)
+
+    def test_background_lane_keeps_daily_headroom_for_interactive(self):
+        allowed = [self.acquire('background', at=i * 10.0) for i in range(8)]
+        self.assertEqual(sum(d.allowed for d in allowed), 7)
+        self.assertEqual(allowed[-1].retry_after, round(self.limiter.seconds_until_reset(self.now + 70.0), 3))
+
+        self.assertTrue(self.acquire('interactive', at=80.0).allowed)
+        self.assertEqual(self.acquire('interactive', at=90.0).used_today, 9)
+
+    def test_redis_outage_falls_back_locally_then_retries(self):
+        script = Mock(side_effect=[ConnectionError('redis down'), [1, '0', 5]])
+        redis_cache = Mock()
+        redis_cache._cache.get_client.return_value.register_script.return_value = script
+        self.limiter.redis_retry_seconds = 30
+
+        with patch('meal_planning.services.spoonacular_rate_limiter.cache', redis_cache), \
+                self.assertLogs('nutrition.spoonacular_rate_limiter', 'WARNING') as logs:
+            self.assertEqual(self.acquire('interactive').used_today, 1)
+            self.assertEqual(self.acquire('interactive', at=10.0).used_today, 2)
+            self.assertEqual(script.call_count, 1)
+
+            self.assertEqual(self.acquire('interactive', at=31.0).used_today, 5)
+            self.assertEqual(script.call_count, 2)
+        self.assertEqual(len(logs.records), 1)
+
+
+class FixtureReplayHandler(BaseHTTPRequestHandler):
+    """Serves canned Spoonacular responses by path and records each request"""
+    fixtures = {}
+    requested = []
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.requested.append(path)
+        body = json.dumps(self.fixtures.get(path, {})).encode()
+        self.send_response(200 if path in self.fixtures else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SpoonacularImportPipelineTestCase(TestCase):
+    NUTRIENTS = [{'name': 'Calories', 'amount': 420}, {'name': 'Protein', 'amount': 30},
+                 {'name': 'Carbohydrates', 'amount': 40}, {'name': 'Fat', 'amount': 12}]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        FixtureReplayHandler.fixtures = {
+            '/recipes/complexSearch': {'results': [{'id': 1}, {'id': 2}, {'id': 3}]},
+            '/recipes/1/information': {'id': 1, 'title': 'Lentil soup', 'readyInMinutes': 25, 'nutrition': {'nutrients': cls.NUTRIENTS}},
+            '/recipes/2/information': {'id': 2, 'title': 'Chicken bowl', 'readyInMinutes': 40, 'nutrition': {'nutrients': cls.NUTRIENTS}},
+            '/recipes/3/information': {'id': 3, 'title': 'No nutrition data', 'readyInMinutes': 10},
+            '/food/ingredients/search': {'results': [{'id': 11}, {'id': 12}]},
+            '/food/ingredients/11/information': {'id': 11, 'name': 'red lentils', 'nutrition': {'nutrients': cls.NUTRIENTS}},
+            '/food/ingredients/12/information': {'id': 12, 'name': 'brown rice', 'nutrition': {'nutrients': cls.NUTRIENTS}},
+        }
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureReplayHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        FixtureReplayHandler.requested = []
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint_path = os.path.join(checkpoint_dir.name, 'checkpoint.json')
+        limiter = SpoonacularRateLimiter(requests_per_day=1000, requests_per_minute=60000)
+        for patcher in (
+            patch('meal_planning.services.spoonacular_service.get_spoonacular_rate_limiter', return_value=limiter),
+            patch.object(get_spoonacular_cache(), 'durable', False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_command_imports_against_replay_server(self):
+        Recipe.objects.create(
+            spoonacular_id=1, title='Old title', meal_type='lunch', prep_time_minutes=5, total_time_minutes=25,
+            ingredients_data=[], instructions=[], calories_per_serving=1, protein_per_serving=1,
+            carbs_per_serving=1, fat_per_serving=1, source_type='spoonacular', rating_avg=4.5,
+        )
+        out = StringIO()
+        call_command(
+            'populate_nutrition_database', recipes=3, ingredients=2, workers=3, write_batch_size=2,
+            cuisines='italian', diet_types='vegan', checkpoint=self.checkpoint_path, base_url=self.base_url, stdout=out,
+        )
+
+        self.assertEqual(sorted(Recipe.objects.values_list('spoonacular_id', flat=True)), [1, 2])
+        updated = Recipe.objects.get(spoonacular_id=1)
+        self.assertEqual((updated.title, updated.calories_per_serving, updated.rating_avg), ('Lentil soup', 420, 4.5))
+        self.assertEqual(Ingredient.objects.filter(spoonacular_id__in=[11, 12]).count(), 2)
+        self.assertIn('Successfully imported 1 recipes', out.getvalue())
+        self.assertIn('recipes: 2 written (1 new, 1 updated), 1 failed', out.getvalue())
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resumes_from_checkpoint(self):
+        checkpoint = ImportCheckpoint(self.checkpoint_path)
+        section = checkpoint.section('recipes')
+        section['candidates'].extend([1, 2])
+        section['written'].add(1)
+        checkpoint.save()
+
+        service = get_spoonacular_service(lane='background')
+        service.base_url = self.base_url
+        resumed = ImportCheckpoint(self.checkpoint_path)
+        pipeline = SpoonacularImportPipeline(service, workers=2, checkpoint=resumed, report=lambda message: None)
+        stats = pipeline.run('recipes', resumed.pending('recipes'))
+
+        self.assertEqual(FixtureReplayHandler.requested, ['/recipes/2/information'])
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(ImportCheckpoint(self.checkpoint_path).pending('recipes'), [])
+
+
+class EnhancedSpoonacularRecipePersistenceTestCase(TestCase):
+    def setUp(self):
+        self.service = EnhancedSpoonacularService()
+        Recipe.objects.create(
+            spoonacular_id=101, title='Existing oats', meal_type='breakfast', prep_time_minutes=5, total_time_minutes=10,
+            ingredients_data=[], instructions=[], calories_per_serving=350, protein_per_serving=12,
+            carbs_per_serving=55, fat_per_serving=8, source_type='spoonacular',
+        )
+
+    def meal(self, recipe_id):
+        return {'id': recipe_id, 'title': f'Recipe {recipe_id}', 'servings': 2, 'readyInMinutes': 20,
+                'nutrition': {'nutrients': [{'name': 'Calories', 'amount': 500}]}}
+
+    def test_week_plan_saves_recipes_in_one_batch(self):
+        week = {
+            day: {'meals': [self.meal(101), self.meal(200 + offset), self.meal(300)]}
+            for offset, day in enumerate(['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'])
+        }
+
+        # IN lookup + bulk INSERT, plus the savepoint around the insert
+        with self.assertNumQueries(4):
+            normalized = self.service.normalize_meal_plan_data({'week': week}, 'week')
+
+        self.assertEqual(Recipe.objects.count(), 1 + 7 + 1)
+        database_ids = {
+            meal['recipe']['id']: meal['recipe']['database_id']
+            for meals in normalized['meals'].values() for meal in meals
+        }
+        for spoonacular_id, database_id in database_ids.items():
+            self.assertEqual(str(Recipe.objects.get(spoonacular_id=spoonacular_id).id), database_id)
+        self.assertEqual(len({meals[2]['recipe']['database_id'] for meals in normalized['meals'].values()}), 1)
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_identical_spoonacular_misses_share_one_call(self):
+        service = get_spoonacular_service()
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(endpoint, params):
+            calls.append(endpoint)
+            release.wait(5)
+            return {'results': [{'id': 7}]}
+
+        results = []
+        coalesced_before = get_single_flight('spoonacular').stats['coalesced']
+        with patch.object(get_spoonacular_cache(), 'durable', False), patch.object(service, '_fetch', side_effect=slow_fetch):
+            threads = [threading.Thread(target=lambda: results.append(service.search_recipes(query='soup'))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            while get_single_flight('spoonacular').stats['coalesced'] < coalesced_before + 3 and len(calls) < 4:
+                time.sleep(0.01)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'results': [{'id': 7}]}] * 4)
+        self.assertEqual(len({id(result) for result in results}), 4)
+
+    def test_waits_for_result_published_by_another_process(self):
+        group = SingleFlight('test', poll_interval=0.01, wait_timeout=1)
+        cache.set('single_flight:test:lock:key', 'other-process', 30)
+        threading.Timer(0.05, cache.set, ('single_flight:test:result:key', {'value': 42}, 5)).start()
+
+        self.assertEqual(group.do('key', lambda: self.fail('should reuse the other process result')), 42)
+        self.assertEqual(group.stats['shared'], 1)
+
+
+class LLMGatewayTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_low_temperature_calls_are_served_from_cache(self):
+        backend = FakeLLMBackend(responder=lambda request: '{"calories": 2000}')
+        gateway = LLMGateway(backend=backend)
+        request = {'model': 'gpt-3.5-turbo', 'messages': [{'role': 'user', 'content': 'plan'}]}
+
+        first = gateway.chat(temperature=0.3, **request)
+        second = gateway.chat(temperature=0.3, **request)
+        gateway.chat(temperature=0.7, **request)
+        gateway.chat(temperature=0.7, **request)
+
+        self.assertEqual(second.choices[0].message.content, first.choices[0].message.content)
+        self.assertEqual(len(backend.requests), 3)
+        self.assertEqual(gateway.stats['cache_hits'], 1)
+
+    def test_retries_rate_limited_calls(self):
+        import httpx
+        import openai
+
+        rate_limited = openai.RateLimitError('slow down', body=None, response=httpx.Response(
+            429, headers={'retry-after': '0'}, request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'),
+        ))
+        backend = FakeLLMBackend()
+        gateway = LLMGateway(backend=backend, max_retries=2)
+
+        with patch.object(backend, 'chat', side_effect=[rate_limited, rate_limited, backend.chat(model='m', messages=[])]):
+            response = gateway.chat(model='m', messages=[], temperature=1.0)
+        self.assertEqual(response.choices[0].message.content, 'This is a response from the fake LLM backend.')
+        self.assertEqual(gateway.stats['retries'], 2)
+
+        with patch.object(backend, 'chat', side_effect=rate_limited), self.assertRaises(openai.RateLimitError):
+            gateway.chat(model='m', messages=[], temperature=1.0)
+
+    def test_streams_hold_a_concurrency_slot_until_finished(self):
+        gateway = LLMGateway(backend=FakeLLMBackend(), max_concurrency=1)
+
+        def slot_free():
+            if gateway._semaphore.acquire(blocking=False):
+                gateway._semaphore.release()
+                return True
+            return False
+
+        stream = gateway.chat_stream(model='m', messages=[])
+        next(stream)
+        self.assertFalse(slot_free())
+        list(stream)
+        self.assertTrue(slot_free())
+
+        stream = gateway.chat_stream(model='m', messages=[])
+        self.assertFalse(slot_free())
+        stream.close()
+        self.assertTrue(slot_free())
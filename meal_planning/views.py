@@ -12,6 +12,9 @@ from .services.enhanced_spoonacular_service import EnhancedSpoonacularService, S
 from .services.ai_meal_planning_service import AIMealPlanningService
 from .services.ai_nutrition_profile_service import AINutritionProfileService
 from .services.shopping_list_service import ShoppingListService
+from .services.nutrition_log_analytics import NutritionLogAnalytics
+from .services.nutrition_rollups import NutritionRollupService
+from utils.downsampling import lttb_indices, parse_max_points, take
 from .serializers import (
     NutritionProfileSerializer, RecipeSerializer, IngredientSerializer,
     MealPlanSerializer, UserRecipeRatingSerializer, NutritionLogSerializer
@@ -1357,7 +1360,8 @@ class MealPlanViewSet(viewsets.ModelViewSet):
             meal_plan_data = dynamic_service.generate_personalized_meal_plan(
                 enhanced_profile, 
                 days, 
-                custom_options
+                custom_options,
+                generation_mode=plan_data.get('generation_mode')
             )
             
             # Create a MealPlan object
@@ -2028,11 +2032,6 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
             
-            logs = self.get_queryset().filter(
-                date__gte=start_date_obj,
-                date__lte=end_date_obj
-            )
-            
             # Get user's nutrition profile for targets
             try:
                 nutrition_profile = NutritionProfile.objects.get(user=request.user)
@@ -2042,62 +2041,8 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Calculate summary statistics
-            if logs.exists():
-                totals = logs.aggregate(
-                    avg_calories=models.Avg('total_calories'),
-                    avg_protein=models.Avg('total_protein'),
-                    avg_carbs=models.Avg('total_carbs'),
-                    avg_fat=models.Avg('total_fat'),
-                    total_deficit=models.Sum('calorie_deficit_surplus')
-                )
-                
-                # Calculate goal achievement stats
-                calorie_target = nutrition_profile.calorie_target
-                days_on_target = logs.filter(
-                    total_calories__gte=calorie_target * 0.9,
-                    total_calories__lte=calorie_target * 1.1
-                ).count()
-                
-                total_days = logs.count()
-                consistency_score = (days_on_target / total_days * 100) if total_days > 0 else 0
-                
-                summary = {
-                    'averages': {
-                        'calories': round(totals['avg_calories'] or 0, 1),
-                        'protein': round(totals['avg_protein'] or 0, 1),
-                        'carbs': round(totals['avg_carbs'] or 0, 1),
-                        'fat': round(totals['avg_fat'] or 0, 1),
-                        'total_deficit': round(totals['total_deficit'] or 0, 1)
-                    },
-                    'targets': {
-                        'calories': nutrition_profile.calorie_target,
-                        'protein': nutrition_profile.protein_target,
-                        'carbs': nutrition_profile.carb_target,
-                        'fat': nutrition_profile.fat_target
-                    },
-                    'stats': {
-                        'total_days': total_days,
-                        'days_on_target': days_on_target,
-                        'consistency_score': round(consistency_score, 1)
-                    },
-                    'date_range': {
-                        'start_date': start_date,
-                        'end_date': end_date
-                    }
-                }
-            else:
-                summary = {
-                    'averages': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'total_deficit': 0},
-                    'targets': {
-                        'calories': nutrition_profile.calorie_target,
-                        'protein': nutrition_profile.protein_target,
-                        'carbs': nutrition_profile.carb_target,
-                        'fat': nutrition_profile.fat_target
-                    },
-                    'stats': {'total_days': 0, 'days_on_target': 0, 'consistency_score': 0},
-                    'date_range': {'start_date': start_date, 'end_date': end_date}
-                }
+            analytics = NutritionLogAnalytics(request.user, start_date_obj, end_date_obj, self.get_queryset())
+            summary = analytics.progress_summary(nutrition_profile, start_date, end_date)
             
             return Response(summary)
                 
@@ -2129,39 +2074,13 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
             week_start_obj = datetime.strptime(week_start, '%Y-%m-%d').date()
             week_end_obj = week_start_obj + timedelta(days=6)
             
-            logs = self.get_queryset().filter(
-                date__gte=week_start_obj,
-                date__lte=week_end_obj
-            )
-            
-            if logs.exists():
-                averages = logs.aggregate(
-                    avg_calories=models.Avg('total_calories'),
-                    avg_protein=models.Avg('total_protein'),
-                    avg_carbs=models.Avg('total_carbs'),
-                    avg_fat=models.Avg('total_fat'),
-                    total_deficit=models.Sum('calorie_deficit_surplus')
-                )
-                
-                result = {
-                    'week_start': week_start,
-                    'week_end': week_end_obj.strftime('%Y-%m-%d'),
-                    'averages': {
-                        'calories': round(averages['avg_calories'] or 0, 1),
-                        'protein': round(averages['avg_protein'] or 0, 1),
-                        'carbs': round(averages['avg_carbs'] or 0, 1),
-                        'fat': round(averages['avg_fat'] or 0, 1),
-                        'total_deficit': round(averages['total_deficit'] or 0, 1)
-                    },
-                    'days_logged': logs.count()
-                }
-            else:
-                result = {
-                    'week_start': week_start,
-                    'week_end': week_end_obj.strftime('%Y-%m-%d'),
-                    'averages': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'total_deficit': 0},
-                    'days_logged': 0
-                }
+            totals = NutritionRollupService.range_totals(request.user, week_start_obj, week_end_obj)
+            result = {
+                'week_start': week_start,
+                'week_end': week_end_obj.strftime('%Y-%m-%d'),
+                'averages': NutritionRollupService.averages(totals),
+                'days_logged': totals['days_logged']
+            }
             
             return Response(result)
                 
@@ -2194,11 +2113,6 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
             
-            logs = self.get_queryset().filter(
-                date__gte=start_date_obj,
-                date__lte=end_date_obj
-            )
-            
             # Get user's nutrition profile for targets
             try:
                 nutrition_profile = NutritionProfile.objects.get(user=request.user)
@@ -2208,71 +2122,8 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            if logs.exists():
-                total_days = logs.count()
-                calorie_target = nutrition_profile.calorie_target
-                protein_target = nutrition_profile.protein_target
-                carb_target = nutrition_profile.carb_target
-                fat_target = nutrition_profile.fat_target
-                
-                # Calculate achievement rates for each macro
-                calorie_achievements = logs.filter(
-                    total_calories__gte=calorie_target * 0.9,
-                    total_calories__lte=calorie_target * 1.1
-                ).count()
-                
-                protein_achievements = logs.filter(
-                    total_protein__gte=protein_target * 0.8
-                ).count()
-                
-                carb_achievements = logs.filter(
-                    total_carbs__gte=carb_target * 0.8,
-                    total_carbs__lte=carb_target * 1.2
-                ).count()
-                
-                fat_achievements = logs.filter(
-                    total_fat__gte=fat_target * 0.8,
-                    total_fat__lte=fat_target * 1.2
-                ).count()
-                
-                stats = {
-                    'total_days': total_days,
-                    'achievements': {
-                        'calories': {
-                            'days_achieved': calorie_achievements,
-                            'percentage': round(calorie_achievements / total_days * 100, 1)
-                        },
-                        'protein': {
-                            'days_achieved': protein_achievements,
-                            'percentage': round(protein_achievements / total_days * 100, 1)
-                        },
-                        'carbs': {
-                            'days_achieved': carb_achievements,
-                            'percentage': round(carb_achievements / total_days * 100, 1)
-                        },
-                        'fat': {
-                            'days_achieved': fat_achievements,
-                            'percentage': round(fat_achievements / total_days * 100, 1)
-                        }
-                    },
-                    'overall_consistency': round((calorie_achievements + protein_achievements + carb_achievements + fat_achievements) / (4 * total_days) * 100, 1),
-                    'date_range': {
-                        'start_date': start_date,
-                        'end_date': end_date
-                    }
-                }
-            else:
-                stats = {
-                    'total_days': 0,
-                    'achievements': {
-                        'calories': {'days_achieved': 0, 'percentage': 0},
-                        'protein': {'days_achieved': 0, 'percentage': 0},
-                        'carbs': {'days_achieved': 0, 'percentage': 0},
-                        'fat': {'days_achieved': 0, 'percentage': 0}
-                    },
-                    'overall_consistency': 0,
-                    'date_range': {'start_date': start_date, 'end_date': end_date}
-                }
+            analytics = NutritionLogAnalytics(request.user, start_date_obj, end_date_obj, self.get_queryset())
+            stats = analytics.goal_stats(nutrition_profile, start_date, end_date)
             
             return Response(stats)
                 
@@ -2308,110 +2159,20 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            try:
+                max_points = parse_max_points(request.query_params.get('max_points'))
+            except ValueError:
+                return Response(
+                    {'error': 'max_points must be an integer of at least 3'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             # Parse dates
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
             
-            logs = self.get_queryset().filter(
-                date__gte=start_date_obj,
-                date__lte=end_date_obj
-            ).order_by('date')
-            
-            if logs.exists():
-                # Get field name for the metric
-                field_map = {
-                    'calories': 'total_calories',
-                    'protein': 'total_protein', 
-                    'carbs': 'total_carbs',
-                    'fat': 'total_fat'
-                }
-                field_name = field_map[metric]
-                
-                # Extract daily values
-                daily_values = []
-                dates = []
-                for log in logs:
-                    daily_values.append(getattr(log, field_name, 0))
-                    dates.append(log.date.strftime('%Y-%m-%d'))
-                
-                # Calculate trend statistics
-                if len(daily_values) > 1:
-                    # Simple linear trend calculation
-                    x_values = list(range(len(daily_values)))
-                    n = len(daily_values)
-                    sum_x = sum(x_values)
-                    sum_y = sum(daily_values)
-                    sum_xy = sum(x * y for x, y in zip(x_values, daily_values))
-                    sum_x2 = sum(x * x for x in x_values)
-                    
-                    # Linear regression slope
-                    slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x) if (n * sum_x2 - sum_x * sum_x) != 0 else 0
-                    
-                    # Calculate average and determine trend
-                    average = sum_y / n
-                    trend_direction = 'increasing' if slope > 0.1 else ('decreasing' if slope < -0.1 else 'stable')
-                    
-                    # Calculate recent vs previous period averages
-                    mid_point = len(daily_values) // 2
-                    recent_avg = sum(daily_values[mid_point:]) / len(daily_values[mid_point:]) if len(daily_values[mid_point:]) > 0 else 0
-                    previous_avg = sum(daily_values[:mid_point]) / len(daily_values[:mid_point]) if len(daily_values[:mid_point]) > 0 else 0
-                    
-                    trend_data = {
-                        'metric': metric,
-                        'date_range': {'start_date': start_date, 'end_date': end_date},
-                        'daily_data': {
-                            'dates': dates,
-                            'values': daily_values
-                        },
-                        'statistics': {
-                            'average': round(average, 1),
-                            'minimum': round(min(daily_values), 1),
-                            'maximum': round(max(daily_values), 1),
-                            'slope': round(slope, 3),
-                            'trend_direction': trend_direction
-                        },
-                        'period_comparison': {
-                            'recent_average': round(recent_avg, 1),
-                            'previous_average': round(previous_avg, 1),
-                            'change': round(recent_avg - previous_avg, 1),
-                            'change_percentage': round((recent_avg - previous_avg) / previous_avg * 100, 1) if previous_avg > 0 else 0
-                        },
-                        'data_points': len(daily_values)
-                    }
-                else:
-                    trend_data = {
-                        'metric': metric,
-                        'date_range': {'start_date': start_date, 'end_date': end_date},
-                        'daily_data': {'dates': dates, 'values': daily_values},
-                        'statistics': {
-                            'average': daily_values[0] if daily_values else 0,
-                            'minimum': daily_values[0] if daily_values else 0,
-                            'maximum': daily_values[0] if daily_values else 0,
-                            'slope': 0,
-                            'trend_direction': 'insufficient_data'
-                        },
-                        'period_comparison': {
-                            'recent_average': 0,
-                            'previous_average': 0,
-                            'change': 0,
-                            'change_percentage': 0
-                        },
-                        'data_points': len(daily_values)
-                    }
-            else:
-                trend_data = {
-                    'metric': metric,
-                    'date_range': {'start_date': start_date, 'end_date': end_date},
-                    'daily_data': {'dates': [], 'values': []},
-                    'statistics': {
-                        'average': 0, 'minimum': 0, 'maximum': 0, 'slope': 0,
-                        'trend_direction': 'no_data'
-                    },
-                    'period_comparison': {
-                        'recent_average': 0, 'previous_average': 0, 'change': 0, 'change_percentage': 0
-                    },
-                    'data_points': 0
-                }
+            analytics = NutritionLogAnalytics(request.user, start_date_obj, end_date_obj, self.get_queryset())
+            trend_data = analytics.trends(metric, start_date, end_date, max_points=max_points)
             
             return Response(trend_data)
                 
@@ -2442,6 +2203,19 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
         days = int(request.query_params.get('days', 7))
         today = timezone.now().date()
         start_date = today - timedelta(days=days - 1)
+        try:
+            max_points = parse_max_points(request.query_params.get('max_points'))
+        except ValueError:
+            return Response(
+                {'error': 'max_points must be an integer of at least 3'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Long ranges can be charted per week or month straight from the rollup table
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity in NutritionRollupService.PERIODS:
+            data = self._rollup_dashboard_data(granularity, start_date, today)
+            return Response(self._downsample_dashboard_data(data, max_points))
 
         logs = (self.get_queryset()
                 .filter(date__gte=start_date, date__lte=today)
@@ -2478,4 +2252,32 @@ class NutritionLogViewSet(viewsets.ModelViewSet):
             'fat': sum(data['fat']),
         }
 
-        return Response(data)
+        return Response(self._downsample_dashboard_data(data, max_points))
+
+    @staticmethod
+    def _downsample_dashboard_data(data, max_points):
+        """Thin the dashboard series to ~max_points (LTTB on calories); totals keep every day"""
+        if max_points is None or max_points >= len(data['labels']):
+            return data
+        series = [key for key in ('calories', 'protein', 'carbs', 'fat', 'days_logged') if key in data]
+        indices = lttb_indices(None, data['calories'], max_points,
+                               extra_series=[data[key] for key in series[1:]])
+        for key in ['labels', *series]:
+            data[key] = take(data[key], indices)
+        return data
+
+    def _rollup_dashboard_data(self, granularity, start_date, end_date):
+        """dashboard_data payload with one point per week/month rollup (period sums, clipped to the range)"""
+        data = {'labels': [], 'calories': [], 'protein': [], 'carbs': [], 'fat': [], 'days_logged': []}
+        for rollup in NutritionRollupService.period_series(self.request.user, granularity, start_date, end_date):
+            data['labels'].append(rollup.period_start.isoformat())
+            data['calories'].append(rollup.total_calories)
+            data['protein'].append(rollup.total_protein)
+            data['carbs'].append(rollup.total_carbs)
+            data['fat'].append(rollup.total_fat)
+            data['days_logged'].append(rollup.days_logged)
+
+        totals = NutritionRollupService.range_totals(self.request.user, start_date, end_date)
+        data['totals'] = {macro: totals[f'total_{macro}'] for macro in ('calories', 'protein', 'carbs', 'fat')}
+        data['granularity'] = granularity
+        return data
@@ -113,11 +113,11 @@ except Exception as e:
     echo "================================================"
     
     # Start the application with optimized settings
-    exec gunicorn wellness_project.wsgi:application \
+    # (ASGI workers so assistant replies can stream over Server-Sent Events)
+    exec gunicorn wellness_project.asgi:application \
         --bind 0.0.0.0:10000 \
         --workers 2 \
-        --worker-class sync \
-        --worker-connections 1000 \
+        --worker-class uvicorn.workers.UvicornWorker \
         --timeout 120 \
         --keep-alive 2 \
         --max-requests 1000 \
@@ -0,0 +1,146 @@
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter under -X importtime; stderr gets a marker once setup is done
+PROBE = """
+import importlib, os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wellness_project.settings')
+import django
+django.setup()
+sys.stderr.write('%s\\n')
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+"""
+SETUP_DONE = 'import-probe: setup done'
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+# Modules each app is expected to load in a web or worker process
+APP_MODULES = ('views', 'tasks', 'services')
+
+
+class Command(BaseCommand):
+    help = 'Report python -X importtime costs at startup and per app, and check them against IMPORT_TIME_BUDGET'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Probe each target this many times and keep the fastest run',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=5,
+            help='Heaviest top-level imports to list per target',
+        )
+        parser.add_argument(
+            '--report-only',
+            action='store_true',
+            help='Print the report without failing on budget violations',
+        )
+
+    def handle(self, *args, **options):
+        budget = getattr(settings, 'IMPORT_TIME_BUDGET', {})
+        startup_ms = budget.get('startup_ms', 1500)
+        app_ms = budget.get('app_ms', 500)
+        deferred = budget.get('deferred_modules', [])
+        failures = []
+
+        self.stdout.write(self.style.SUCCESS('=== Import Time Report ===\n'))
+
+        # Startup: what every gunicorn worker, Celery worker and command pays
+        setup, urls = self.probe([settings.ROOT_URLCONF], options['repeat'])
+        total = self.total_ms(setup) + self.total_ms(urls)
+        failures += self.report('startup (django.setup + URLconf)', setup + urls, total, startup_ms, options['top'])
+        for name, chain in self.deferred_imports(setup + urls, deferred):
+            failures.append(f"{name} is imported at startup ({' <- '.join(chain)})")
+
+        # Each local app's modules on top of django.setup()
+        for app_config in self.local_apps():
+            modules = [
+                f'{app_config.name}.{module}' for module in APP_MODULES
+                if importlib.util.find_spec(f'{app_config.name}.{module}') is not None
+            ]
+            if not modules:
+                continue
+            _, entries = self.probe(modules, options['repeat'])
+            failures += self.report(app_config.label, entries, self.total_ms(entries), app_ms, options['top'])
+
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f'  {failure}'))
+            if not options['report_only']:
+                raise CommandError(f'{len(failures)} import time budget violation(s)')
+        else:
+            self.stdout.write(self.style.SUCCESS('All import times within budget'))
+
+    @staticmethod
+    def local_apps():
+        base_dir = str(settings.BASE_DIR)
+        return [app_config for app_config in apps.get_app_configs() if app_config.path.startswith(base_dir)]
+
+    def probe(self, modules, repeat):
+        """(setup entries, module entries) of the fastest of ``repeat`` interpreter runs"""
+        best = None
+        for _ in range(max(repeat, 1)):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', PROBE % SETUP_DONE, *modules],
+                cwd=str(settings.BASE_DIR), env=os.environ.copy(), capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+            setup, _, rest = result.stderr.partition(SETUP_DONE)
+            run = (self.parse(setup), self.parse(rest))
+            if best is None or self.total_ms(run[1]) < self.total_ms(best[1]):
+                best = run
+        return best
+
+    @staticmethod
+    def parse(output):
+        """[(module, cumulative_ms, depth)] in importtime's order (children before parents)"""
+        entries = []
+        for line in output.splitlines():
+            match = LINE_PATTERN.match(line)
+            if match:
+                entries.append((match.group(4), int(match.group(2)) / 1000, len(match.group(3)) // 2))
+        return entries
+
+    @staticmethod
+    def total_ms(entries):
+        return sum(cumulative for _, cumulative, depth in entries if depth == 0)
+
+    def report(self, label, entries, total, budget_ms, top):
+        ok = total <= budget_ms
+        style = self.style.SUCCESS if ok else self.style.ERROR
+        self.stdout.write(style(f'{label}: {total:.0f} ms (budget {budget_ms} ms)'))
+        heaviest = sorted((entry for entry in entries if entry[2] == 0), key=lambda entry: -entry[1])
+        for name, cumulative, _ in heaviest[:top]:
+            self.stdout.write(f'  {cumulative:8.1f} ms  {name}')
+        self.stdout.write('')
+        return [] if ok else [f'{label} takes {total:.0f} ms to import (budget {budget_ms} ms)']
+
+    @staticmethod
+    def deferred_imports(entries, deferred):
+        """(module, import chain) for each deferred module that was loaded"""
+        found = []
+        for name in deferred:
+            for index, (module, _, depth) in enumerate(entries):
+                if module != name:
+                    continue
+                # The importer is the next entry printed at a shallower depth
+                chain = [module]
+                for parent, _, parent_depth in entries[index + 1:]:
+                    if parent_depth < depth:
+                        chain.append(parent)
+                        depth = parent_depth
+                found.append((name, chain))
+                break
+        return found
@@ -1,3 +1,21 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+
+class CheckImportTimesTestCase(SimpleTestCase):
+    @override_settings(IMPORT_TIME_BUDGET={
+        **settings.IMPORT_TIME_BUDGET, 'deferred_modules': [*settings.IMPORT_TIME_BUDGET['deferred_modules'], 'rest_framework.status'],
+    })
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        out = StringIO()
+        call_command('check_import_times', '--repeat', '1', '--report-only', stdout=out)
+        report = out.getvalue()
+
+        # The probe does see startup imports...
+        self.assertIn('rest_framework.status is imported at startup (rest_framework.status <- ', report)
+        # ...and none of the deferred heavy dependencies are among them
+        for module in ('openai', 'plotly', 'tiktoken', 'numpy'):
+            self.assertNotIn(f'{module} is imported at startup', report)
@@ -0,0 +1,67 @@
+from typing import Optional, Sequence
+
+from .lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Smallest max_points LTTB can honour: both endpoints plus one bucket
+MIN_POINTS = 3
+
+
+def lttb_indices(x: Optional[Sequence[float]], y: Sequence[float], max_points: Optional[int],
+                 extra_series: Sequence[Sequence[float]] = ()) -> 'np.ndarray':
+    """
+    Indices of a Largest-Triangle-Three-Buckets downsample of ``y`` against ``x``.
+
+    The first and last points are always kept; the interior is split into
+    ``max_points - 2`` buckets and each keeps the point forming the largest
+    triangle with the previously kept point and the next bucket's mean. The
+    global minimum and maximum of ``y`` (and of every ``extra_series`` sharing
+    the same x) are added if LTTB dropped them, so the result can hold a few
+    more than ``max_points`` indices. ``x`` defaults to positions; returns all
+    indices when ``max_points`` is None or not below the number of points.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points is None or max_points >= n:
+        return np.arange(n)
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Bucket b covers edges[b]:edges[b + 1]; the last edge is the final point
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for b in range(max_points - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Twice the triangle area (a, candidate, next bucket mean) for the whole bucket
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(areas.argmax())
+        selected[b + 1] = a
+
+    extremes = [y.argmin(), y.argmax()]
+    for series in extra_series:
+        series = np.asarray(series, dtype=np.float64)
+        extremes += [series.argmin(), series.argmax()]
+    return np.union1d(selected, extremes)
+
+
+def take(values: Sequence, indices: 'np.ndarray') -> list:
+    """``values`` at ``indices``, as a plain list"""
+    return [values[i] for i in indices.tolist()]
+
+
+def parse_max_points(value) -> Optional[int]:
+    """``max_points`` request parameter: None when absent, else an int of at least MIN_POINTS"""
+    if value in (None, ''):
+        return None
+    max_points = int(value)
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    return max_points
@@ -0,0 +1,28 @@
+import importlib
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """
+    Stand-in for module ``name`` that imports it on first attribute access.
+
+    For heavy dependencies (numpy) used throughout a module that views,
+    tasks or management commands import at startup but rarely exercise.
+    ``importlib.import_module`` takes the import lock, so concurrent first
+    uses are safe; looked-up attributes are then cached on the stand-in.
+    Module-level uses (class attributes, annotations evaluated at def time)
+    still import it immediately, so keep those as strings.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self.__name__), attr)
+        setattr(self, attr, value)
+        return value
+
+
+def lazy_import(name: str) -> ModuleType:
+    """``import name`` deferred until the module is first used"""
+    return LazyModule(name)
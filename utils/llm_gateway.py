@@ -0,0 +1,392 @@
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .single_flight import get_single_flight, request_key
+
+if TYPE_CHECKING:
+    import openai
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    """OpenAI errors worth retrying; openai is imported on the first failure, not at startup"""
+    import openai
+    return (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class OpenAIBackend:
+    """The OpenAI API through one pooled, thread-safe client per process"""
+
+    name = 'openai'
+
+    def __init__(self, api_key: str, timeout: float = 60, max_connections: int = 20):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def client(self) -> 'openai.OpenAI':
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    import openai
+                    self._client = openai.OpenAI(
+                        api_key=self.api_key,
+                        timeout=self.timeout,
+                        max_retries=0,  # LLMGateway retries
+                        http_client=openai.DefaultHttpxClient(limits=httpx.Limits(
+                            max_connections=self.max_connections, max_keepalive_connections=self.max_connections,
+                        )),
+                    )
+        return self._client
+
+    def chat(self, **request):
+        return self.client.chat.completions.create(**request)
+
+    def embeddings(self, **request):
+        return self.client.embeddings.create(**request)
+
+
+class FakeLLMBackend:
+    """
+    Offline stand-in for tests and benchmarks.
+
+    Returns real ``ChatCompletion`` / ``CreateEmbeddingResponse`` objects
+    without network calls. ``responder(request)`` supplies each reply as a
+    string (the message content) or a dict of message fields (e.g.
+    ``{'tool_calls': [...]}``); by default JSON-mode requests get ``{}``
+    and others a fixed sentence. Streaming requests get the same reply as
+    ``ChatCompletionChunk`` objects, one per word. ``latency`` (seconds)
+    simulates the time to the first byte. Every request is recorded in
+    ``requests``.
+    """
+
+    name = 'fake'
+    available = True
+
+    def __init__(self, responder: Callable[[Dict], Union[str, Dict]] = None, latency: float = 0.0):
+        self.responder = responder
+        self.latency = latency
+        self.requests: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def chat(self, **request):
+        from openai.types.chat import ChatCompletion
+
+        with self._lock:
+            self.requests.append(request)
+            number = len(self.requests)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.responder is not None:
+            reply = self.responder(request)
+        elif (request.get('response_format') or {}).get('type') == 'json_object':
+            reply = '{}'
+        else:
+            reply = 'This is a response from the fake LLM backend.'
+        message = {'role': 'assistant', 'content': reply} if isinstance(reply, str) else {'role': 'assistant', 'content': None, **reply}
+
+        if message.get('tool_calls'):
+            finish_reason = 'tool_calls'
+        elif message.get('function_call'):
+            finish_reason = 'function_call'
+        else:
+            finish_reason = 'stop'
+        if request.get('stream'):
+            return self._stream(f'fake-{number}', request.get('model', 'fake'), message, finish_reason)
+
+        prompt_tokens = sum(len(str(m.get('content') or '')) for m in request.get('messages', [])) // 4
+        completion_tokens = len(message.get('content') or '') // 4
+        return ChatCompletion.model_validate({
+            'id': f'fake-{number}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'finish_reason': finish_reason,
+                'message': message,
+            }],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        })
+
+    @staticmethod
+    def _stream(completion_id: str, model: str, message: Dict, finish_reason: str) -> Iterator:
+        from openai.types.chat import ChatCompletionChunk
+
+        def chunk(delta, finish_reason=None):
+            return ChatCompletionChunk.model_validate({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            })
+
+        yield chunk({'role': 'assistant'})
+        if message.get('function_call'):
+            yield chunk({'function_call': message['function_call']})
+        for index, tool_call in enumerate(message.get('tool_calls') or []):
+            yield chunk({'tool_calls': [{'index': index, **tool_call}]})
+        for piece in re.findall(r'\s*\S+', message.get('content') or ''):
+            yield chunk({'content': piece})
+        yield chunk({}, finish_reason)
+
+    def embeddings(self, **request):
+        from openai.types import CreateEmbeddingResponse
+
+        with self._lock:
+            self.requests.append(request)
+        texts = request['input'] if isinstance(request['input'], list) else [request['input']]
+        dimensions = request.get('dimensions') or 1536
+        data = []
+        for index, text in enumerate(texts):
+            # Stable pseudo-random vector per text
+            rng = random.Random(hashlib.sha256(str(text).encode('utf-8')).digest())
+            data.append({'object': 'embedding', 'index': index,
+                         'embedding': [rng.uniform(-1, 1) for _ in range(dimensions)]})
+        return CreateEmbeddingResponse.model_validate({
+            'object': 'list', 'model': request.get('model', 'fake'), 'data': data,
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0},
+        })
+
+
+class SlotHoldingStream:
+    """
+    Iterator over a streamed completion that holds an LLMGateway concurrency
+    slot until the stream is exhausted, fails or is closed (also on garbage
+    collection). Other attributes are passed through to the wrapped stream.
+    """
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._release = release
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._stream, name)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            close = getattr(self._stream, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        if hasattr(self, '_lock'):
+            self.close()
+
+
+class LLMGateway:
+    """
+    Single entry point for every LLM call in the project.
+
+    ``chat()`` and ``embeddings()`` take the same arguments as the OpenAI
+    client's ``chat.completions.create`` / ``embeddings.create`` and return
+    the same objects. Around the backend call the gateway adds:
+
+    - a per-process semaphore capping calls in flight (``max_concurrency``);
+    - bounded retries with jittered exponential backoff on rate limits,
+      timeouts, connection errors and 5xx responses (a ``Retry-After``
+      header is honoured up to ``backoff_max``);
+    - coalescing of identical concurrent chat requests (utils.single_flight);
+    - a prompt-hash response cache for deterministic calls: requests with
+      ``temperature <= cache_max_temperature`` are cached for ``cache_ttl``
+      seconds unless ``cache=False`` is passed (``cache=True`` forces it).
+    """
+
+    CACHE_PREFIX = 'llm_response:'
+
+    def __init__(self, backend=None, max_concurrency: int = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None, response_cache: bool = None,
+                 cache_max_temperature: float = None, cache_ttl: int = None):
+        config = getattr(settings, 'LLM_GATEWAY', {})
+        self.backend = backend or self._backend_from_settings(config)
+        self.max_concurrency = max_concurrency or config.get('max_concurrency', 8)
+        self.max_retries = max_retries if max_retries is not None else config.get('max_retries', 3)
+        self.backoff_base = backoff_base if backoff_base is not None else config.get('backoff_base', 0.5)
+        self.backoff_max = backoff_max if backoff_max is not None else config.get('backoff_max', 8.0)
+        self.response_cache = response_cache if response_cache is not None else config.get('response_cache', True)
+        self.cache_max_temperature = (cache_max_temperature if cache_max_temperature is not None
+                                      else config.get('cache_max_temperature', 0.3))
+        self.cache_ttl = cache_ttl if cache_ttl is not None else config.get('cache_ttl', 86400)
+
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'errors': 0, 'cache_hits': 0}
+
+    @staticmethod
+    def _backend_from_settings(config: Dict):
+        if config.get('backend', 'openai') == 'fake':
+            return FakeLLMBackend(latency=config.get('fake_latency', 0.0))
+        return OpenAIBackend(
+            api_key=getattr(settings, 'OPENAI_API_KEY', ''),
+            timeout=config.get('timeout', 60),
+            max_connections=config.get('max_connections', 20),
+        )
+
+    @property
+    def available(self) -> bool:
+        """Whether calls can be made (an API key is configured, or a local backend is in use)"""
+        return self.backend.available
+
+    # === PUBLIC API ===
+
+    def chat(self, cache: Optional[bool] = None, **request) -> Any:
+        """Create a chat completion; see the class docstring for ``cache``"""
+        if cache is None:
+            cache = (self.response_cache and not request.get('stream')
+                     and request.get('temperature', 1.0) <= self.cache_max_temperature)
+        key = request_key('chat', self.backend.name, request)
+
+        if cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                self._count('cache_hits')
+                return cached
+
+        response = get_single_flight('llm').do(key, lambda: self._call(self.backend.chat, request))
+        if cache:
+            self._cache_set(key, response)
+        return response
+
+    def chat_stream(self, **request) -> Iterator:
+        """
+        Create a streaming chat completion and return its ``ChatCompletionChunk`` iterator.
+
+        Retries cover opening the stream only, and streams are never cached
+        or coalesced. The stream holds its ``max_concurrency`` slot until it
+        is exhausted or closed.
+        """
+        return self._call(self.backend.chat, {**request, 'stream': True}, hold_slot=True)
+
+    def embeddings(self, **request) -> Any:
+        return self._call(self.backend.embeddings, request)
+
+    # === INTERNALS ===
+
+    def _call(self, method: Callable, request: Dict, hold_slot: bool = False) -> Any:
+        attempt = 0
+        while True:
+            self._semaphore.acquire()
+            slot_held = False
+            try:
+                self._count('calls')
+                result = method(**request)
+                if hold_slot:
+                    # The slot goes back once the caller finishes reading or closes the stream
+                    slot_held = True
+                    return SlotHoldingStream(result, self._semaphore.release)
+                return result
+            except retryable_errors() as e:
+                if attempt >= self.max_retries:
+                    self._count('errors')
+                    raise
+                error_name = type(e).__name__
+                delay = self._retry_delay(e, attempt)
+            except Exception:
+                self._count('errors')
+                raise
+            finally:
+                if not slot_held:
+                    self._semaphore.release()
+            # Back off outside the semaphore so waiting retries don't hold a slot
+            logger.warning(f"LLM call failed ({error_name}), retry {attempt + 1} in {delay:.2f}s")
+            self._count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            return min(self.backoff_max, max(0.0, float(retry_after)))
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _cache_get(self, key: str):
+        try:
+            return cache.get(self.CACHE_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Cache unavailable for LLM responses: {e}")
+            return None
+
+    def _cache_set(self, key: str, response):
+        try:
+            cache.set(self.CACHE_PREFIX + key, response, self.cache_ttl)
+        except Exception as e:
+            logger.warning(f"Could not cache LLM response: {e}")
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+_llm_gateway = None
+_llm_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Return the shared per-process LLM gateway"""
+    global _llm_gateway
+    if _llm_gateway is None:
+        with _llm_gateway_lock:
+            if _llm_gateway is None:
+                _llm_gateway = LLMGateway()
+    return _llm_gateway
+
+
+@contextmanager
+def override_llm_backend(backend):
+    """Route the shared gateway to ``backend`` (e.g. a FakeLLMBackend) for the duration of the block"""
+    gateway = get_llm_gateway()
+    previous = gateway.backend
+    gateway.backend = backend
+    try:
+        yield backend
+    finally:
+        gateway.backend = previous
@@ -0,0 +1,155 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(*parts) -> str:
+    """Stable SHA-256 key for a call's identifying parts (JSON-serialised, keys sorted)"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls so only one of them runs.
+
+    Threads that call ``do(key, fn)`` while a call for ``key`` is already in
+    flight in this process wait for it and receive a copy of its result (or
+    its exception). Across processes, the caller that runs ``fn`` holds a
+    short cache lock and publishes the result for ``result_ttl`` seconds;
+    a process that finds the lock taken polls for that result instead of
+    calling, and runs ``fn`` itself if none appears before the lock is
+    released or ``wait_timeout`` passes. Results shared across processes
+    must be picklable; if the cache is unavailable calls simply aren't
+    shared across processes.
+    """
+
+    def __init__(self, namespace: str, lock_timeout: float = None, result_ttl: float = None,
+                 wait_timeout: float = None, poll_interval: float = None, shared: bool = None):
+        config = getattr(settings, 'SINGLE_FLIGHT', {})
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout if lock_timeout is not None else config.get('lock_timeout', 30)
+        self.result_ttl = result_ttl if result_ttl is not None else config.get('result_ttl', 5)
+        self.wait_timeout = wait_timeout if wait_timeout is not None else config.get('wait_timeout', self.lock_timeout)
+        self.poll_interval = poll_interval if poll_interval is not None else config.get('poll_interval', 0.05)
+        self.shared = shared if shared is not None else config.get('shared', True)
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {'calls': 0, 'coalesced': 0, 'shared': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Return ``fn()``, or the result of an identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['calls'] += 1
+            else:
+                call.followers += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers may mutate what they get back; each follower gets its own copy
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._run_shared(key, fn) if self.shared else fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                followers = call.followers
+            call.done.set()
+        # Followers copy call.result, so the leader must not hand out that same object
+        return copy.deepcopy(call.result) if followers else call.result
+
+    # === CROSS-PROCESS ===
+
+    def _run_shared(self, key: str, fn: Callable[[], Any]) -> Any:
+        lock_key = f'single_flight:{self.namespace}:lock:{key}'
+        result_key = f'single_flight:{self.namespace}:result:{key}'
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = cache.add(lock_key, token, self.lock_timeout)
+        except Exception as e:
+            logger.warning(f"Cache unavailable for single-flight lock, calling directly: {e}")
+            return fn()
+
+        if not acquired:
+            found = self._wait_for_result(lock_key, result_key)
+            if found is not None:
+                with self._lock:
+                    self.stats['shared'] += 1
+                return found['value']
+            return fn()
+
+        try:
+            value = fn()
+            try:
+                cache.set(result_key, {'value': value}, self.result_ttl)
+            except Exception as e:
+                logger.debug(f"Could not publish single-flight result for {self.namespace}: {e}")
+            return value
+        finally:
+            try:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+            except Exception:
+                pass
+
+    def _wait_for_result(self, lock_key: str, result_key: str):
+        """Poll for another process's result; None once its lock is gone without one"""
+        deadline = time.monotonic() + self.wait_timeout
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                found = cache.get(result_key)
+                if found is not None:
+                    return found
+                if cache.get(lock_key) is None:
+                    return cache.get(result_key)
+        except Exception as e:
+            logger.warning(f"Cache unavailable while waiting for single-flight result: {e}")
+        return None
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+_single_flights_lock = threading.Lock()
+
+
+def get_single_flight(namespace: str) -> SingleFlight:
+    """Return the per-process SingleFlight group for ``namespace``"""
+    group = _single_flights.get(namespace)
+    if group is None:
+        with _single_flights_lock:
+            group = _single_flights.get(namespace)
+            if group is None:
+                group = _single_flights[namespace] = SingleFlight(namespace)
+    return group
+
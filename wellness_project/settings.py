@@ -406,13 +406,62 @@ SPOONACULAR_ENDPOINTS = {
     'connect_user': '/users/connect',
     'add_to_meal_plan': '/mealplanner/{username}/items',
     'shopping_list': '/mealplanner/{username}/shopping-list',
+    'shopping_list_item': '/mealplanner/{username}/shopping-list/items/{id}',
 }
 
-# Spoonacular API rate limiting (free tier: 150 requests/day)
+# Spoonacular API rate limiting (free tier: 150 requests/day), enforced across
+# processes by meal_planning.services.spoonacular_rate_limiter
 SPOONACULAR_RATE_LIMIT = {
     'requests_per_day': 150,
     'requests_per_minute': 10,
     'cache_duration': 3600,  # Cache responses for 1 hour
+    'lanes': {  # Share of the daily quota each lane may use, and how many requests it may burst
+        'interactive': {'daily_share': 1.0, 'burst': 3},
+        'background': {'daily_share': 0.7, 'burst': 1},
+    },
+    'redis_retry_seconds': 30,  # After a Redis error, use the in-process limiter this long before retrying Redis
+}
+
+# Spoonacular response cache (Django cache + spoonacular_cache_entries table).
+# Fresh lifetimes come from CACHE_TIMEOUTS ('spoonacular_recipe' / 'spoonacular_ingredient',
+# otherwise SPOONACULAR_RATE_LIMIT['cache_duration']).
+SPOONACULAR_CACHE = {
+    'stale_ttl': 604800,  # Seconds past expiry an entry is still served while it refreshes in the background
+    'durable': True,  # Keep responses in the database as well as the Django cache
+}
+
+# Pooled HTTP transport shared by SpoonacularService and EnhancedSpoonacularService
+SPOONACULAR_TRANSPORT = {
+    'pool_maxsize': 20,  # Keep-alive connections per process
+    'max_retries': 3,  # Retries on 429/5xx and connection errors
+    'backoff_base': 0.5,  # Seconds; jittered exponential backoff between retries
+    'backoff_max': 8.0,  # Longest backoff or Retry-After wait (longer waits are not retried)
+    'timeouts': {  # (connect, read) seconds by endpoint path prefix
+        'default': (3.05, 30),
+        'food/ingredients': (3.05, 10),
+        'recipes/complexSearch': (3.05, 20),
+    },
+}
+
+# Request coalescing (utils.single_flight) for Spoonacular misses and LLM calls
+SINGLE_FLIGHT = {
+    'lock_timeout': 30,  # Seconds a process may hold the cross-process lock for one call
+    'result_ttl': 5,  # Seconds a finished call's result stays available to waiting processes
+    'poll_interval': 0.05,  # Seconds between checks by processes waiting on another's call
+}
+
+# Shared LLM gateway (utils.llm_gateway) used for every OpenAI call
+LLM_GATEWAY = {
+    'backend': config('LLM_BACKEND', default='openai'),  # 'openai', or 'fake' for offline tests/benchmarks
+    'max_concurrency': 8,  # LLM calls in flight at once per process
+    'max_retries': 3,  # Retries for rate limits, timeouts, connection errors and 5xx responses
+    'backoff_base': 0.5,  # Seconds; full-jitter exponential backoff between retries
+    'backoff_max': 8.0,
+    'timeout': 60,  # Seconds per API request
+    'max_connections': 20,  # Pooled HTTP connections to the API
+    'response_cache': True,  # Cache responses of deterministic (low-temperature) chat calls
+    'cache_max_temperature': 0.3,
+    'cache_ttl': 60 * 60 * 24,
 }
 
 # OpenAI Model Configuration for different nutrition tasks
@@ -438,6 +487,42 @@ OPENAI_MODEL_CONFIG = {
     }
 }
 
+# Dynamic meal planning execution settings
+DYNAMIC_MEAL_PLANNING = {
+    'max_concurrent_meals': config('MEAL_PLANNING_MAX_CONCURRENCY', default=6, cast=int),  # Per-meal OpenAI calls in flight
+    'generation_mode': config('MEAL_PLANNING_GENERATION_MODE', default='per_meal'),  # 'per_meal' or 'batched'
+    'batched_max_tokens': 3500,  # Completion budget per batched request (gpt-3.5-turbo caps output at 4096)
+    'batched_days_per_request': 2,  # Days per batched request; about 1,500 completion tokens per day
+}
+
+# AI assistant function (tool) calls requested by the model in one turn
+AI_ASSISTANT_TOOLS = {
+    'max_parallel_calls': 4,  # Functions executed concurrently per turn
+    'timeout': 15,  # Seconds before a call's result is replaced by a timeout error
+}
+
+# Recipe embeddings and semantic search (see `manage.py embed_recipes`)
+RECIPE_EMBEDDINGS = {
+    'backend': config('RECIPE_EMBEDDING_BACKEND', default='openai'),  # 'openai' or 'local' (deterministic hashing)
+    'refresh_interval': 60.0,  # Seconds between vector index freshness checks
+    'ivf_min_size': 5000,  # Below this, searches are exact brute-force
+    'nprobe': 8,  # IVF clusters scanned per approximate query
+}
+
+# Import time budget checked by `manage.py check_import_times`
+IMPORT_TIME_BUDGET = {
+    'startup_ms': 1500,  # django.setup() plus the URLconf, paid by every worker and command
+    'app_ms': 500,  # Each local app's views/tasks/services on top of django.setup()
+    'deferred_modules': ['openai', 'plotly', 'tiktoken', 'numpy'],  # Loaded on first use, never at startup
+}
+
+# In-process ingredient name resolution (NutritionCalculationService / ShoppingListService)
+INGREDIENT_RESOLVER = {
+    'refresh_interval': 300.0,  # Seconds between cross-process change checks (saves/deletes invalidate immediately)
+    'cache_size': 4096,  # Resolved names kept in the LRU
+    'fuzzy_threshold': 0.6,  # Minimum trigram similarity for a fuzzy match (1 disables)
+}
+
 # Nutrition calculation constants
 NUTRITION_CONSTANTS = {
     'calories_per_gram': {
@@ -483,6 +568,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'nutrition.tasks.analyze_user_nutrition_trends',
         'schedule': 21600.0,  # Every 6 hours
     },
+    'calculate-wellness-scores': {
+        'task': 'analytics.tasks.calculate_wellness_scores_batch',
+        'schedule': 86400.0,  # Nightly
+    },
+    'purge-spoonacular-cache': {
+        'task': 'meal_planning.tasks.purge_spoonacular_cache',
+        'schedule': 86400.0,  # Daily
+    },
 }
 
 # Recipe image upload settings